@@ -5,6 +5,12 @@ import re
 from markupsafe import Markup
 from flask_migrate import Migrate
 from .extensions import db
+from .assinaturas import url_assinatura
+from .paginacao import url_pagina
+from .periodos import para_local
+from .imagens import srcset_imagem
+from .miniaturas import url_miniatura
+from .autenticacao import METODO_SENHA_PADRAO
 
 def nl2br(value):
     """Converte quebras de linha em tags <br> para renderização em HTML."""
@@ -28,6 +34,38 @@ def create_app():
     default_db_uri = 'sqlite:///' + os.path.join(app.instance_path, 'database.db')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('SQLALCHEMY_DATABASE_URI', default_db_uri)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Fuso da operação: define o "dia local" usado nos filtros por período
+    app.config['TIMEZONE'] = os.environ.get('TIMEZONE', 'America/Sao_Paulo')
+    # Tarefas em segundo plano (pool de processos local) e validade dos relatórios gerados
+    app.config['TAREFAS_PROCESSOS'] = int(os.environ.get('TAREFAS_PROCESSOS', 2))
+    app.config['RELATORIO_TTL_SEGUNDOS'] = int(os.environ.get('RELATORIO_TTL_SEGUNDOS', 3600))
+    # Arquivos PNG das assinaturas, endereçados pelo hash do conteúdo
+    app.config['ASSINATURAS_FOLDER'] = os.environ.get('ASSINATURAS_FOLDER', os.path.join(app.instance_path, 'assinaturas'))
+    # Resolução máxima das assinaturas após o recorte
+    app.config['ASSINATURA_LARGURA_MAX'] = int(os.environ.get('ASSINATURA_LARGURA_MAX', 600))
+    app.config['ASSINATURA_ALTURA_MAX'] = int(os.environ.get('ASSINATURA_ALTURA_MAX', 200))
+    # Linhas da planilha processadas (e gravadas) por transação na importação
+    app.config['IMPORTACAO_TAMANHO_LOTE'] = int(os.environ.get('IMPORTACAO_TAMANHO_LOTE', 2000))
+    # Tempo em que o relatório de erros de uma importação fica disponível para download
+    app.config['IMPORTACAO_TTL_SEGUNDOS'] = int(os.environ.get('IMPORTACAO_TTL_SEGUNDOS', 86400))
+    # Validade da prévia (dry-run) de uma importação, aguardando confirmação
+    app.config['IMPORTACAO_PREVIA_TTL_SEGUNDOS'] = int(os.environ.get('IMPORTACAO_PREVIA_TTL_SEGUNDOS', 1800))
+    # Checklists aceitos por requisição no envio em lote do aplicativo (preenchidos sem conexão)
+    app.config['ENVIO_LOTE_MAX'] = int(os.environ.get('ENVIO_LOTE_MAX', 50))
+    # Tamanho máximo (bytes) de cada arquivo enviado em conteúdos e documentos fixos
+    app.config['UPLOAD_TAMANHO_MAX'] = int(os.environ.get('UPLOAD_TAMANHO_MAX', 50 * 1024 * 1024))
+    # Miniaturas da primeira página dos PDFs enviados (geradas em segundo plano) e sua largura
+    app.config['MINIATURAS_FOLDER'] = os.environ.get('MINIATURAS_FOLDER', os.path.join(app.instance_path, 'miniaturas'))
+    app.config['MINIATURA_LARGURA'] = int(os.environ.get('MINIATURA_LARGURA', 240))
+    # Tempo em que os dados do motorista/usuário logado ficam em cache no processo (app/identidade.py)
+    app.config['IDENTIDADE_TTL_SEGUNDOS'] = int(os.environ.get('IDENTIDADE_TTL_SEGUNDOS', 60))
+    # Método do hash das senhas (formato do Werkzeug); hashes antigos são refeitos no login
+    app.config['SENHA_METODO'] = os.environ.get('SENHA_METODO', METODO_SENHA_PADRAO)
+    # Tentativas de login por minuto (e rajada máxima) por conta e por IP, e verificações
+    # de senha simultâneas por processo (cada uma ocupa um núcleo por ~0,1 s)
+    app.config['LOGIN_TENTATIVAS_CONTA'] = int(os.environ.get('LOGIN_TENTATIVAS_CONTA', 5))
+    app.config['LOGIN_TENTATIVAS_IP'] = int(os.environ.get('LOGIN_TENTATIVAS_IP', 30))
+    app.config['LOGIN_VERIFICACOES_SIMULTANEAS'] = int(os.environ.get('LOGIN_VERIFICACOES_SIMULTANEAS', max(1, (os.cpu_count() or 2) // 2)))
 
     try:
         os.makedirs(app.instance_path)
@@ -41,12 +79,23 @@ def create_app():
     # --- REGISTRO DE FILTROS JINJA ---
     app.jinja_env.filters['nl2br'] = nl2br
     app.jinja_env.filters['youtube_id'] = youtube_id
+    app.jinja_env.filters['assinatura_url'] = url_assinatura
+    app.jinja_env.filters['horario_local'] = para_local
+    app.jinja_env.globals['url_pagina'] = url_pagina
+    app.jinja_env.globals['srcset_imagem'] = srcset_imagem
+    app.jinja_env.globals['url_miniatura'] = url_miniatura
 
     # --- REGISTRO DE BLUEPRINTS E MODELOS ---
     with app.app_context():
         from . import models
         from . import routes
+        from .commands import register_commands
         app.register_blueprint(routes.admin_bp)
         app.register_blueprint(routes.main_bp)
+        register_commands(app)
+
+    # Motorista/usuário logado carregado uma vez por requisição em g
+    from .identidade import carregar_identidade
+    app.before_request(carregar_identidade)
 
     return app
@@ -0,0 +1,63 @@
+import hashlib
+import os
+import threading
+from datetime import datetime, timezone
+from flask import send_file
+
+# Cache longo para arquivos cujo nome nunca é reaproveitado (1 ano)
+CACHE_IMUTAVEL_SEGUNDOS = 31536000
+
+# Bloco lido por vez ao calcular o hash (não carrega PDFs grandes inteiros na memória)
+BLOCO_HASH = 1024 * 1024
+
+# Hash do conteúdo por caminho, válido enquanto (mtime, tamanho) não mudar
+_hashes = {}
+_trava = threading.Lock()
+
+
+def hash_arquivo(caminho, estado=None):
+    """
+    SHA-256 do conteúdo do arquivo, calculado uma vez por versão do arquivo
+    (mtime e tamanho) neste processo. Serve de ETag forte.
+    """
+    estado = estado or os.stat(caminho)
+    versao = (estado.st_mtime_ns, estado.st_size)
+    with _trava:
+        guardado = _hashes.get(caminho)
+    if guardado and guardado[0] == versao:
+        return guardado[1]
+
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(BLOCO_HASH), b''):
+            sha.update(bloco)
+    valor = sha.hexdigest()
+    with _trava:
+        _hashes[caminho] = (versao, valor)
+    return valor
+
+
+def enviar_arquivo(caminho, imutavel=False, privado=False, as_attachment=False, etag=None, download_name=None):
+    """
+    Envia o arquivo com ETag forte (hash do conteúdo, calculado aqui se o registro
+    ainda não o tiver em 'etag') e Last-Modified, respondendo
+    304 a requisições condicionais e 206 a pedidos de Range (PDFs retomados ou
+    exibidos aos poucos). 'imutavel' libera cache longo para nomes nunca reaproveitados;
+    os demais arquivos são sempre revalidados.
+    """
+    estado = os.stat(caminho)
+    resposta = send_file(
+        caminho,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=etag or hash_arquivo(caminho, estado),
+        last_modified=datetime.fromtimestamp(estado.st_mtime, timezone.utc),
+        max_age=CACHE_IMUTAVEL_SEGUNDOS if imutavel else None,
+        conditional=True,
+    )
+    if imutavel:
+        resposta.cache_control.immutable = True
+    if privado:
+        resposta.cache_control.private = True
+        resposta.cache_control.public = False
+    return resposta
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import threading
+from collections import defaultdict, namedtuple
+from sqlalchemy import update
+from .extensions import db
+from .models import Checklist, ChecklistItem
+
+# Nó da árvore de itens de um checklist. É uma cópia somente leitura dos dados
+# (e não o objeto do ORM) para poder ser guardada entre requisições.
+ItemArvore = namedtuple('ItemArvore', ['id', 'texto', 'ordem', 'parent_id', 'sub_itens'])
+
+# Árvores montadas neste processo, por (checklist_id, versao_itens)
+_arvores = {}
+_trava = threading.Lock()
+
+
+def _montar_arvore(checklist_id):
+    """
+    Monta a árvore completa do checklist com uma única consulta, já ordenada pelo
+    banco via chave_ordem (índice ix_checklist_item_arvore): sem ordenação em Python.
+    """
+    linhas = db.session.query(
+        ChecklistItem.id, ChecklistItem.texto, ChecklistItem.ordem, ChecklistItem.parent_id
+    ).filter(ChecklistItem.checklist_id == checklist_id)\
+        .order_by(ChecklistItem.parent_id, ChecklistItem.chave_ordem, ChecklistItem.id).all()
+
+    filhos = defaultdict(list)
+    for linha in linhas:
+        filhos[linha.parent_id].append(linha)
+
+    def montar(parent_id):
+        return tuple(ItemArvore(l.id, l.texto, l.ordem, l.parent_id, montar(l.id)) for l in filhos[parent_id])
+
+    return montar(None)
+
+
+def arvore_checklist(checklist):
+    """
+    Itens principais do checklist em ordem natural, cada um com seus sub_itens.
+    A árvore fica em cache por (id, versao_itens); qualquer alteração nos itens
+    deve chamar invalidar_arvore() para que a próxima leitura a remonte.
+    """
+    chave = (checklist.id, checklist.versao_itens)
+    with _trava:
+        arvore = _arvores.get(chave)
+    if arvore is None:
+        arvore = _montar_arvore(checklist.id)
+        with _trava:
+            # Mantém apenas a versão mais recente de cada checklist
+            for antiga in [k for k in _arvores if k[0] == checklist.id]:
+                del _arvores[antiga]
+            _arvores[chave] = arvore
+    return arvore
+
+
+def ids_itens(arvore):
+    """Conjunto com os ids de todos os itens da árvore (principais e sub-itens)."""
+    ids = set()
+    for item in arvore:
+        ids.add(item.id)
+        ids |= ids_itens(item.sub_itens)
+    return ids
+
+
+def versao_definicao(checklist):
+    """
+    Hash da definição do checklist (cabeçalho + versao_itens), usado como ETag forte.
+    Calculado só com a linha do checklist, sem montar a árvore.
+    """
+    base = json.dumps([
+        checklist.id, checklist.titulo, checklist.unidade, checklist.tipo, checklist.codigo,
+        checklist.revisao, checklist.data.isoformat(), checklist.ativo, checklist.versao_itens
+    ], ensure_ascii=False)
+    return hashlib.sha256(base.encode('utf-8')).hexdigest()[:32]
+
+
+def _itens_json(arvore):
+    return [{'id': item.id, 'texto': item.texto, 'ordem': item.ordem, 'sub_itens': _itens_json(item.sub_itens)}
+            for item in arvore]
+
+
+def definicao_checklist(checklist):
+    """Definição compacta do checklist (cabeçalho e árvore de itens em ordem natural) para clientes JSON."""
+    return {
+        'id': checklist.id,
+        'versao': versao_definicao(checklist),
+        'titulo': checklist.titulo,
+        'unidade': checklist.unidade,
+        'tipo': checklist.tipo,
+        'codigo': checklist.codigo,
+        'revisao': checklist.revisao,
+        'data': checklist.data.isoformat(),
+        'ativo': checklist.ativo,
+        'itens': _itens_json(arvore_checklist(checklist)),
+    }
+
+
+def invalidar_arvore(checklist_id):
+    """
+    Incrementa a versão dos itens do checklist na mesma transação da alteração.
+    Como a versão fica no banco, os demais processos também deixam de usar a árvore antiga.
+    """
+    db.session.execute(
+        update(Checklist).where(Checklist.id == checklist_id)
+        .values(versao_itens=Checklist.versao_itens + 1)
+    )
+    with _trava:
+        for antiga in [k for k in _arvores if k[0] == checklist_id]:
+            del _arvores[antiga]
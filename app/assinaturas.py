@@ -0,0 +1,138 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+from flask import current_app, url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Referências gravadas nas colunas de assinatura: o hash SHA-256 (hex) do PNG
+REGEX_CHAVE = re.compile(r'^[0-9a-f]{64}$')
+PREFIXO_DATA_URL = 'data:image/png;base64,'
+
+# Normalização: tons de cinza abaixo deste valor contam como tinta
+LIMIAR_TINTA = 250
+# Margem (px) mantida em volta do traço após o recorte
+MARGEM_RECORTE = 8
+# Número de cores da paleta final (2 bits por pixel)
+CORES_PALETA = 4
+
+
+class AssinaturaInvalida(ValueError):
+    """O conteúdo enviado não é uma imagem PNG em data URL válida."""
+
+
+def pasta_assinaturas():
+    """Diretório do armazenamento de assinaturas (fora de static: o acesso exige login)."""
+    pasta = current_app.config.get('ASSINATURAS_FOLDER') or os.path.join(current_app.instance_path, 'assinaturas')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def e_chave(valor):
+    return bool(valor) and bool(REGEX_CHAVE.match(valor))
+
+
+def caminho_assinatura(chave):
+    """Caminho do arquivo da assinatura; os arquivos são distribuídos em subpastas pelo prefixo do hash."""
+    if not e_chave(chave):
+        raise AssinaturaInvalida('Referência de assinatura inválida.')
+    return os.path.join(pasta_assinaturas(), chave[:2], f'{chave}.png')
+
+
+def decodificar_data_url(data_url):
+    """Extrai os bytes do PNG de uma data URL 'data:image/png;base64,...'."""
+    if not isinstance(data_url, str) or not data_url.startswith(PREFIXO_DATA_URL):
+        raise AssinaturaInvalida('Formato de assinatura não suportado.')
+    try:
+        return base64.b64decode(data_url[len(PREFIXO_DATA_URL):], validate=True)
+    except (binascii.Error, ValueError):
+        raise AssinaturaInvalida('Assinatura corrompida.')
+
+
+def salvar_png(conteudo):
+    """Grava os bytes no armazenamento endereçado por conteúdo e devolve a chave (SHA-256)."""
+    chave = hashlib.sha256(conteudo).hexdigest()
+    destino = caminho_assinatura(chave)
+    if not os.path.exists(destino):
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporario = f'{destino}.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
+    return chave
+
+
+def normalizar_png(conteudo):
+    """
+    Reduz a imagem do canvas ao essencial: aplica fundo branco, recorta na área
+    do traço, limita a resolução e regrava como PNG de paleta com poucas cores.
+    """
+    try:
+        imagem = Image.open(io.BytesIO(conteudo))
+        imagem.load()
+    except (UnidentifiedImageError, OSError):
+        raise AssinaturaInvalida('A assinatura enviada não é uma imagem válida.')
+
+    # O canvas é transparente: compõe sobre fundo branco antes de converter para cinza
+    imagem = imagem.convert('RGBA')
+    fundo = Image.new('RGBA', imagem.size, (255, 255, 255, 255))
+    cinza = Image.alpha_composite(fundo, imagem).convert('L')
+
+    area = ImageOps.invert(cinza).point(lambda p: 255 if p > 255 - LIMIAR_TINTA else 0).getbbox()
+    if not area:
+        raise AssinaturaInvalida('A assinatura está em branco.')
+
+    esquerda, topo, direita, base = area
+    cinza = cinza.crop((
+        max(esquerda - MARGEM_RECORTE, 0),
+        max(topo - MARGEM_RECORTE, 0),
+        min(direita + MARGEM_RECORTE, cinza.width),
+        min(base + MARGEM_RECORTE, cinza.height),
+    ))
+
+    largura_max = current_app.config.get('ASSINATURA_LARGURA_MAX', 600)
+    altura_max = current_app.config.get('ASSINATURA_ALTURA_MAX', 200)
+    cinza.thumbnail((largura_max, altura_max), Image.LANCZOS)
+
+    paleta = cinza.quantize(colors=CORES_PALETA)
+    saida = io.BytesIO()
+    paleta.save(saida, format='PNG', optimize=True, bits=2)
+    return saida.getvalue()
+
+
+def ja_normalizada(conteudo):
+    """Indica se o PNG já passou pela normalização (paleta reduzida e dentro do tamanho máximo)."""
+    try:
+        imagem = Image.open(io.BytesIO(conteudo))
+    except (UnidentifiedImageError, OSError):
+        return False
+    return (
+        imagem.mode == 'P'
+        and len(imagem.getcolors() or []) <= CORES_PALETA
+        and imagem.width <= current_app.config.get('ASSINATURA_LARGURA_MAX', 600)
+        and imagem.height <= current_app.config.get('ASSINATURA_ALTURA_MAX', 200)
+    )
+
+
+def salvar_assinatura(data_url):
+    """
+    Recebe a data URL enviada pelo formulário, normaliza a imagem e devolve a
+    referência curta a ser gravada no registro. Valores vazios resultam em None.
+    """
+    if not data_url:
+        return None
+    return salvar_png(normalizar_png(decodificar_data_url(data_url)))
+
+
+def url_assinatura(valor):
+    """
+    Filtro Jinja: devolve a URL da imagem da assinatura. Registros ainda não
+    migrados (data URL completa) continuam funcionando.
+    """
+    if not valor:
+        return ''
+    if valor.startswith('data:'):
+        return valor
+    return url_for('main.ver_assinatura', chave=valor)
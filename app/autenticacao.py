@@ -0,0 +1,136 @@
+import threading
+import time
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import generate_password_hash
+
+# Método do hash das senhas (formato do Werkzeug). Hashes gravados com outro método
+# (ou parâmetros) são refeitos no próximo login bem-sucedido.
+METODO_SENHA_PADRAO = 'scrypt:32768:8:1'
+
+
+def metodo_senha():
+    return current_app.config['SENHA_METODO']
+
+
+@lru_cache(maxsize=8)
+def _prefixo_metodo(metodo):
+    """Prefixo gravado no hash pelo método (ex.: 'pbkdf2' -> 'pbkdf2:sha256:1000000')."""
+    return generate_password_hash('', method=metodo).split('$', 1)[0]
+
+
+def gerar_hash_senha(senha):
+    return generate_password_hash(senha, method=metodo_senha())
+
+
+def precisa_rehash(password_hash):
+    """Se o hash não existe ou foi gerado com um método diferente do configurado."""
+    return not password_hash or password_hash.split('$', 1)[0] != _prefixo_metodo(metodo_senha())
+
+
+def verificar_senha(registro, senha):
+    """
+    Confere a senha do registro (Motorista ou Usuario) e, se estiver correta e o hash
+    estiver desatualizado (método antigo, ou motorista ainda sem hash), grava um novo
+    hash no método configurado. A gravação fica na sessão do banco: quem chama faz o commit.
+    """
+    if not registro.check_password(senha):
+        return False
+    if precisa_rehash(registro.password_hash):
+        registro.password_hash = gerar_hash_senha(senha)
+    return True
+
+
+class LimitadorTentativas:
+    """
+    Token bucket por chave (ex.: CPF ou IP), em memória do processo: cada chave
+    acumula até 'capacidade' tentativas, recarregadas à razão de 'capacidade' por minuto.
+    """
+
+    def __init__(self):
+        self._baldes = {}
+        self._trava = threading.Lock()
+
+    def consumir(self, chave, capacidade):
+        """Gasta uma tentativa da chave. Devolve 0 se permitida, ou os segundos até a próxima."""
+        agora = time.monotonic()
+        recarga = capacidade / 60.0
+        with self._trava:
+            tokens, visto_em = self._baldes.get(chave, (capacidade, agora))
+            tokens = min(capacidade, tokens + (agora - visto_em) * recarga)
+            if tokens < 1:
+                self._baldes[chave] = (tokens, agora)
+                return (1 - tokens) / recarga
+            self._baldes[chave] = (tokens - 1, agora)
+            if len(self._baldes) > 10000:
+                self._podar(agora)
+        return 0
+
+    def devolver(self, chave, capacidade):
+        """Devolve uma tentativa gasta pela chave (sem passar da capacidade)."""
+        with self._trava:
+            if chave in self._baldes:
+                tokens, visto_em = self._baldes[chave]
+                self._baldes[chave] = (min(capacidade, tokens + 1), visto_em)
+
+    def liberar(self, chave):
+        """Devolve a chave ao balde cheio (ex.: após um login bem-sucedido)."""
+        with self._trava:
+            self._baldes.pop(chave, None)
+
+    def _podar(self, agora):
+        # Descarta as chaves sem tentativas há um minuto: o balde já estaria cheio
+        for chave in [c for c, (_, visto_em) in self._baldes.items() if agora - visto_em >= 60]:
+            del self._baldes[chave]
+
+
+_limitador = LimitadorTentativas()
+# Verificações de senha simultâneas no processo: o restante dos núcleos fica para as páginas
+_verificacoes = None
+_trava_verificacoes = threading.Lock()
+
+
+class LoginBloqueado(Exception):
+    """Tentativas demais: o login foi recusado sem conferir a senha."""
+
+    def __init__(self, segundos):
+        super().__init__(f'Muitas tentativas de login. Tente novamente em {max(1, round(segundos))} segundo(s).')
+        self.segundos = segundos
+
+
+def _semaforo_verificacoes():
+    global _verificacoes
+    with _trava_verificacoes:
+        if _verificacoes is None:
+            _verificacoes = threading.BoundedSemaphore(current_app.config['LOGIN_VERIFICACOES_SIMULTANEAS'])
+    return _verificacoes
+
+
+def tentar_login(registro, senha, conta, ip):
+    """
+    Limita as tentativas por conta (CPF/nome) e por IP antes de calcular qualquer hash
+    e confere a senha com verificar_senha(). Levanta LoginBloqueado quando um dos baldes
+    está vazio ou quando há verificações simultâneas demais. Devolve se a senha confere.
+    Um login correto devolve a tentativa do IP: só as senhas erradas contam contra um
+    endereço compartilhado (ex.: Wi-Fi do pátio na troca de turno).
+    """
+    espera = max(
+        _limitador.consumir(('conta', conta), current_app.config['LOGIN_TENTATIVAS_CONTA']),
+        _limitador.consumir(('ip', ip), current_app.config['LOGIN_TENTATIVAS_IP']),
+    )
+    if espera:
+        raise LoginBloqueado(espera)
+    if registro is None:
+        return False
+
+    semaforo = _semaforo_verificacoes()
+    if not semaforo.acquire(timeout=2):
+        raise LoginBloqueado(2)
+    try:
+        valida = verificar_senha(registro, senha)
+    finally:
+        semaforo.release()
+    if valida:
+        _limitador.liberar(('conta', conta))
+        _limitador.devolver(('ip', ip), current_app.config['LOGIN_TENTATIVAS_IP'])
+    return valida
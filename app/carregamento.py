@@ -0,0 +1,63 @@
+from sqlalchemy.orm import joinedload, selectinload
+from .models import (Veiculo, Motorista, Assinatura, Pendencia,
+                     ChecklistPreenchido, ChecklistResposta)
+
+# Perfis de carregamento por listagem: cada um traz, junto com a consulta principal,
+# tudo o que o template acessa. Assim a página faz um número fixo de consultas,
+# independente da quantidade de linhas exibidas.
+# São funções porque os backrefs (ex.: Motorista.veiculo) só existem depois que os
+# mapeamentos são configurados.
+
+
+def _veiculo_placas():
+    # veiculos.html: badges e modais com as três placas
+    return (
+        joinedload(Veiculo.placa_cavalo),
+        joinedload(Veiculo.placa_carreta1),
+        joinedload(Veiculo.placa_carreta2),
+    )
+
+
+def _motorista_veiculo():
+    # motoristas.html: conjunto associado
+    return (joinedload(Motorista.veiculo),)
+
+
+def _assinatura_motorista():
+    # conteudo_detalhe.html: nome do motorista em cada assinatura
+    return (joinedload(Assinatura.motorista),)
+
+
+def _pendencia_completa():
+    # admin_pendencias.html: item, veículo e o preenchimento que abriu a pendência
+    return (
+        joinedload(Pendencia.item),
+        joinedload(Pendencia.veiculo),
+        joinedload(Pendencia.resposta_abertura)
+            .joinedload(ChecklistResposta.preenchimento)
+            .joinedload(ChecklistPreenchido.motorista),
+    )
+
+
+def _preenchimento_respostas():
+    # admin_relatorios_consolidados.html: cabeçalho e respostas com o texto do item
+    return (
+        joinedload(ChecklistPreenchido.checklist),
+        joinedload(ChecklistPreenchido.motorista),
+        joinedload(ChecklistPreenchido.veiculo),
+        selectinload(ChecklistPreenchido.lista_respostas).joinedload(ChecklistResposta.item),
+    )
+
+
+PERFIS = {
+    'veiculo_placas': _veiculo_placas,
+    'motorista_veiculo': _motorista_veiculo,
+    'assinatura_motorista': _assinatura_motorista,
+    'pendencia_completa': _pendencia_completa,
+    'preenchimento_respostas': _preenchimento_respostas,
+}
+
+
+def com_perfil(query, nome):
+    """Aplica à consulta as opções de carregamento do perfil informado."""
+    return query.options(*PERFIS[nome]())
@@ -0,0 +1,388 @@
+import os
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import select, update, and_, true
+from .extensions import db
+from .models import (ChecklistPreenchido, ChecklistResposta, Pendencia,
+                     Assinatura, ChecklistItem, Conteudo, Motorista, DocumentoFixo)
+from .assinaturas import (salvar_assinatura, salvar_png, normalizar_png, ja_normalizada,
+                          caminho_assinatura, AssinaturaInvalida)
+from .uploads import gravar_fluxo, pasta_uploads, TIPOS_UPLOAD, UploadInvalido, PASTA_DOCUMENTOS
+from .imagens import gerar_derivadas, tem_derivadas, nome_derivada
+from .miniaturas import gerar_miniatura, MiniaturaIndisponivel
+
+# Colunas que armazenavam a data URL completa da assinatura
+COLUNAS_ASSINATURA = [
+    (Assinatura, 'assinatura_imagem'),
+    (ChecklistPreenchido, 'assinatura_motorista'),
+    (ChecklistPreenchido, 'assinatura_responsavel'),
+]
+
+
+def consultas_frequentes():
+    """
+    Consultas mais executadas pelas rotas, com parâmetros de exemplo.
+    Cada entrada é (descrição, statement, índice esperado).
+    """
+    agora = datetime.utcnow()
+    inicio, fim = agora - timedelta(days=1), agora
+
+    return [
+        (
+            'Acompanhamento diário (checklist + faixa de data)',
+            select(ChecklistPreenchido.motorista_id).where(
+                ChecklistPreenchido.checklist_id == 1,
+                ChecklistPreenchido.data_preenchimento >= inicio,
+                ChecklistPreenchido.data_preenchimento < fim
+            ).distinct(),
+            'ix_checklist_preenchido_checklist_data',
+        ),
+        (
+            'Status por período do motorista',
+            select(ChecklistPreenchido.checklist_id).where(
+                ChecklistPreenchido.motorista_id == 1,
+                ChecklistPreenchido.checklist_id.in_([1, 2]),
+                ChecklistPreenchido.data_preenchimento >= inicio,
+                ChecklistPreenchido.data_preenchimento < fim
+            ),
+            'ix_checklist_preenchido_motorista_checklist_data',
+        ),
+        (
+            'Respostas de um preenchimento',
+            select(ChecklistResposta).where(
+                ChecklistResposta.preenchimento_id == 1,
+                ChecklistResposta.item_id == 1
+            ),
+            'ix_checklist_resposta_preenchimento_item',
+        ),
+        (
+            'Pendências abertas do veículo',
+            select(Pendencia).where(
+                Pendencia.veiculo_id == 1,
+                Pendencia.status == 'PENDENTE',
+                Pendencia.item_id == 1
+            ),
+            'ix_pendencia_veiculo_status_item',
+        ),
+        (
+            'Assinatura do motorista para um conteúdo',
+            select(Assinatura).where(
+                Assinatura.motorista_id == 1,
+                Assinatura.conteudo_id == 1
+            ),
+            'ix_assinatura_motorista_conteudo',
+        ),
+        (
+            'Assinaturas de um conteúdo (paginadas)',
+            select(Assinatura).where(Assinatura.conteudo_id == 1)
+            .order_by(Assinatura.data_assinatura.desc(), Assinatura.id.desc()),
+            'ix_assinatura_conteudo_data',
+        ),
+        (
+            'Checklists preenchidos (paginados)',
+            select(ChecklistPreenchido)
+            .order_by(ChecklistPreenchido.data_preenchimento.desc(), ChecklistPreenchido.id.desc()),
+            'ix_checklist_preenchido_data',
+        ),
+        (
+            'Pendências abertas (paginadas)',
+            select(Pendencia).where(Pendencia.status == 'PENDENTE')
+            .order_by(Pendencia.data_criacao.desc(), Pendencia.id.desc()),
+            'ix_pendencia_status_data',
+        ),
+        (
+            'Conteúdos (paginados)',
+            select(Conteudo).order_by(Conteudo.data.desc(), Conteudo.id.desc()),
+            'ix_conteudo_data',
+        ),
+        (
+            'Motoristas (paginados)',
+            select(Motorista).order_by(Motorista.nome, Motorista.id),
+            'ix_motorista_nome',
+        ),
+        (
+            'Itens principais de um checklist',
+            select(ChecklistItem).where(
+                ChecklistItem.checklist_id == 1,
+                ChecklistItem.parent_id.is_(None)
+            ).order_by(ChecklistItem.chave_ordem),
+            'ix_checklist_item_arvore',
+        ),
+        (
+            'Árvore completa de um checklist (ordem natural)',
+            select(ChecklistItem.id, ChecklistItem.parent_id).where(ChecklistItem.checklist_id == 1)
+            .order_by(ChecklistItem.parent_id, ChecklistItem.chave_ordem, ChecklistItem.id),
+            'ix_checklist_item_arvore',
+        ),
+    ]
+
+
+@click.command('verificar-indices')
+@with_appcontext
+def verificar_indices_command():
+    """Imprime o EXPLAIN QUERY PLAN (SQLite) das consultas frequentes."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('Esta verificação só está disponível para SQLite.')
+
+    falhas = 0
+    with db.engine.connect() as conn:
+        for descricao, stmt, indice in consultas_frequentes():
+            sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+            plano = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+            detalhes = [linha[-1] for linha in plano]
+            usa_indice = any(indice in d for d in detalhes)
+
+            click.echo(f"{'OK ' if usa_indice else 'ERRO'} {descricao}")
+            for d in detalhes:
+                click.echo(f'     {d}')
+            if not usa_indice:
+                click.echo(f'     -> índice esperado não utilizado: {indice}')
+                falhas += 1
+
+    if falhas:
+        raise click.ClickException(f'{falhas} consulta(s) sem o índice esperado.')
+    click.echo('Todas as consultas frequentes utilizam os índices esperados.')
+
+
+def converter_coluna_em_lotes(modelo, nome_coluna, filtro, converter, lote):
+    """
+    Percorre os registros da coluna que atendem a 'filtro' em lotes ordenados por id
+    (sem carregar a tabela inteira) e grava o valor devolvido por 'converter'.
+    'converter' devolve None para manter o valor atual. Devolve (convertidos, invalidos).
+    """
+    coluna = getattr(modelo, nome_coluna)
+    ultimo_id = 0
+    convertidos = invalidos = 0
+
+    while True:
+        linhas = db.session.query(modelo.id, coluna)\
+            .filter(modelo.id > ultimo_id, filtro(coluna))\
+            .order_by(modelo.id).limit(lote).all()
+        if not linhas:
+            break
+
+        atualizacoes = []
+        for registro_id, valor in linhas:
+            try:
+                novo_valor = converter(valor)
+            except AssinaturaInvalida:
+                invalidos += 1
+                continue
+            if novo_valor and novo_valor != valor:
+                atualizacoes.append({'id': registro_id, nome_coluna: novo_valor})
+        ultimo_id = linhas[-1][0]
+
+        if atualizacoes:
+            db.session.execute(update(modelo), atualizacoes)
+        db.session.commit()
+        db.session.expunge_all()
+        convertidos += len(atualizacoes)
+
+    return convertidos, invalidos
+
+
+def _vacuum():
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('VACUUM')
+        click.echo('VACUUM concluído.')
+
+
+@click.command('migrar-assinaturas')
+@click.option('--lote', default=200, show_default=True, help='Registros processados por transação.')
+@click.option('--vacuum', is_flag=True, help='Executa VACUUM ao final para devolver o espaço liberado (SQLite).')
+@with_appcontext
+def migrar_assinaturas_command(lote, vacuum):
+    """Move as assinaturas em base64 do banco para o armazenamento de arquivos."""
+    for modelo, nome_coluna in COLUNAS_ASSINATURA:
+        migradas, invalidas = converter_coluna_em_lotes(
+            modelo, nome_coluna, lambda coluna: coluna.like('data:%'), salvar_assinatura, lote
+        )
+        click.echo(f'{modelo.__tablename__}.{nome_coluna}: {migradas} migrada(s), {invalidas} inválida(s) mantida(s).')
+
+    if vacuum:
+        _vacuum()
+
+
+@click.command('normalizar-assinaturas')
+@click.option('--lote', default=200, show_default=True, help='Registros processados por transação.')
+@click.option('--remover-antigas', is_flag=True, help='Apaga os arquivos originais que deixaram de ser referenciados.')
+@with_appcontext
+def normalizar_assinaturas_command(lote, remover_antigas):
+    """Recorta, reduz e regrava as assinaturas já armazenadas (backfill da normalização)."""
+    # Arquivos podem ser compartilhados por vários registros: converte cada um só uma vez
+    convertidas = {}
+
+    def converter(chave):
+        if chave not in convertidas:
+            try:
+                with open(caminho_assinatura(chave), 'rb') as f:
+                    conteudo = f.read()
+            except OSError:
+                raise AssinaturaInvalida('Arquivo de assinatura não encontrado.')
+            convertidas[chave] = chave if ja_normalizada(conteudo) else salvar_png(normalizar_png(conteudo))
+        return convertidas[chave]
+
+    for modelo, nome_coluna in COLUNAS_ASSINATURA:
+        total, invalidas = converter_coluna_em_lotes(
+            modelo, nome_coluna,
+            lambda coluna: and_(coluna.isnot(None), coluna.notlike('data:%')),
+            converter, lote
+        )
+        click.echo(f'{modelo.__tablename__}.{nome_coluna}: {total} normalizada(s), {invalidas} ignorada(s).')
+
+    substituidas = {antiga for antiga, nova in convertidas.items() if antiga != nova}
+    bytes_antes = sum(os.path.getsize(caminho_assinatura(c)) for c in substituidas)
+    bytes_depois = sum(os.path.getsize(caminho_assinatura(convertidas[c])) for c in substituidas)
+    if substituidas:
+        click.echo(f'{len(substituidas)} arquivo(s): {bytes_antes / 1024:.0f} KiB -> {bytes_depois / 1024:.0f} KiB.')
+
+    if remover_antigas:
+        for chave in substituidas:
+            os.remove(caminho_assinatura(chave))
+        click.echo(f'{len(substituidas)} arquivo(s) original(is) removido(s).')
+
+
+def _migrar_arquivos(modelo, pasta, filtro, nome_atual, novos_valores, lote):
+    """
+    Regrava no armazenamento por conteúdo os arquivos dos registros sem hash_conteudo.
+    'nome_atual' dá o nome do arquivo na pasta; 'novos_valores' monta as colunas a
+    gravar a partir do ArquivoSalvo. Devolve (migrados, invalidos, caminhos antigos).
+    """
+    ultimo_id = 0
+    migrados = invalidos = 0
+    antigos = set()
+
+    while True:
+        registros = modelo.query.filter(modelo.id > ultimo_id, modelo.hash_conteudo.is_(None), filtro)\
+            .order_by(modelo.id).limit(lote).all()
+        if not registros:
+            break
+
+        atualizacoes = []
+        for registro in registros:
+            caminho = os.path.join(pasta, nome_atual(registro))
+            try:
+                with open(caminho, 'rb') as fluxo:
+                    salvo = gravar_fluxo(fluxo, caminho, pasta, TIPOS_UPLOAD)
+            except (OSError, UploadInvalido) as e:
+                click.echo(f'{modelo.__tablename__} {registro.id}: mantido ({e}).')
+                invalidos += 1
+                continue
+            if salvo.nome != nome_atual(registro):
+                antigos.add(caminho)
+            atualizacoes.append(dict(novos_valores(salvo), id=registro.id, hash_conteudo=salvo.hash,
+                                     tamanho=salvo.tamanho, tipo_mime=salvo.tipo_mime))
+        ultimo_id = registros[-1].id
+
+        if atualizacoes:
+            db.session.execute(update(modelo), atualizacoes)
+        db.session.commit()
+        db.session.expunge_all()
+        migrados += len(atualizacoes)
+
+    return migrados, invalidos, antigos
+
+
+@click.command('migrar-uploads')
+@click.option('--lote', default=200, show_default=True, help='Registros processados por transação.')
+@click.option('--remover-antigas', is_flag=True, help='Apaga os arquivos originais que deixaram de ser referenciados.')
+@with_appcontext
+def migrar_uploads_command(lote, remover_antigas):
+    """Grava os arquivos já enviados pelo hash do conteúdo, deduplicando cópias (backfill de app/uploads.py)."""
+    pasta_conteudos = pasta_uploads()
+    pasta_documentos = pasta_uploads(PASTA_DOCUMENTOS)
+    resultados = [
+        _migrar_arquivos(
+            Conteudo, pasta_conteudos,
+            and_(Conteudo.tipo_recurso == 'arquivo', Conteudo.recurso_link.like('uploads/%')),
+            lambda conteudo: conteudo.recurso_link[len('uploads/'):],
+            lambda salvo: {'recurso_link': f'uploads/{salvo.nome}'}, lote
+        ),
+        _migrar_arquivos(
+            DocumentoFixo, pasta_documentos, true(),
+            lambda documento: documento.nome_arquivo,
+            lambda salvo: {'nome_arquivo': salvo.nome}, lote
+        ),
+    ]
+    antigos = set()
+    for modelo, (migrados, invalidos, caminhos) in zip((Conteudo, DocumentoFixo), resultados):
+        click.echo(f'{modelo.__tablename__}: {migrados} migrado(s), {invalidos} mantido(s).')
+        antigos |= caminhos
+
+    if remover_antigas:
+        # Nomes antigos ainda usados por registros não migrados continuam no disco
+        em_uso = {os.path.join(pasta_conteudos, link[len('uploads/'):])
+                  for link, in db.session.query(Conteudo.recurso_link).filter(Conteudo.recurso_link.like('uploads/%'))}
+        em_uso |= {os.path.join(pasta_documentos, nome) for nome, in db.session.query(DocumentoFixo.nome_arquivo)}
+        removidos = 0
+        for caminho in antigos - em_uso:
+            if os.path.exists(caminho):
+                os.remove(caminho)
+                removidos += 1
+        click.echo(f'{removidos} arquivo(s) original(is) removido(s).')
+
+
+@click.command('gerar-derivadas')
+@click.option('--refazer', is_flag=True, help='Regrava as versões reduzidas que já existem.')
+@with_appcontext
+def gerar_derivadas_command(refazer):
+    """Gera as versões reduzidas (e WebP) das imagens já enviadas com os conteúdos (backfill)."""
+    pasta = pasta_uploads()
+    links = db.session.query(Conteudo.recurso_link).filter(
+        Conteudo.tipo_recurso == 'arquivo', Conteudo.recurso_link.like('uploads/%')
+    ).distinct()
+    imagens = sorted({link[len('uploads/'):] for link, in links if tem_derivadas(link)})
+
+    com_derivadas = 0
+    bytes_originais = bytes_menor = 0
+    for nome in imagens:
+        caminho = os.path.join(pasta, nome)
+        if not os.path.exists(caminho):
+            click.echo(f'{nome}: arquivo não encontrado.')
+            continue
+        larguras = gerar_derivadas(caminho, refazer=refazer)
+        if larguras:
+            com_derivadas += 1
+            bytes_originais += os.path.getsize(caminho)
+            bytes_menor += os.path.getsize(os.path.join(pasta, nome_derivada(nome, larguras[0], 'webp')))
+
+    click.echo(f'{com_derivadas} de {len(imagens)} imagem(ns) com versões reduzidas.')
+    if com_derivadas:
+        click.echo(f'Original: {bytes_originais / 1024:.0f} KiB -> menor WebP: {bytes_menor / 1024:.0f} KiB.')
+
+
+@click.command('gerar-miniaturas')
+@with_appcontext
+def gerar_miniaturas_command():
+    """
+    Gera as miniaturas da primeira página dos PDFs já enviados (documentos fixos e
+    conteúdos). Arquivos sem hash_conteudo precisam antes do 'flask migrar-uploads'.
+    """
+    pdfs = {}
+    for chave, nome in db.session.query(DocumentoFixo.hash_conteudo, DocumentoFixo.nome_arquivo)\
+            .filter(DocumentoFixo.tipo_mime == 'application/pdf'):
+        pdfs.setdefault(chave, os.path.join(pasta_uploads(PASTA_DOCUMENTOS), nome))
+    for chave, link in db.session.query(Conteudo.hash_conteudo, Conteudo.recurso_link)\
+            .filter(Conteudo.tipo_mime == 'application/pdf', Conteudo.recurso_link.like('uploads/%')):
+        pdfs.setdefault(chave, os.path.join(pasta_uploads(), link[len('uploads/'):]))
+
+    geradas = 0
+    for chave, caminho in pdfs.items():
+        try:
+            gerar_miniatura(caminho, chave)
+            geradas += 1
+        except MiniaturaIndisponivel as e:
+            click.echo(f'{os.path.basename(caminho)}: {e}')
+    click.echo(f'{geradas} de {len(pdfs)} PDF(s) com miniatura.')
+
+
+def register_commands(app):
+    """Registra os comandos de linha de comando da aplicação (flask <comando>)."""
+    app.cli.add_command(verificar_indices_command)
+    app.cli.add_command(migrar_assinaturas_command)
+    app.cli.add_command(normalizar_assinaturas_command)
+    app.cli.add_command(migrar_uploads_command)
+    app.cli.add_command(gerar_derivadas_command)
+    app.cli.add_command(gerar_miniaturas_command)
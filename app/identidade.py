@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, g, session
+from .extensions import db
+from .models import Motorista, Usuario, Veiculo
+
+# Cópias somente leitura do motorista/usuário logado (e não objetos do ORM),
+# para poderem ser guardadas entre requisições
+VeiculoIdentidade = namedtuple('VeiculoIdentidade', ['id', 'nome_conjunto'])
+IdentidadeMotorista = namedtuple('IdentidadeMotorista', ['id', 'nome', 'unidade', 'veiculo_id', 'veiculo'])
+IdentidadeUsuario = namedtuple('IdentidadeUsuario', ['id', 'nome', 'role', 'unidade'])
+
+MOTORISTA = 'motorista'
+USUARIO = 'usuario'
+
+# Identidades carregadas neste processo: (tipo, id) -> (expira_em, identidade)
+_identidades = {}
+_trava = threading.Lock()
+
+
+def _carregar_motorista(motorista_id):
+    """Motorista e o nome do veículo vinculado em uma única consulta."""
+    linha = db.session.query(
+        Motorista.id, Motorista.nome, Motorista.unidade, Motorista.veiculo_id, Veiculo.nome_conjunto
+    ).outerjoin(Veiculo, Veiculo.id == Motorista.veiculo_id).filter(Motorista.id == motorista_id).first()
+    if not linha:
+        return None
+    veiculo = VeiculoIdentidade(linha.veiculo_id, linha.nome_conjunto) if linha.veiculo_id else None
+    return IdentidadeMotorista(linha.id, linha.nome, linha.unidade, linha.veiculo_id, veiculo)
+
+
+def _carregar_usuario(usuario_id):
+    linha = db.session.query(Usuario.id, Usuario.nome, Usuario.role, Usuario.unidade)\
+        .filter(Usuario.id == usuario_id).first()
+    return IdentidadeUsuario(*linha) if linha else None
+
+
+CARREGADORES = {MOTORISTA: _carregar_motorista, USUARIO: _carregar_usuario}
+
+
+def obter_identidade(tipo, registro_id):
+    """
+    Identidade do registro, do cache do processo enquanto não expirar (IDENTIDADE_TTL_SEGUNDOS).
+    Edições feitas neste processo chamam invalidar_identidade(); nos demais processos
+    a alteração aparece ao expirar o TTL. Registros inexistentes não são guardados.
+    """
+    agora = time.monotonic()
+    with _trava:
+        guardado = _identidades.get((tipo, registro_id))
+    if guardado and guardado[0] > agora:
+        return guardado[1]
+
+    identidade = CARREGADORES[tipo](registro_id)
+    with _trava:
+        if identidade:
+            _identidades[(tipo, registro_id)] = (agora + current_app.config['IDENTIDADE_TTL_SEGUNDOS'], identidade)
+        else:
+            _identidades.pop((tipo, registro_id), None)
+    return identidade
+
+
+def invalidar_identidade(tipo, registro_id=None):
+    """Descarta a identidade guardada (ou todas as do tipo, sem 'registro_id')."""
+    with _trava:
+        for chave in [k for k in _identidades if k[0] == tipo and registro_id in (None, k[1])]:
+            del _identidades[chave]
+
+
+def carregar_identidade():
+    """
+    before_request: coloca em g.motorista e g.usuario a identidade de quem está logado
+    (ou None). Sessões de registros excluídos são encerradas, e o perfil e a unidade
+    guardados na sessão acompanham as alterações feitas no usuário.
+    """
+    g.motorista = g.usuario = None
+
+    if 'motorista_id' in session:
+        g.motorista = obter_identidade(MOTORISTA, session['motorista_id'])
+        if not g.motorista:
+            session.pop('motorista_id', None)
+
+    if 'user_id' in session:
+        g.usuario = obter_identidade(USUARIO, session['user_id'])
+        if not g.usuario:
+            for chave in ('user_id', 'admin_user', 'role', 'unidade'):
+                session.pop(chave, None)
+        elif (session.get('role'), session.get('unidade')) != (g.usuario.role, g.usuario.unidade):
+            session['role'] = g.usuario.role
+            session['unidade'] = g.usuario.unidade
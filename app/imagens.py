@@ -0,0 +1,93 @@
+import os
+from collections import namedtuple
+from flask import url_for
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .uploads import pasta_uploads
+
+# Larguras (px) das versões reduzidas geradas para as imagens dos conteúdos
+LARGURAS_DERIVADAS = (480, 960, 1600)
+
+# Formatos com derivadas: extensão do original -> (formato Pillow, opções de gravação)
+FORMATOS_ORIGINAIS = {
+    'jpg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'png': ('PNG', {'optimize': True}),
+}
+OPCOES_WEBP = {'quality': 75, 'method': 4}
+
+# srcset prontos para o template; strings vazias quando não há derivadas
+SrcsetImagem = namedtuple('SrcsetImagem', ['webp', 'original'])
+
+
+def _partes(nome):
+    raiz, extensao = os.path.splitext(nome)
+    return raiz, extensao.lower().lstrip('.')
+
+
+def nome_derivada(nome, largura, extensao):
+    """Nome da versão reduzida, ao lado do original: <nome>-<largura>.<extensao>."""
+    return f'{_partes(nome)[0]}-{largura}.{extensao}'
+
+
+def tem_derivadas(nome):
+    return _partes(nome)[1] in FORMATOS_ORIGINAIS
+
+
+def gerar_derivadas(caminho, refazer=False):
+    """
+    Gera, ao lado do original, as larguras de LARGURAS_DERIVADAS menores que a
+    imagem, em WebP e no formato original. A rotação do EXIF (fotos de celular) é
+    aplicada antes. Devolve as larguras geradas; arquivos existentes são mantidos
+    (salvo 'refazer'). Imagens inválidas não geram derivadas.
+    """
+    nome = os.path.basename(caminho)
+    extensao = _partes(nome)[1]
+    if extensao not in FORMATOS_ORIGINAIS:
+        return []
+    formato, opcoes = FORMATOS_ORIGINAIS[extensao]
+    pasta = os.path.dirname(caminho)
+
+    try:
+        imagem = Image.open(caminho)
+        # JPEG: decodifica já reduzido (escala do DCT), bem mais rápido para fotos grandes
+        imagem.draft('RGB', (max(LARGURAS_DERIVADAS), max(LARGURAS_DERIVADAS)))
+        imagem = ImageOps.exif_transpose(imagem)
+    except (UnidentifiedImageError, OSError):
+        return []
+    if formato == 'JPEG' or imagem.mode not in ('RGB', 'RGBA'):
+        imagem = imagem.convert('RGBA' if formato == 'PNG' else 'RGB')
+
+    geradas = []
+    # Da maior para a menor: cada redução parte da anterior
+    for largura in sorted((l for l in LARGURAS_DERIVADAS if l < imagem.width), reverse=True):
+        imagem = imagem.resize((largura, max(1, round(imagem.height * largura / imagem.width))), Image.LANCZOS)
+        for extensao_destino, formato_destino, opcoes_destino in (
+            ('webp', 'WEBP', OPCOES_WEBP), (extensao, formato, opcoes)
+        ):
+            destino = os.path.join(pasta, nome_derivada(nome, largura, extensao_destino))
+            if refazer or not os.path.exists(destino):
+                temporario = f'{destino}.{os.getpid()}.tmp'
+                imagem.save(temporario, format=formato_destino, **opcoes_destino)
+                os.replace(temporario, destino)
+        geradas.append(largura)
+    return sorted(geradas)
+
+
+def srcset_imagem(recurso_link):
+    """
+    Global Jinja: srcset das derivadas existentes de uma imagem em static/uploads
+    ('uploads/<nome>'), em WebP e no formato original.
+    """
+    if not recurso_link or not recurso_link.startswith('uploads/') or not tem_derivadas(recurso_link):
+        return SrcsetImagem('', '')
+    nome = recurso_link[len('uploads/'):]
+    pasta = pasta_uploads()
+    extensao = _partes(nome)[1]
+
+    candidatos = {'webp': [], extensao: []}
+    for largura in LARGURAS_DERIVADAS:
+        for formato, lista in candidatos.items():
+            derivada = nome_derivada(nome, largura, formato)
+            if os.path.exists(os.path.join(pasta, derivada)):
+                lista.append(f"{url_for('static', filename='uploads/' + derivada)} {largura}w")
+    return SrcsetImagem(', '.join(candidatos['webp']), ', '.join(candidatos[extensao]))
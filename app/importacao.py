@@ -0,0 +1,532 @@
+import csv
+import json
+import os
+import secrets
+import tempfile
+import time
+import pandas as pd
+from flask import current_app
+from openpyxl import load_workbook
+from sqlalchemy import insert, update
+from .extensions import db
+from .identidade import invalidar_identidade, MOTORISTA
+from .models import Motorista, Placa, Veiculo
+from .relatorios import TAMANHO_LOTE_IN
+from .tarefas import (pasta_tarefas, reportar_progresso, salvar_estado, ler_estado,
+                      resultado_valido, limpar_expiradas, CONCLUIDA)
+
+# Modos de comparação entre o valor do banco e o da planilha:
+# 'exato' - None no banco é diferente de texto vazio na planilha
+# 'vazio' - None no banco equivale a texto vazio (comparação como "valor or ''")
+# 'id'    - chaves estrangeiras, onde None equivale a ausência de placa
+EXATO, VAZIO, ID = 'exato', 'vazio', 'id'
+
+# Campos gravados por tipo de importação e o modo de comparação de cada um
+CAMPOS_MOTORISTA = {'nome': EXATO, 'unidade': EXATO, 'rg': EXATO, 'cnh': EXATO,
+                    'operacao': VAZIO, 'frota': VAZIO}
+CAMPOS_PLACA = {'tipo': VAZIO, 'unidade': VAZIO, 'operacao': VAZIO}
+CAMPOS_CONJUNTO = {'unidade': EXATO, 'operacao': EXATO, 'obs': EXATO,
+                   'placa_cavalo_id': ID, 'placa_carreta1_id': ID, 'placa_carreta2_id': ID}
+
+# Erros guardados em memória para exibição; os demais são apenas contados
+ERROS_EXIBIDOS = 5
+
+COLUNAS_OBRIGATORIAS = {
+    'motoristas': ['nome', 'cpf', 'unidade'],
+    'placas': ['numero', 'tipo', 'unidade'],
+    'conjuntos': ['nome_conjunto', 'unidade', 'placa_cavalo'],
+}
+
+
+class ErroImportacao(ValueError):
+    """O arquivo não pode ser importado (formato ou colunas inválidas)."""
+
+
+def salvar_upload_temporario(arquivo, pasta=None):
+    """Grava o arquivo enviado em disco, em blocos, sem manter o conteúdo inteiro na memória."""
+    extensao = os.path.splitext(arquivo.filename)[1].lower()
+    descritor, caminho = tempfile.mkstemp(prefix='importacao-', suffix=extensao, dir=pasta)
+    with os.fdopen(descritor, 'wb') as destino:
+        arquivo.save(destino)
+    return caminho
+
+
+def ler_blocos(caminho, tamanho_bloco):
+    """
+    Lê o CSV (separado por ';') ou XLSX em blocos de até 'tamanho_bloco' linhas, como texto.
+    O índice de cada bloco continua o do anterior, mantendo a numeração das linhas do arquivo.
+    """
+    if caminho.endswith('.csv'):
+        leitor = pd.read_csv(caminho, sep=';', dtype=str, keep_default_na=False, chunksize=tamanho_bloco)
+        with leitor:
+            for bloco in leitor:
+                yield normalizar_planilha(bloco)
+    else:
+        yield from _blocos_xlsx(caminho, tamanho_bloco)
+
+
+def _texto_celula(valor):
+    """Converte o valor da célula como o read_excel(dtype=str): inteiros sem '.0', vazio para None."""
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+
+def _blocos_xlsx(caminho, tamanho_bloco):
+    """Percorre a primeira aba em modo somente leitura (linha a linha, sem carregar a planilha)."""
+    livro = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        linhas = livro.worksheets[0].iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = [_texto_celula(c) for c in cabecalho]
+
+        valores, indices = [], []
+        emitidos = 0
+        # O índice segue a numeração do CSV: linha 2 do arquivo = índice 0
+        for indice, linha in enumerate(linhas):
+            # Linhas totalmente vazias são puladas, como no read_csv
+            if all(v is None or v == '' for v in linha):
+                continue
+            linha = [_texto_celula(v) for v in linha[:len(colunas)]]
+            valores.append(linha + [''] * (len(colunas) - len(linha)))
+            indices.append(indice)
+            if len(valores) >= tamanho_bloco:
+                yield normalizar_planilha(pd.DataFrame(valores, columns=colunas, index=indices, dtype=object))
+                valores, indices = [], []
+                emitidos += 1
+
+        # Um arquivo só com cabeçalho ainda gera um bloco (vazio) para a validação das colunas
+        if valores or not emitidos:
+            yield normalizar_planilha(pd.DataFrame(valores, columns=colunas, index=indices, dtype=object))
+    finally:
+        livro.close()
+
+
+def normalizar_planilha(df):
+    df.columns = df.columns.str.strip().str.lower()
+    for coluna in df.columns:
+        if pd.api.types.is_string_dtype(df[coluna]):
+            df[coluna] = df[coluna].str.strip()
+    return df
+
+
+def validar_colunas(df, tipo):
+    obrigatorias = COLUNAS_OBRIGATORIAS[tipo]
+    if not all(col in df.columns for col in obrigatorias):
+        raise ErroImportacao(f'Arquivo de {tipo} deve conter as colunas: {", ".join(obrigatorias)}.')
+
+
+def _coluna(df, nome):
+    """Coluna opcional da planilha: ausente equivale a texto vazio."""
+    return df[nome] if nome in df.columns else pd.Series('', index=df.index, dtype=object)
+
+
+def _diferencas(base, novo, campos):
+    """DataFrame booleano indicando, por campo, onde o valor da planilha difere do valor base."""
+    resultado = {}
+    for campo, modo in campos.items():
+        a, b = base[campo], novo[campo]
+        if modo == ID:
+            diferente = a.astype('Float64').fillna(-1) != b.astype('Float64').fillna(-1)
+        elif modo == VAZIO:
+            diferente = a.astype(object).where(a.notna(), '') != b.astype(object).where(b.notna(), '')
+        else:
+            # Os valores da planilha nunca são nulos: None no banco sempre conta como diferença
+            diferente = a.isna() | (a != b)
+        resultado[campo] = diferente.to_numpy()
+    return pd.DataFrame(resultado, index=novo.index)
+
+
+def _em_lotes_in(consulta, coluna, valores):
+    """Executa a consulta filtrando 'coluna IN valores' em lotes, respeitando o limite de parâmetros."""
+    valores = list(dict.fromkeys(valores))
+    linhas = []
+    for i in range(0, len(valores), TAMANHO_LOTE_IN):
+        linhas += consulta.filter(coluna.in_(valores[i:i + TAMANHO_LOTE_IN])).all()
+    return linhas
+
+
+def _snapshot(modelo, chave, campos, chaves):
+    """Carrega id e campos dos registros cujas chaves aparecem no bloco."""
+    colunas = [getattr(modelo, chave), modelo.id] + [getattr(modelo, c) for c in campos]
+    linhas = _em_lotes_in(db.session.query(*colunas), getattr(modelo, chave), chaves)
+    return pd.DataFrame(linhas, columns=[chave, 'id'] + list(campos), dtype=object).set_index(chave)
+
+
+def _registros(df):
+    """Converte o DataFrame em lista de dicionários, com None no lugar de valores ausentes."""
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict('records')
+
+
+def _planejar(modelo, validos, chave, campos):
+    """
+    Compara as linhas válidas com o banco e devolve o plano de gravação, sem gravar nada:
+    contagem, registros novos, atualizações (com o valor atual de cada registro) e a lista
+    de alterações campo a campo.
+
+    As linhas são avaliadas na ordem do arquivo: a primeira ocorrência de uma chave é
+    comparada com o banco e as seguintes com a ocorrência anterior, o que mantém a
+    contagem de adicionados/atualizados/ignorados da importação linha a linha.
+    """
+    plano = {'adicionados': 0, 'atualizados': 0, 'ignorados': 0,
+             'novos': [], 'atualizacoes': [], 'antes': [], 'alteracoes': []}
+    if validos.empty:
+        return plano
+
+    banco = _snapshot(modelo, chave, campos, validos[chave])
+    lista_campos = list(campos)
+
+    primeira = ~validos.duplicated(chave, keep='first')
+    existe = validos[chave].isin(banco.index)
+
+    # Valor de referência de cada linha: o banco (1ª ocorrência) ou a linha anterior
+    anterior = validos.groupby(chave, sort=False)[lista_campos].shift(1)
+    do_banco = banco.reindex(validos[chave])[lista_campos].set_index(validos.index)
+    base = anterior.astype(object).mask(primeira, do_banco.astype(object), axis=0)
+
+    inserida = primeira & ~existe
+    diferencas = _diferencas(base, validos, campos)
+    alterada = diferencas.any(axis=1) & ~inserida
+
+    plano['adicionados'] = int(inserida.sum())
+    plano['atualizados'] = int(alterada.sum())
+    plano['ignorados'] = int((~inserida & ~alterada).sum())
+
+    # Estado final de cada chave: a última ocorrência, na ordem da primeira aparição no arquivo
+    ordem = validos[chave].drop_duplicates()
+    finais = validos.drop_duplicates(chave, keep='last').set_index(chave).loc[ordem, lista_campos]
+
+    plano['novos'] = _registros(finais[~finais.index.isin(banco.index)].reset_index())
+
+    existentes = finais[finais.index.isin(banco.index)]
+    if not existentes.empty:
+        # Campo gravado se alguma ocorrência o alterou; os demais mantêm o valor do banco
+        mudou = diferencas.groupby(validos[chave].to_numpy(), sort=False).any().loc[existentes.index]
+        alterados = mudou.any(axis=1).to_numpy()
+        if alterados.any():
+            atuais = banco.loc[existentes.index, lista_campos].astype(object)
+            mesclado = existentes.astype(object).where(mudou.to_numpy(), atuais)[alterados]
+            ids = banco.loc[mesclado.index, 'id'].to_numpy()
+            plano['atualizacoes'] = _registros(mesclado.assign(id=ids))
+            plano['antes'] = _registros(atuais[alterados].assign(id=ids))
+
+            pares = mudou[alterados].stack()
+            for chave_registro, campo in pares[pares].index:
+                plano['alteracoes'].append({
+                    'chave': chave_registro, 'campo': campo,
+                    'de': atuais.at[chave_registro, campo], 'para': mesclado.at[chave_registro, campo],
+                })
+            plano['alteracoes'] = _registros(pd.DataFrame(plano['alteracoes']))
+
+    return plano
+
+
+def _aplicar(modelo, novos, atualizacoes):
+    """Grava o plano com INSERT/UPDATE em lote (executemany)."""
+    if novos:
+        db.session.execute(insert(modelo), novos)
+    if atualizacoes:
+        db.session.execute(update(modelo), atualizacoes)
+
+
+def _erros_linha(df, mascara, mensagem):
+    """Lista [(linha do arquivo, mensagem)] das linhas marcadas; 'mensagem' pode ser uma função da linha."""
+    if callable(mensagem):
+        return [(indice + 2, mensagem(linha)) for indice, linha in df[mascara].iterrows()]
+    return [(indice + 2, mensagem) for indice in df.index[mascara]]
+
+
+def formatar_erro(erro):
+    linha, mensagem = erro
+    return f'Linha {linha}: {mensagem}'
+
+
+def planejar_motoristas(df):
+    validar_colunas(df, 'motoristas')
+
+    invalidos = (df['cpf'] == '') | (df['nome'] == '') | (df['unidade'] == '')
+    erros = _erros_linha(df, invalidos, 'Faltando dados obrigatórios (nome, cpf, unidade).')
+
+    validos = df.loc[~invalidos, ['cpf', 'nome', 'unidade']].copy()
+    validos['rg'] = _coluna(df, 'rg')[~invalidos]
+    validos['cnh'] = _coluna(df, 'cnh')[~invalidos]
+    # A coluna 'frota' da planilha alimenta os campos 'operacao' e 'frota' do banco
+    validos['operacao'] = _coluna(df, 'frota')[~invalidos]
+    validos['frota'] = validos['operacao']
+
+    # Motoristas novos ficam sem hash: o check_password aceita a senha padrão
+    # (6 primeiros dígitos do CPF), o que evita calcular um hash por linha
+    plano = _planejar(Motorista, validos, 'cpf', CAMPOS_MOTORISTA)
+    plano['invalidos'] = int(invalidos.sum())
+    plano['ignorados'] += plano['invalidos']
+    plano['erros'] = sorted(erros, key=lambda e: e[0])
+    return plano
+
+
+def planejar_placas(df):
+    validar_colunas(df, 'placas')
+
+    numero = df['numero'].str.upper()
+    tipo = df['tipo'].str.upper()
+
+    faltando = (numero == '') | (tipo == '') | (df['unidade'] == '')
+    tipo_invalido = ~faltando & ~tipo.isin(['CAVALO', 'CARRETA'])
+    erros = _erros_linha(df, faltando, 'Faltando dados obrigatórios (numero, tipo, unidade).')
+    erros += _erros_linha(df, tipo_invalido,
+                          lambda linha: f"Tipo de placa '{linha['tipo']}' inválido. Use 'CAVALO' ou 'CARRETA'.")
+
+    ok = ~faltando & ~tipo_invalido
+    validos = pd.DataFrame({
+        'numero': numero[ok],
+        'tipo': tipo[ok],
+        'unidade': df['unidade'][ok],
+        'operacao': _coluna(df, 'operacao')[ok],
+    })
+
+    plano = _planejar(Placa, validos, 'numero', CAMPOS_PLACA)
+    plano['invalidos'] = int((faltando | tipo_invalido).sum())
+    plano['ignorados'] += plano['invalidos']
+    plano['erros'] = sorted(erros, key=lambda e: e[0])
+    return plano
+
+
+def planejar_conjuntos(df):
+    validar_colunas(df, 'conjuntos')
+
+    faltando = (df['nome_conjunto'] == '') | (df['unidade'] == '') | (df['placa_cavalo'] == '')
+    erros = [(i, 0, msg) for i, msg in _erros_linha(
+        df, faltando, 'Faltando dados obrigatórios (nome_conjunto, unidade, placa_cavalo).')]
+
+    cavalo_num = df['placa_cavalo'].str.upper()
+    carreta1_num = _coluna(df, 'placa_carreta1').str.upper()
+    carreta2_num = _coluna(df, 'placa_carreta2').str.upper()
+
+    # Placas citadas no bloco: {numero: id}
+    numeros = pd.concat([cavalo_num, carreta1_num, carreta2_num])
+    placas = pd.Series(dict(_em_lotes_in(
+        db.session.query(Placa.numero, Placa.id), Placa.numero, numeros[numeros != '']
+    )), dtype=object)
+
+    cavalo_id = cavalo_num.map(placas)
+    carreta1_id = carreta1_num.map(placas)
+    carreta2_id = carreta2_num.map(placas)
+
+    sem_cavalo = ~faltando & cavalo_id.isna()
+    erros += [(i, 0, msg) for i, msg in _erros_linha(
+        df, sem_cavalo, lambda linha: f"Placa cavalo '{linha['placa_cavalo'].upper()}' não encontrada no banco.")]
+
+    ok = ~faltando & ~sem_cavalo
+    # Carretas não encontradas são reportadas, mas o conjunto é gravado sem elas
+    sem_carreta1 = ok & (carreta1_num != '') & carreta1_id.isna()
+    sem_carreta2 = ok & (carreta2_num != '') & carreta2_id.isna()
+    erros += [(i, 1, msg) for i, msg in _erros_linha(
+        df, sem_carreta1, lambda linha: f"Placa carreta 1 '{linha['placa_carreta1'].upper()}' não encontrada.")]
+    erros += [(i, 2, msg) for i, msg in _erros_linha(
+        df, sem_carreta2, lambda linha: f"Placa carreta 2 '{linha['placa_carreta2'].upper()}' não encontrada.")]
+
+    validos = pd.DataFrame({
+        'nome_conjunto': df['nome_conjunto'][ok],
+        'unidade': df['unidade'][ok],
+        'operacao': _coluna(df, 'operacao')[ok],
+        'obs': _coluna(df, 'obs')[ok],
+        'placa_cavalo_id': cavalo_id[ok],
+        'placa_carreta1_id': carreta1_id[ok],
+        'placa_carreta2_id': carreta2_id[ok],
+    })
+
+    plano = _planejar(Veiculo, validos, 'nome_conjunto', CAMPOS_CONJUNTO)
+    plano['invalidos'] = int((faltando | sem_cavalo).sum())
+    plano['ignorados'] += plano['invalidos']
+    plano['erros'] = [(linha, msg) for linha, _, msg in sorted(erros, key=lambda e: (e[0], e[1]))]
+    return plano
+
+
+# Por tipo de importação: (modelo, coluna chave, campos comparados, função que monta o plano)
+TIPOS_IMPORTACAO = {
+    'motoristas': (Motorista, 'cpf', CAMPOS_MOTORISTA, planejar_motoristas),
+    'placas': (Placa, 'numero', CAMPOS_PLACA, planejar_placas),
+    'conjuntos': (Veiculo, 'nome_conjunto', CAMPOS_CONJUNTO, planejar_conjuntos),
+}
+
+
+def planejar(tipo, df):
+    """Valida e compara as linhas com o banco, sem gravar. Devolve o plano com contagem e erros."""
+    if tipo not in TIPOS_IMPORTACAO:
+        raise ErroImportacao(f'Tipo de importação desconhecido: {tipo}.')
+    return TIPOS_IMPORTACAO[tipo][3](df)
+
+
+def importar(tipo, df):
+    """Executa a importação do tipo informado e devolve a contagem e a lista de erros."""
+    plano = planejar(tipo, df)
+    _aplicar(TIPOS_IMPORTACAO[tipo][0], plano['novos'], plano['atualizacoes'])
+    return plano
+
+
+def importar_arquivo(tipo, caminho, tamanho_bloco, ao_gravar_bloco=None):
+    """
+    Importa o arquivo bloco a bloco, com um commit por bloco: a memória usada não depende
+    do tamanho do arquivo e o banco não fica bloqueado durante toda a importação.
+    Devolve os totais, os primeiros erros (ERROS_EXIBIDOS) e o total de erros.
+    'ao_gravar_bloco', se informado, é chamado com (resultado do bloco, linhas gravadas até aqui).
+    """
+    totais = {'adicionados': 0, 'atualizados': 0, 'ignorados': 0, 'erros': [], 'total_erros': 0}
+    gravadas = 0
+    for bloco in ler_blocos(caminho, tamanho_bloco):
+        try:
+            resultado = importar(tipo, bloco)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if gravadas and not isinstance(e, ErroImportacao):
+                raise ErroImportacao(
+                    f'Ocorreu um erro inesperado ao processar o arquivo: {e}. '
+                    f'As {gravadas} primeiras linhas já foram gravadas.'
+                ) from e
+            raise
+        # Libera os objetos carregados no bloco
+        db.session.expunge_all()
+        gravadas += len(bloco)
+
+        for campo in ('adicionados', 'atualizados', 'ignorados'):
+            totais[campo] += resultado[campo]
+        totais['total_erros'] += len(resultado['erros'])
+        totais['erros'] += resultado['erros'][:ERROS_EXIBIDOS - len(totais['erros'])]
+        if ao_gravar_bloco:
+            ao_gravar_bloco(resultado, gravadas)
+    return totais
+
+
+def contar_linhas(caminho):
+    """Número aproximado de linhas de dados do arquivo, usado no percentual de progresso."""
+    if caminho.endswith('.csv'):
+        quebras = 0
+        with open(caminho, 'rb') as f:
+            for pedaco in iter(lambda: f.read(1024 * 1024), b''):
+                quebras += pedaco.count(b'\n')
+        return max(quebras - 1, 0)
+    livro = load_workbook(caminho, read_only=True)
+    try:
+        return max((livro.worksheets[0].max_row or 1) - 1, 0)
+    finally:
+        livro.close()
+
+
+def executar_tarefa_importacao(tarefa_id, parametros):
+    """
+    Tarefa em segundo plano: importa o arquivo enviado, registra o andamento
+    (linhas processadas e linhas por segundo) e grava todos os erros em um CSV.
+    """
+    caminho = parametros['arquivo']
+    destino_erros = os.path.join(pasta_tarefas(), f'{tarefa_id}_erros.csv')
+    try:
+        total = contar_linhas(caminho)
+        inicio = time.time()
+        salvar_estado(tarefa_id, total_linhas=total, linhas_processadas=0, mensagem=f'Importando {total} linha(s)')
+
+        with open(destino_erros, 'w', newline='', encoding='utf-8-sig') as arquivo_erros:
+            escritor = csv.writer(arquivo_erros, delimiter=';')
+            escritor.writerow(['linha', 'erro'])
+
+            def ao_gravar_bloco(resultado, gravadas):
+                escritor.writerows(resultado['erros'])
+                decorrido = time.time() - inicio
+                reportar_progresso(
+                    tarefa_id, min(gravadas, total), total,
+                    mensagem=f'{gravadas} de {total} linha(s) processada(s)',
+                    linhas_processadas=gravadas,
+                    linhas_por_segundo=round(gravadas / decorrido, 1) if decorrido else None,
+                )
+
+            totais = importar_arquivo(
+                parametros['tipo'], caminho, current_app.config['IMPORTACAO_TAMANHO_LOTE'], ao_gravar_bloco
+            )
+
+        # Motoristas podem ter mudado de unidade ou veículo (o processo web descarta
+        # as suas ao ler a tarefa concluída, em status_importacao)
+        invalidar_identidade(MOTORISTA)
+        totais['erros'] = [formatar_erro(erro) for erro in totais['erros']]
+        salvar_estado(tarefa_id, arquivo=destino_erros, resultado=totais)
+    finally:
+        os.remove(caminho)
+
+
+# --- PRÉVIA (DRY-RUN) ---
+
+def gerar_previa(tipo, caminho, nome_arquivo, tamanho_bloco, ttl):
+    """
+    Compara o arquivo inteiro com o banco sem gravar nada (apenas leituras) e guarda
+    o plano em disco, para que a confirmação aplique o mesmo plano sem reprocessar
+    o arquivo. Devolve o ID da prévia.
+    """
+    limpar_expiradas(ttl, tipo='previa_importacao')
+
+    blocos = list(ler_blocos(caminho, tamanho_bloco))
+    try:
+        plano = planejar(tipo, pd.concat(blocos) if len(blocos) > 1 else blocos[0])
+    finally:
+        # Encerra a transação de leitura aberta pelas consultas
+        db.session.rollback()
+
+    previa_id = secrets.token_hex(16)
+    destino = os.path.join(pasta_tarefas(), f'{previa_id}_previa.json')
+    with open(destino, 'w', encoding='utf-8') as f:
+        json.dump(plano, f, ensure_ascii=False)
+    salvar_estado(previa_id, tipo='previa_importacao', status=CONCLUIDA, arquivo=destino,
+                  concluida_em=time.time(), tipo_importacao=tipo, nome_arquivo=nome_arquivo)
+    return previa_id
+
+
+def carregar_previa(previa_id, ttl):
+    """Devolve (estado, plano) da prévia, ou (None, None) se ela não existir ou tiver expirado."""
+    estado = ler_estado(previa_id)
+    if not resultado_valido(estado, ttl) or estado.get('tipo') != 'previa_importacao':
+        return None, None
+    with open(estado['arquivo'], encoding='utf-8') as f:
+        return estado, json.load(f)
+
+
+def _verificar_plano(modelo, chave, campos, plano):
+    """Confere se os registros envolvidos continuam como estavam quando a prévia foi gerada."""
+    coluna_chave = getattr(modelo, chave)
+    if _em_lotes_in(db.session.query(coluna_chave), coluna_chave, [r[chave] for r in plano['novos']]):
+        return False
+
+    antes = {registro['id']: registro for registro in plano['antes']}
+    colunas = [modelo.id] + [getattr(modelo, c) for c in campos]
+    atuais = _em_lotes_in(db.session.query(*colunas), modelo.id, list(antes))
+    if len(atuais) != len(antes):
+        return False
+    return all(
+        all(linha[i + 1] == antes[linha[0]][campo] for i, campo in enumerate(campos))
+        for linha in atuais
+    )
+
+
+def aplicar_previa(previa_id, ttl, tamanho_lote):
+    """
+    Grava o plano de uma prévia, em lotes de 'tamanho_lote' registros por transação.
+    Se os registros envolvidos mudaram desde a prévia, nada é gravado.
+    """
+    estado, plano = carregar_previa(previa_id, ttl)
+    if not plano:
+        raise ErroImportacao('A prévia expirou ou não foi encontrada. Envie o arquivo novamente.')
+
+    modelo, chave, campos, _ = TIPOS_IMPORTACAO[estado['tipo_importacao']]
+    if not _verificar_plano(modelo, chave, campos, plano):
+        db.session.rollback()
+        raise ErroImportacao('Os dados foram alterados desde a prévia. Gere a prévia novamente antes de aplicar.')
+
+    novos, atualizacoes = plano['novos'], plano['atualizacoes']
+    for i in range(0, max(len(novos), len(atualizacoes)), tamanho_lote):
+        _aplicar(modelo, novos[i:i + tamanho_lote], atualizacoes[i:i + tamanho_lote])
+        db.session.commit()
+
+    for caminho in (estado['arquivo'], os.path.join(pasta_tarefas(), f'{previa_id}.json')):
+        os.remove(caminho)
+    return estado, plano
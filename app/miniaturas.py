@@ -0,0 +1,82 @@
+import os
+import re
+from flask import current_app, url_for
+from pdf2image import convert_from_path
+from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+from . import tarefas
+
+# Miniaturas da primeira página dos PDFs: <hash do PDF>.webp
+REGEX_CHAVE_MINIATURA = re.compile(r'^[0-9a-f]{64}$')
+
+# Tempo em que o estado da tarefa de geração fica guardado (a miniatura em si não expira)
+MINIATURA_TAREFA_TTL = 3600
+
+
+class MiniaturaIndisponivel(Exception):
+    """A primeira página do PDF não pôde ser renderizada."""
+
+
+def pasta_miniaturas():
+    """Diretório das miniaturas (fora de static: o acesso exige login, como os documentos)."""
+    pasta = current_app.config.get('MINIATURAS_FOLDER') or os.path.join(current_app.instance_path, 'miniaturas')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def e_chave_miniatura(chave):
+    return bool(chave) and bool(REGEX_CHAVE_MINIATURA.match(chave))
+
+
+def caminho_miniatura(chave):
+    if not e_chave_miniatura(chave):
+        raise MiniaturaIndisponivel('Referência de miniatura inválida.')
+    return os.path.join(pasta_miniaturas(), chave[:2], f'{chave}.webp')
+
+
+def gerar_miniatura(caminho_pdf, chave):
+    """
+    Renderiza a primeira página do PDF na largura MINIATURA_LARGURA e grava em WebP,
+    endereçada pelo hash do PDF (conteúdo igual gera a miniatura uma única vez).
+    """
+    destino = caminho_miniatura(chave)
+    if os.path.exists(destino):
+        return destino
+    largura = current_app.config.get('MINIATURA_LARGURA', 240)
+    try:
+        paginas = convert_from_path(caminho_pdf, first_page=1, last_page=1, size=(largura, None))
+    except (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError, OSError) as e:
+        raise MiniaturaIndisponivel(f'Não foi possível renderizar o PDF: {e}')
+    if not paginas:
+        raise MiniaturaIndisponivel('O PDF não tem páginas.')
+
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    paginas[0].convert('RGB').save(temporario, format='WEBP', quality=70, method=4)
+    os.replace(temporario, destino)
+    return destino
+
+
+def executar_tarefa_miniatura(tarefa_id, parametros):
+    """Tarefa em segundo plano (app/tarefas.py) que gera a miniatura de um PDF enviado."""
+    tarefas.salvar_estado(tarefa_id, mensagem='Renderizando a primeira página')
+    gerar_miniatura(parametros['caminho'], parametros['chave'])
+
+
+def solicitar_miniatura(caminho_pdf, chave):
+    """
+    Enfileira a geração da miniatura no pool de tarefas, sem atrasar o upload.
+    Não faz nada se a miniatura deste conteúdo já existir.
+    """
+    if not e_chave_miniatura(chave) or os.path.exists(caminho_miniatura(chave)):
+        return None
+    return tarefas.submeter(
+        'miniatura_pdf', {'caminho': os.path.abspath(caminho_pdf), 'chave': chave},
+        executar_tarefa_miniatura, ttl=MINIATURA_TAREFA_TTL
+    )
+
+
+def url_miniatura(chave):
+    """Global Jinja: URL da miniatura do PDF, ou None se ainda não foi gerada."""
+    if not e_chave_miniatura(chave) or not os.path.exists(caminho_miniatura(chave)):
+        return None
+    return url_for('main.ver_miniatura', chave=chave)
@@ -1,6 +1,8 @@
 from .extensions import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+from werkzeug.security import check_password_hash
+from .autenticacao import gerar_hash_senha
 
 # --- TABELAS PRINCIPAIS ---
 
@@ -19,12 +21,16 @@ class Motorista(db.Model):
     assinaturas = db.relationship('Assinatura', backref='motorista', lazy=True, cascade="all, delete-orphan")
     checklists_preenchidos = db.relationship('ChecklistPreenchido', backref='motorista', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_motorista_nome', 'nome'),
+    )
+
     def set_password(self, password):
         if password:
-            self.password_hash = generate_password_hash(password)
+            self.password_hash = gerar_hash_senha(password)
         else:
             if self.cpf:
-                self.password_hash = generate_password_hash(self.cpf[:6])
+                self.password_hash = gerar_hash_senha(self.cpf[:6])
 
     def check_password(self, password):
         if self.password_hash:
@@ -43,9 +49,17 @@ class Conteudo(db.Model):
     resposta_correta = db.Column(db.String(100), nullable=False)
     tipo_recurso = db.Column(db.String(10), nullable=False, default='link')
     recurso_link = db.Column(db.String(500))
+    # Metadados do arquivo enviado (tipo_recurso 'arquivo'; ver app/uploads.py)
+    hash_conteudo = db.Column(db.String(64), nullable=True)
+    tamanho = db.Column(db.Integer, nullable=True)
+    tipo_mime = db.Column(db.String(100), nullable=True)
     
     assinaturas = db.relationship('Assinatura', backref='conteudo', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_conteudo_data', 'data'),
+    )
+
 # --- TABELAS DE RELACIONAMENTO ---
 
 class Assinatura(db.Model):
@@ -57,6 +71,11 @@ class Assinatura(db.Model):
     resposta_motorista = db.Column(db.String(100))
     assinatura_imagem = db.Column(db.Text, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_assinatura_motorista_conteudo', 'motorista_id', 'conteudo_id'),
+        db.Index('ix_assinatura_conteudo_data', 'conteudo_id', 'data_assinatura'),
+    )
+
 # --- ESTRUTURA PARA VEÍCULOS ---
 
 class Placa(db.Model):
@@ -94,19 +113,54 @@ class Checklist(db.Model):
     revisao = db.Column(db.String(20), nullable=False)
     data = db.Column(db.Date, nullable=False)
     ativo = db.Column(db.Boolean, default=True, nullable=False)
+    # Incrementada a cada alteração nos itens (chave do cache da árvore, app/arvore_checklist.py)
+    versao_itens = db.Column(db.Integer, nullable=False, default=0, server_default=db.text('0'))
 
     itens = db.relationship('ChecklistItem', backref='checklist', lazy='dynamic', cascade="all, delete-orphan")
+    # Leitura não dinâmica dos itens (aceita selectinload; ver app/carregamento.py)
+    lista_itens = db.relationship('ChecklistItem', viewonly=True,
+                                  order_by='(ChecklistItem.chave_ordem, ChecklistItem.id)')
     preenchimentos = db.relationship('ChecklistPreenchido', backref='checklist', lazy=True, cascade="all, delete-orphan")
 
+# Largura de cada parte numérica da ordem em chave_ordem (comporta até 9 dígitos)
+LARGURA_PARTE_ORDEM = 9
+
+
+def calcular_chave_ordem(ordem):
+    """
+    Chave textual que ordena a 'ordem' dos itens de forma natural em SQL:
+    '2.2' -> '000000002.000000002', que fica antes de '2.10' -> '000000002.000000010'.
+    Partes não numéricas recebem o prefixo '~' e ficam depois das numéricas.
+    """
+    partes = str(ordem if ordem is not None else '0').replace(',', '.').split('.')
+    return '.'.join(
+        p.strip().zfill(LARGURA_PARTE_ORDEM) if p.strip().isdigit() else '~' + p.strip()
+        for p in partes
+    )
+
+
 class ChecklistItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     checklist_id = db.Column(db.Integer, db.ForeignKey('checklist.id'), nullable=False)
     texto = db.Column(db.String(500), nullable=False)
     # CORRIGIDO: Usa String para preservar o formato exato (ex: 2.10)
     ordem = db.Column(db.String(20), nullable=False, default='0')
+    # Derivada de 'ordem' (ver calcular_chave_ordem); é a coluna usada no ORDER BY
+    chave_ordem = db.Column(db.String(100), nullable=False, default=calcular_chave_ordem('0'))
     
     parent_id = db.Column(db.Integer, db.ForeignKey('checklist_item.id'), nullable=True)
     sub_itens = db.relationship('ChecklistItem', backref=db.backref('parent', remote_side=[id]), lazy='dynamic', cascade="all, delete-orphan")
+    lista_sub_itens = db.relationship('ChecklistItem', viewonly=True,
+                                      order_by='(ChecklistItem.chave_ordem, ChecklistItem.id)')
+
+    __table_args__ = (
+        db.Index('ix_checklist_item_arvore', 'checklist_id', 'parent_id', 'chave_ordem'),
+    )
+
+    @validates('ordem')
+    def _atualizar_chave_ordem(self, chave, valor):
+        self.chave_ordem = calcular_chave_ordem(valor)
+        return valor
 
 class ChecklistPreenchido(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -120,9 +174,23 @@ class ChecklistPreenchido(db.Model):
     outros_problemas = db.Column(db.Text, nullable=True)
     solucoes_adotadas = db.Column(db.Text, nullable=True)
     pendencias_gerais = db.Column(db.Text, nullable=True)
+    # Chave gerada pelo aplicativo no envio em lote (offline): reenvios não duplicam o registro
+    chave_envio = db.Column(db.String(64), nullable=True)
 
     respostas = db.relationship('ChecklistResposta', backref='preenchimento', lazy='dynamic', cascade="all, delete-orphan")
     extintores = db.relationship('ExtintorCheck', backref='preenchimento', lazy='dynamic', cascade="all, delete-orphan")
+    # Leitura não dinâmica das respostas e extintores (aceita selectinload)
+    lista_respostas = db.relationship('ChecklistResposta', viewonly=True, order_by='ChecklistResposta.id')
+    lista_extintores = db.relationship('ExtintorCheck', viewonly=True, order_by='ExtintorCheck.id')
+
+    # Índice de cobertura para o acompanhamento diário: filtra por checklist e faixa
+    # de data e já entrega o motorista_id sem consultar a tabela.
+    __table_args__ = (
+        db.Index('ix_checklist_preenchido_checklist_data', 'checklist_id', 'data_preenchimento', 'motorista_id'),
+        db.Index('ix_checklist_preenchido_motorista_checklist_data', 'motorista_id', 'checklist_id', 'data_preenchimento'),
+        db.Index('ix_checklist_preenchido_data', 'data_preenchimento'),
+        db.UniqueConstraint('chave_envio', name='uq_checklist_preenchido_chave_envio'),
+    )
 
 class ChecklistResposta(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -134,6 +202,10 @@ class ChecklistResposta(db.Model):
     item = db.relationship('ChecklistItem')
     pendencia = db.relationship('Pendencia', backref='resposta_abertura', uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_checklist_resposta_preenchimento_item', 'preenchimento_id', 'item_id'),
+    )
+
 # --- NOVA TABELA PARA EXTINTORES ---
 class ExtintorCheck(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -160,6 +232,11 @@ class Pendencia(db.Model):
 
     item = db.relationship('ChecklistItem')
 
+    __table_args__ = (
+        db.Index('ix_pendencia_veiculo_status_item', 'veiculo_id', 'status', 'item_id'),
+        db.Index('ix_pendencia_status_data', 'status', 'data_criacao'),
+    )
+
 # --- ESTRUTURA PARA DOCUMENTOS FIXOS ---
 
 class DocumentoFixo(db.Model):
@@ -168,6 +245,10 @@ class DocumentoFixo(db.Model):
     descricao = db.Column(db.Text, nullable=True)
     nome_arquivo = db.Column(db.String(255), nullable=False)
     data_upload = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # O arquivo é gravado pelo hash do conteúdo: vários documentos podem compartilhar o mesmo arquivo
+    hash_conteudo = db.Column(db.String(64), nullable=True)
+    tamanho = db.Column(db.Integer, nullable=True)
+    tipo_mime = db.Column(db.String(100), nullable=True)
 
 # --- ESTRUTURA PARA USUÁRIOS DO SISTEMA ---
 
@@ -186,7 +267,7 @@ class Usuario(db.Model):
 
     @password.setter
     def password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = gerar_hash_senha(password)
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
@@ -0,0 +1,98 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import date, datetime
+from flask import request, url_for
+from sqlalchemy import and_, or_
+
+# Itens por página nas listagens (o parâmetro ?por_pagina= é limitado ao máximo)
+TAMANHO_PAGINA_PADRAO = 50
+TAMANHO_PAGINA_MAX = 200
+
+# itens: registros da página; proximo_cursor: cursor da página seguinte (None na última);
+# parametro: nome do argumento da URL que carrega o cursor; primeira: se é a página inicial
+Pagina = namedtuple('Pagina', ['itens', 'proximo_cursor', 'parametro', 'primeira'])
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    return valor
+
+
+def _desserializar(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        return date.fromisoformat(valor['d'])
+    return valor
+
+
+def codificar_cursor(valores):
+    """Codifica os valores da chave de ordenação do último item em um texto seguro para URL."""
+    texto = json.dumps([_serializar(v) for v in valores], separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor, quantidade):
+    """Valores da chave contidos no cursor, ou None se ausente ou inválido (volta à primeira página)."""
+    if not cursor:
+        return None
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        valores = [_desserializar(v) for v in json.loads(texto)]
+    except (binascii.Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        return None
+    if len(valores) != quantidade or any(v is None for v in valores):
+        return None
+    return valores
+
+
+def tamanho_pagina(padrao=TAMANHO_PAGINA_PADRAO):
+    try:
+        valor = int(request.args.get('por_pagina', padrao))
+    except ValueError:
+        valor = padrao
+    return min(max(valor, 1), TAMANHO_PAGINA_MAX)
+
+
+def _depois_de(colunas, valores, descendente):
+    """(c1, c2, ...) posterior a (v1, v2, ...) na ordenação: c1 > v1 OR (c1 = v1 AND c2 > v2) ..."""
+    condicoes = []
+    for i, (coluna, valor) in enumerate(zip(colunas, valores)):
+        iguais = [c == v for c, v in zip(colunas[:i], valores[:i])]
+        condicoes.append(and_(*iguais, coluna < valor if descendente else coluna > valor))
+    return or_(*condicoes)
+
+
+def paginar(query, colunas, descendente=False, parametro='cursor', por_pagina=None):
+    """
+    Paginação por chave (keyset): em vez de OFFSET, filtra os registros posteriores
+    ao último item exibido. O custo de cada página não cresce com o histórico, desde
+    que exista índice para a ordenação. A última coluna deve ser única (ex.: id).
+    """
+    por_pagina = por_pagina or tamanho_pagina()
+    valores = decodificar_cursor(request.args.get(parametro), len(colunas))
+    if valores:
+        query = query.filter(_depois_de(colunas, valores, descendente))
+
+    ordem = [c.desc() if descendente else c.asc() for c in colunas]
+    itens = query.order_by(*ordem).limit(por_pagina + 1).all()
+
+    proximo_cursor = None
+    if len(itens) > por_pagina:
+        itens = itens[:por_pagina]
+        proximo_cursor = codificar_cursor([getattr(itens[-1], c.key) for c in colunas])
+    return Pagina(itens, proximo_cursor, parametro, not valores)
+
+
+def url_pagina(parametro, cursor):
+    """URL da página atual com o cursor informado (None volta ao início), mantendo os demais filtros."""
+    argumentos = request.args.to_dict()
+    argumentos.pop(parametro, None)
+    if cursor:
+        argumentos[parametro] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **argumentos)
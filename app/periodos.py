@@ -0,0 +1,118 @@
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import and_, or_
+from .extensions import db
+from .models import ChecklistPreenchido
+
+# Fuso usado quando a configuração TIMEZONE não estiver definida
+FUSO_PADRAO = 'America/Sao_Paulo'
+
+
+def fuso_local():
+    """Retorna o fuso horário configurado para a operação (config TIMEZONE)."""
+    return ZoneInfo(current_app.config.get('TIMEZONE') or FUSO_PADRAO)
+
+
+def hoje_local():
+    """Data de hoje no fuso da operação, e não no fuso do servidor."""
+    return datetime.now(fuso_local()).date()
+
+
+def para_utc(momento_local):
+    """Converte um datetime local (sem tzinfo) para UTC ingênuo, como o banco armazena."""
+    aware = momento_local.replace(tzinfo=fuso_local())
+    return aware.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def para_local(momento_utc):
+    """Converte um datetime UTC ingênuo do banco para o horário local ingênuo."""
+    if momento_utc is None:
+        return None
+    aware = momento_utc.replace(tzinfo=timezone.utc)
+    return aware.astimezone(fuso_local()).replace(tzinfo=None)
+
+
+def intervalo_dia(dia):
+    """
+    Retorna o intervalo semiaberto [inicio, fim) em UTC que corresponde ao dia local.
+    As colunas de data são comparadas diretamente com os limites, o que permite o uso de índice.
+    """
+    inicio = datetime.combine(dia, time.min)
+    return para_utc(inicio), para_utc(inicio + timedelta(days=1))
+
+
+def parse_data(valor, padrao=None):
+    """Converte uma string 'AAAA-MM-DD' em date, retornando 'padrao' se inválida."""
+    if not valor:
+        return padrao
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        return padrao
+
+
+# --- PERÍODOS DOS CHECKLISTS ---
+
+# Texto exibido ao motorista quando o checklist já foi preenchido no período
+STATUS_PERIODO = {
+    'DIÁRIO': 'Preenchido Hoje',
+    'SEMANAL': 'Preenchido esta Semana',
+    'MENSAL': 'Preenchido este Mês',
+    'ANUAL': 'Preenchido este Ano',
+}
+
+
+def intervalo_periodo(tipo, dia):
+    """
+    Retorna o intervalo semiaberto [inicio, fim) em UTC do período que contém 'dia'
+    para o tipo de checklist informado, ou None se o tipo não tiver período.
+    """
+    if tipo == 'DIÁRIO':
+        inicio = dia
+        fim = dia + timedelta(days=1)
+    elif tipo == 'SEMANAL':
+        # Semana ISO: de segunda a domingo
+        inicio = dia - timedelta(days=dia.weekday())
+        fim = inicio + timedelta(days=7)
+    elif tipo == 'MENSAL':
+        inicio = dia.replace(day=1)
+        fim = (inicio + timedelta(days=32)).replace(day=1)
+    elif tipo == 'ANUAL':
+        inicio = dia.replace(month=1, day=1)
+        fim = inicio.replace(year=inicio.year + 1)
+    else:
+        return None
+    return para_utc(datetime.combine(inicio, time.min)), para_utc(datetime.combine(fim, time.min))
+
+
+def checklists_preenchidos_no_periodo(motorista_id, checklists, dia=None):
+    """
+    Retorna o conjunto de IDs dos checklists que o motorista já preencheu no período
+    corrente de cada um, usando uma única consulta com predicados de faixa.
+    """
+    dia = dia or hoje_local()
+
+    # Agrupa os checklists por intervalo para gerar um predicado por período
+    ids_por_intervalo = {}
+    for checklist in checklists:
+        intervalo = intervalo_periodo(checklist.tipo, dia)
+        if intervalo:
+            ids_por_intervalo.setdefault(intervalo, []).append(checklist.id)
+
+    if not ids_por_intervalo:
+        return set()
+
+    condicoes = [
+        and_(
+            ChecklistPreenchido.checklist_id.in_(ids),
+            ChecklistPreenchido.data_preenchimento >= inicio,
+            ChecklistPreenchido.data_preenchimento < fim
+        )
+        for (inicio, fim), ids in ids_por_intervalo.items()
+    ]
+
+    linhas = db.session.query(ChecklistPreenchido.checklist_id)\
+        .filter(ChecklistPreenchido.motorista_id == motorista_id, or_(*condicoes))\
+        .distinct().all()
+    return {checklist_id for (checklist_id,) in linhas}
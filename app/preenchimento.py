@@ -0,0 +1,272 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert
+from .extensions import db
+from .models import ChecklistPreenchido, ChecklistResposta, ExtintorCheck, Pendencia
+from .periodos import para_utc
+
+# Valores aceitos para a resposta de um item
+RESPOSTAS_VALIDAS = ('CONFORME', 'NAO CONFORME', 'N/A')
+
+# Quantidade de blocos de extintor exibidos no formulário
+BLOCOS_EXTINTOR = 5
+
+# Tamanho máximo da chave de envio gerada pelo aplicativo
+TAMANHO_CHAVE_ENVIO = 64
+
+# Tolerância para o relógio do aparelho ao informar a data do preenchimento
+TOLERANCIA_RELOGIO = timedelta(minutes=5)
+
+# Campos de texto livre do preenchimento
+CAMPOS_OBSERVACAO = ('outros_problemas', 'solucoes_adotadas', 'pendencias_gerais')
+
+
+class EnvioInvalido(ValueError):
+    """Um preenchimento do envio em lote não pôde ser aceito."""
+
+
+def _texto(valor, campo):
+    """Campo de texto do JSON: só aceita texto ou null (números e listas iriam direto ao banco)."""
+    if valor is not None and not isinstance(valor, str):
+        raise EnvioInvalido(f'O campo {campo} deve ser texto.')
+    return valor
+
+
+def filtrar_respostas(candidatas, itens_validos):
+    """
+    Mantém as respostas [(item_id, resposta, observacao)] de itens do checklist
+    ('itens_validos') com valores de RESPOSTAS_VALIDAS, uma por item.
+    Devolve (respostas, ignoradas): respostas é [{'item_id', 'resposta', 'observacao'}].
+    """
+    respostas = []
+    vistos = set()
+    for item_id, resposta, observacao in candidatas:
+        if item_id not in itens_validos or item_id in vistos or resposta not in RESPOSTAS_VALIDAS:
+            continue
+        vistos.add(item_id)
+        respostas.append({'item_id': item_id, 'resposta': resposta, 'observacao': observacao or ''})
+    return respostas, len(candidatas) - len(respostas)
+
+
+def respostas_do_formulario(form, itens_validos):
+    """Lê os campos resposta-<item_id> (e obs-<item_id>) do formulário e os filtra (filtrar_respostas)."""
+    candidatas = []
+    for chave in form:
+        if not chave.startswith('resposta-'):
+            continue
+        try:
+            item_id = int(chave.split('-')[-1])
+        except ValueError:
+            item_id = None
+        candidatas.append((item_id, form.get(chave), form.get(f'obs-{item_id}', '')))
+    return filtrar_respostas(candidatas, itens_validos)
+
+
+def _data_vencimento(valor):
+    """Vencimento em DD/MM/AAAA (formulário) ou AAAA-MM-DD; datas inválidas são ignoradas."""
+    for formato in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def _extintor(local, tipo, peso, vencimento, trocado, motivo_troca):
+    # Só salva se houver algum dado preenchido (além do tipo padrão)
+    if not (peso or vencimento or motivo_troca):
+        return None
+    return {
+        'local': local,
+        'tipo': tipo,
+        'peso': peso,
+        'vencimento': _data_vencimento(vencimento) if vencimento else None,
+        'trocado': trocado,
+        'motivo_troca': motivo_troca,
+    }
+
+
+def extintores_do_formulario(form):
+    """Blocos de extintor preenchidos (com peso, vencimento ou motivo da troca)."""
+    extintores = []
+    for i in range(BLOCOS_EXTINTOR):
+        extintor = _extintor(
+            form.get(f'extintor-{i}-local'),
+            form.get(f'extintor-{i}-tipo'),
+            form.get(f'extintor-{i}-peso'),
+            form.get(f'extintor-{i}-vencimento'),
+            form.get(f'extintor-{i}-trocado'),
+            form.get(f'extintor-{i}-motivo'),
+        )
+        if extintor:
+            extintores.append(extintor)
+    return extintores
+
+
+def chave_envio(item):
+    """Chave de idempotência de um preenchimento do envio em lote."""
+    chave = item.get('chave') if isinstance(item, dict) else None
+    if not isinstance(chave, str) or not chave.strip() or len(chave.strip()) > TAMANHO_CHAVE_ENVIO:
+        raise EnvioInvalido(f'Informe a chave do envio (até {TAMANHO_CHAVE_ENVIO} caracteres).')
+    return chave.strip()
+
+
+def _data_preenchimento(valor):
+    """Momento do preenchimento informado pelo aparelho (ISO 8601), em UTC ingênuo."""
+    agora = datetime.utcnow()
+    if not valor:
+        return agora
+    try:
+        momento = datetime.fromisoformat(str(valor).replace('Z', '+00:00'))
+    except ValueError:
+        raise EnvioInvalido('Data do preenchimento inválida (use ISO 8601).')
+    if momento.tzinfo:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
+    else:
+        # Sem fuso: horário local da operação
+        momento = para_utc(momento)
+    if momento > agora + TOLERANCIA_RELOGIO:
+        raise EnvioInvalido('A data do preenchimento está no futuro.')
+    return momento
+
+
+def envio_do_json(item, itens_validos):
+    """
+    Converte um preenchimento do envio em lote em (dados, respostas, extintores, ignoradas).
+    'dados' ainda traz a data URL das assinaturas; motorista, veículo e checklist
+    são completados pela rota. Levanta EnvioInvalido se o preenchimento não puder ser aceito.
+    """
+    respostas_json = item.get('respostas')
+    extintores_json = item.get('extintores') or []
+    if not isinstance(respostas_json, list) or not respostas_json:
+        raise EnvioInvalido('O preenchimento não tem respostas.')
+    if not isinstance(extintores_json, list) or len(extintores_json) > BLOCOS_EXTINTOR:
+        raise EnvioInvalido(f'Informe no máximo {BLOCOS_EXTINTOR} extintores.')
+    if not _texto(item.get('assinatura_motorista'), 'assinatura_motorista'):
+        raise EnvioInvalido('A assinatura do motorista é obrigatória.')
+
+    candidatas = []
+    for resposta in respostas_json:
+        if not isinstance(resposta, dict):
+            raise EnvioInvalido('Resposta em formato inválido.')
+        item_id = resposta.get('item_id')
+        candidatas.append((item_id if isinstance(item_id, int) else None,
+                           resposta.get('resposta'), _texto(resposta.get('observacao'), 'observacao')))
+    respostas, ignoradas = filtrar_respostas(candidatas, itens_validos)
+    if not respostas:
+        raise EnvioInvalido('Nenhuma resposta pertence a este checklist.')
+
+    extintores = []
+    for extintor_json in extintores_json:
+        if not isinstance(extintor_json, dict) or not extintor_json.get('local'):
+            raise EnvioInvalido('Informe o local de cada extintor.')
+        extintor = _extintor(*(_texto(extintor_json.get(campo), f'extintores.{campo}') for campo in
+                               ('local', 'tipo', 'peso', 'vencimento', 'trocado', 'motivo_troca')))
+        if extintor:
+            extintores.append(extintor)
+
+    dados = {campo: _texto(item.get(campo), campo) or None for campo in CAMPOS_OBSERVACAO}
+    dados['data_preenchimento'] = _data_preenchimento(item.get('data_preenchimento'))
+    dados['assinatura_motorista'] = item.get('assinatura_motorista')
+    dados['assinatura_responsavel'] = _texto(item.get('assinatura_responsavel'), 'assinatura_responsavel') or None
+    return dados, respostas, extintores, ignoradas
+
+
+def gravar_respostas(linhas):
+    """
+    Insere as respostas (dicts com preenchimento_id, item_id, resposta, observacao)
+    em um único executemany com RETURNING. Devolve {(preenchimento_id, item_id): id}.
+    A correspondência é feita pela chave, e não pela ordem: no SQLite, exigir a
+    ordem dos parâmetros no RETURNING faria o SQLAlchemy enviar uma linha por vez.
+    """
+    if not linhas:
+        return {}
+    gerados = db.session.execute(
+        insert(ChecklistResposta).returning(
+            ChecklistResposta.id, ChecklistResposta.preenchimento_id, ChecklistResposta.item_id
+        ),
+        linhas
+    ).all()
+    return {(preenchimento_id, item_id): resposta_id for resposta_id, preenchimento_id, item_id in gerados}
+
+
+def gravar_extintores(linhas):
+    """Insere os extintores (dicts com preenchimento_id) em um único executemany."""
+    if linhas:
+        db.session.execute(insert(ExtintorCheck), linhas)
+
+
+def abrir_pendencias(veiculo_id, nao_conformes):
+    """
+    Abre pendências para os itens não conformes que ainda não têm uma em aberto no veículo.
+    'nao_conformes' é {item_id: resposta_id}. Faz uma consulta às pendências abertas
+    (índice ix_pendencia_veiculo_status_item) e um único INSERT em lote.
+    Devolve a quantidade de pendências abertas.
+    """
+    if not nao_conformes:
+        return 0
+
+    abertas = {item_id for item_id, in db.session.query(Pendencia.item_id).filter(
+        Pendencia.veiculo_id == veiculo_id,
+        Pendencia.status == 'PENDENTE'
+    )}
+    novas = [
+        {'item_id': item_id, 'veiculo_id': veiculo_id, 'resposta_abertura_id': resposta_id}
+        for item_id, resposta_id in nao_conformes.items() if item_id not in abertas
+    ]
+    if novas:
+        db.session.execute(insert(Pendencia), novas)
+    return len(novas)
+
+
+def _gravar_conteudo(preenchimentos):
+    """
+    Grava respostas e extintores de vários preenchimentos (um executemany para cada tabela)
+    e abre as pendências por veículo. 'preenchimentos' é [(preenchimento_id, veiculo_id,
+    respostas, extintores)] em ordem cronológica: a primeira não conformidade abre a pendência.
+    """
+    ids = gravar_respostas([dict(r, preenchimento_id=preenchimento_id)
+                            for preenchimento_id, _, respostas, _ in preenchimentos for r in respostas])
+    gravar_extintores([dict(e, preenchimento_id=preenchimento_id)
+                       for preenchimento_id, _, _, extintores in preenchimentos for e in extintores])
+
+    nao_conformes = defaultdict(dict)
+    for preenchimento_id, veiculo_id, respostas, _ in preenchimentos:
+        for r in respostas:
+            if r['resposta'] == 'NAO CONFORME':
+                nao_conformes[veiculo_id].setdefault(r['item_id'], ids[(preenchimento_id, r['item_id'])])
+    for veiculo_id, itens in nao_conformes.items():
+        abrir_pendencias(veiculo_id, itens)
+
+
+def registrar_preenchimento(dados, respostas, extintores):
+    """
+    Grava o preenchimento ('dados' são as colunas de ChecklistPreenchido) com as
+    respostas e os extintores em lote e abre as pendências dos itens não conformes.
+    Não faz commit. Devolve o preenchimento criado.
+    """
+    preenchimento = ChecklistPreenchido(**dados)
+    db.session.add(preenchimento)
+    db.session.flush()
+    _gravar_conteudo([(preenchimento.id, preenchimento.veiculo_id, respostas, extintores)])
+    return preenchimento
+
+
+def registrar_lote(envios):
+    """
+    Grava vários preenchimentos [(dados, respostas, extintores)] com um executemany por
+    tabela. Cada 'dados' traz todas as colunas, inclusive a chave_envio (única), que
+    associa os ids gerados. Não faz commit. Devolve {chave_envio: preenchimento_id}.
+    """
+    if not envios:
+        return {}
+    gerados = db.session.execute(
+        insert(ChecklistPreenchido).returning(ChecklistPreenchido.id, ChecklistPreenchido.chave_envio),
+        [dados for dados, _, _ in envios]
+    ).all()
+    ids = {chave: preenchimento_id for preenchimento_id, chave in gerados}
+
+    ordenados = sorted(envios, key=lambda envio: envio[0]['data_preenchimento'])
+    _gravar_conteudo([(ids[dados['chave_envio']], dados['veiculo_id'], respostas, extintores)
+                      for dados, respostas, extintores in ordenados])
+    return ids
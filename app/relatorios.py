@@ -0,0 +1,190 @@
+import os
+from collections import defaultdict
+from fpdf import FPDF
+from sqlalchemy.orm import joinedload
+from .extensions import db
+from .models import Checklist, ChecklistPreenchido, ChecklistResposta, Veiculo
+from .periodos import intervalo_dia, parse_data, para_local
+from .arvore_checklist import arvore_checklist
+from .tarefas import pasta_tarefas, reportar_progresso, salvar_estado
+
+# Limite de parâmetros por cláusula IN (o SQLite antigo aceita no máximo 999)
+TAMANHO_LOTE_IN = 500
+
+
+# --- Classe Auxiliar para gerar o PDF com Cabeçalho e Rodapé ---
+class PDF(FPDF):
+    def __init__(self, title, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.report_title = title
+
+    def header(self):
+        # Define a fonte para o cabeçalho
+        self.set_font('Arial', 'B', 14)
+        # Título
+        self.cell(0, 10, self.report_title, 0, 1, 'C')
+        # Quebra de linha
+        self.ln(5)
+
+    def footer(self):
+        # Posiciona o cursor a 1.5 cm do fim da página
+        self.set_y(-15)
+        # Define a fonte para o rodapé
+        self.set_font('Arial', 'I', 8)
+        # Número da página
+        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+
+
+def latin1(texto):
+    """Garante que o texto possa ser escrito com as fontes padrão do FPDF."""
+    return texto.encode('latin-1', 'replace').decode('latin-1')
+
+
+def consultar_preenchimentos(tipo_checklist=None, veiculo_id=None, data_inicio_str=None, data_fim_str=None):
+    """
+    Monta a consulta de preenchimentos a partir dos filtros do relatório.
+    As datas são convertidas em faixas [inicio, fim) do dia local, o que permite o uso de índice.
+    """
+    query = ChecklistPreenchido.query.join(Checklist).join(Veiculo)\
+        .options(joinedload(ChecklistPreenchido.motorista))
+
+    data_inicio = parse_data(data_inicio_str)
+    data_fim = parse_data(data_fim_str)
+    if data_inicio:
+        query = query.filter(ChecklistPreenchido.data_preenchimento >= intervalo_dia(data_inicio)[0])
+    if data_fim:
+        query = query.filter(ChecklistPreenchido.data_preenchimento < intervalo_dia(data_fim)[1])
+    if tipo_checklist:
+        query = query.filter(Checklist.tipo == tipo_checklist)
+    if veiculo_id and veiculo_id != 'todos':
+        query = query.filter(ChecklistPreenchido.veiculo_id == veiculo_id)
+
+    return query
+
+
+def carregar_respostas(preenchimento_ids):
+    """Busca as respostas dos preenchimentos em lote: {(preenchimento_id, item_id): (resposta, observacao)}."""
+    respostas = {}
+    ids = list(preenchimento_ids)
+    for i in range(0, len(ids), TAMANHO_LOTE_IN):
+        lote = ids[i:i + TAMANHO_LOTE_IN]
+        linhas = db.session.query(
+            ChecklistResposta.preenchimento_id,
+            ChecklistResposta.item_id,
+            ChecklistResposta.resposta,
+            ChecklistResposta.observacao
+        ).filter(ChecklistResposta.preenchimento_id.in_(lote)).all()
+        for preenchimento_id, item_id, resposta, observacao in linhas:
+            respostas[(preenchimento_id, item_id)] = (resposta, observacao)
+    return respostas
+
+
+def gerar_pdf_relatorio(preenchimentos, titulo, progresso=None):
+    """
+    Renderiza o relatório consolidado em uma única passada e devolve os bytes do PDF.
+    A árvore de itens e as respostas são carregadas antes, sem consultas durante o desenho.
+    'progresso', se informado, é chamado com (feitos, total) a cada preenchimento.
+    """
+    # Estrutura de itens do primeiro checklist (base para o layout), em cache
+    arvore = arvore_checklist(preenchimentos[0].checklist) if preenchimentos else ()
+    respostas = carregar_respostas(p.id for p in preenchimentos)
+
+    pdf = PDF(title=titulo, orientation='P', unit='mm', format='A4')
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    total = len(preenchimentos)
+    feitos = 0
+
+    # Agrupa preenchimentos pelo dia local (o banco guarda UTC; os filtros também usam o dia local)
+    dados_agrupados = defaultdict(list)
+    for p in preenchimentos:
+        momento = para_local(p.data_preenchimento)
+        dados_agrupados[momento.date()].append((p, momento))
+
+    for data, preenchs in sorted(dados_agrupados.items()):
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, f"Data do Checklist: {data.strftime('%d/%m/%Y')}", 0, 1, 'L')
+
+        for p, momento in preenchs:
+            pdf.set_font('Arial', 'I', 10)
+            pdf.cell(0, 8, f"Preenchido por: {p.motorista.nome} às {momento.strftime('%H:%M')}", 0, 1, 'L')
+            pdf.ln(2) # Pequeno espaço
+
+            item_counter = 1 # Inicia o contador sequencial de itens
+
+            for item_principal in arvore:
+                # Renderiza o cabeçalho da categoria (Item Principal)
+                pdf.set_font('Arial', 'B', 10)
+                pdf.set_fill_color(224, 224, 224) # Cinza claro
+                pdf.cell(0, 7, latin1(item_principal.texto), 1, 1, 'C', 1)
+
+                # Renderiza o cabeçalho da tabela
+                pdf.set_font('Arial', 'B', 9)
+                pdf.cell(15, 7, 'Item', 1, 0, 'C', 1)
+                pdf.cell(135, 7, 'Descrição', 1, 0, 'C', 1)
+                pdf.cell(40, 7, 'Resposta', 1, 1, 'C', 1)
+
+                pdf.set_font('Arial', '', 9)
+                for sub_item in item_principal.sub_itens:
+                    resposta, observacao = respostas.get((p.id, sub_item.id), (None, None))
+
+                    h = 6 # Altura base da célula
+                    x_start = pdf.get_x()
+                    y_start = pdf.get_y()
+
+                    # Célula do Item (com contador)
+                    pdf.cell(15, h, str(item_counter), 1, 0, 'C')
+
+                    # Célula da Descrição (com multi_cell para quebra de linha)
+                    pdf.multi_cell(135, h, latin1(sub_item.texto), 1, 'L')
+
+                    # Armazena a posição Y final após a descrição
+                    y_end = pdf.get_y()
+
+                    # Reposiciona para a mesma linha da descrição para desenhar a resposta
+                    pdf.set_xy(x_start + 150, y_start)
+                    pdf.cell(40, y_end - y_start, resposta or '-', 1, 1, 'C')
+
+                    # Se houver observação, renderiza abaixo
+                    if observacao:
+                        pdf.set_font('Arial', 'I', 8)
+                        pdf.set_fill_color(245, 245, 245)
+                        pdf.multi_cell(0, 5, f"Obs: {latin1(observacao)}", 1, 'L', 1)
+                        pdf.set_font('Arial', '', 9)
+
+                    item_counter += 1
+            pdf.ln(10) # Espaço entre os preenchimentos de um mesmo dia
+
+            feitos += 1
+            if progresso:
+                progresso(feitos, total)
+
+    return bytes(pdf.output(dest='S'))
+
+
+def titulo_relatorio(veiculo_id):
+    veiculo_obj = None
+    if veiculo_id and veiculo_id != 'todos':
+        veiculo_obj = Veiculo.query.get(veiculo_id)
+    return f"Relatório - {veiculo_obj.nome_conjunto if veiculo_obj else 'Geral'}"
+
+
+def executar_tarefa_relatorio(tarefa_id, filtros):
+    """Tarefa em segundo plano: gera o PDF com os filtros informados e o grava em disco."""
+    preenchimentos = consultar_preenchimentos(**filtros)\
+        .order_by(ChecklistPreenchido.data_preenchimento.desc()).all()
+
+    salvar_estado(tarefa_id, mensagem=f'Gerando {len(preenchimentos)} checklist(s)')
+    conteudo_pdf = gerar_pdf_relatorio(
+        preenchimentos,
+        titulo_relatorio(filtros.get('veiculo_id')),
+        progresso=lambda feitos, total: reportar_progresso(tarefa_id, feitos, total)
+    )
+
+    destino = os.path.join(pasta_tarefas(), f'{tarefa_id}.pdf')
+    temporario = f'{destino}.tmp'
+    with open(temporario, 'wb') as f:
+        f.write(conteudo_pdf)
+    os.replace(temporario, destino)
+    salvar_estado(tarefa_id, arquivo=destino)
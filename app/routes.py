@@ -1,5 +1,6 @@
 from flask import (Blueprint, render_template, request, 
-                   redirect, url_for, session, flash, jsonify, Response)
+                   redirect, url_for, session, flash, jsonify, Response,
+                   current_app, send_file, abort, g)
 from functools import wraps
 from .models import (Usuario, Motorista, Conteudo, Assinatura, Checklist, 
                    ChecklistItem, Placa, Veiculo, ChecklistPreenchido, 
@@ -10,39 +11,39 @@ from .models import (Usuario, Motorista, Conteudo, Assinatura, Checklist,
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
 from decimal import Decimal, InvalidOperation
-import pandas as pd
-import io
 from flask import send_from_directory
 from .extensions import db
 from datetime import datetime, date
 import re
 import os
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from collections import defaultdict
 from sqlalchemy import and_, or_
-from fpdf import FPDF
-
-# --- Classe Auxiliar para gerar o PDF com Cabeçalho e Rodapé ---
-class PDF(FPDF):
-    def __init__(self, title, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.report_title = title
-
-    def header(self):
-        # Define a fonte para o cabeçalho
-        self.set_font('Arial', 'B', 14)
-        # Título
-        self.cell(0, 10, self.report_title, 0, 1, 'C')
-        # Quebra de linha
-        self.ln(5)
-
-    def footer(self):
-        # Posiciona o cursor a 1.5 cm do fim da página
-        self.set_y(-15)
-        # Define a fonte para o rodapé
-        self.set_font('Arial', 'I', 8)
-        # Número da página
-        self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
+from sqlalchemy.exc import IntegrityError
+from .periodos import (hoje_local, intervalo_dia, parse_data, para_local,
+                       checklists_preenchidos_no_periodo, STATUS_PERIODO)
+from .relatorios import (consultar_preenchimentos, gerar_pdf_relatorio,
+                         titulo_relatorio, executar_tarefa_relatorio)
+from . import tarefas
+from .paginacao import paginar
+from .identidade import invalidar_identidade, MOTORISTA, USUARIO
+from .autenticacao import tentar_login, LoginBloqueado
+from .arquivos import enviar_arquivo
+from .imagens import gerar_derivadas
+from .miniaturas import solicitar_miniatura, caminho_miniatura, e_chave_miniatura
+from .uploads import (salvar_upload, pasta_uploads, nome_por_conteudo, extensao_upload,
+                      UploadInvalido, PASTA_DOCUMENTOS)
+from .carregamento import com_perfil
+from .arvore_checklist import (arvore_checklist, invalidar_arvore, ids_itens,
+                               versao_definicao, definicao_checklist)
+from .preenchimento import (respostas_do_formulario, extintores_do_formulario,
+                            registrar_preenchimento, registrar_lote, envio_do_json,
+                            chave_envio, EnvioInvalido)
+from .assinaturas import salvar_assinatura, caminho_assinatura, e_chave, AssinaturaInvalida
+from .importacao import (salvar_upload_temporario, importar_arquivo, formatar_erro,
+                         executar_tarefa_importacao, gerar_previa, carregar_previa, aplicar_previa,
+                         TIPOS_IMPORTACAO, ErroImportacao)
 
 # --- DECORADOR DE VERIFICAÇÃO DE LOGIN E ROLE ---
 def login_required(required_role=["admin", "master", "comum"]):
@@ -63,13 +64,8 @@ def login_required(required_role=["admin", "master", "comum"]):
     return decorator
 
 
-# --- Configuração de Upload ---
-UPLOAD_FOLDER = 'app/static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# --- Configuração de Upload (gravação em app/uploads.py) ---
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'gif', 'pdf'}
 
 # --- BLUEPRINT DA ÁREA PÚBLICA (MOTORISTAS) ---
 main_bp = Blueprint('main', __name__)
@@ -87,14 +83,13 @@ def motorista_portal():
     if 'motorista_id' not in session:
         return redirect(url_for('main.motorista_login'))
     
-    motorista = Motorista.query.get(session['motorista_id'])
-    if not motorista:
-        session.pop('motorista_id', None)
+    # Identidade carregada pelo before_request (app/identidade.py); None se o cadastro foi excluído
+    if not g.motorista:
         flash('Não foi possível encontrar seus dados. Faça login novamente.', 'warning')
         return redirect(url_for('main.motorista_login'))
 
     # Assumindo que você tenha um template 'motorista_portal.html'
-    return render_template('motorista_portal.html', motorista=motorista)
+    return render_template('motorista_portal.html', motorista=g.motorista)
 
 @main_bp.route('/login/motorista', methods=['GET', 'POST'])
 def motorista_login():
@@ -103,8 +98,17 @@ def motorista_login():
         login_user = request.form.get('login') # Pode ser o CPF
         senha = request.form.get('senha')
         motorista = Motorista.query.filter_by(cpf=login_user).first()
+
+        # Limite de tentativas por CPF e por IP antes de conferir a senha (app/autenticacao.py)
+        try:
+            senha_valida = tentar_login(motorista, senha, login_user, request.remote_addr)
+        except LoginBloqueado as e:
+            flash(str(e), 'error')
+            return render_template('login.html'), 429
         
-        if motorista and motorista.check_password(senha):
+        if senha_valida:
+            # Grava o hash refeito no método atual, se foi o caso
+            db.session.commit()
             session['motorista_id'] = motorista.id
             flash(f'Bem-vindo, {motorista.nome}!', 'success')
             return redirect(url_for('main.motorista_portal'))
@@ -135,19 +139,19 @@ def veiculos():
         veiculos_query = veiculos_query.filter(Veiculo.unidade == user_unidade)
         placas_query = placas_query.filter(Placa.unidade == user_unidade)
 
-    lista_veiculos = veiculos_query.order_by(Veiculo.nome_conjunto).all()
-    todas_as_placas = placas_query.order_by(Placa.numero).all()
-    
-    # Identifica os IDs de todas as placas que já estão em uso
-    placas_em_uso_ids = set()
-    for v in Veiculo.query.all(): # Precisamos checar todos os veículos, não apenas os filtrados
-        if v.placa_cavalo_id: placas_em_uso_ids.add(v.placa_cavalo_id)
-        if v.placa_carreta1_id: placas_em_uso_ids.add(v.placa_carreta1_id)
-        if v.placa_carreta2_id: placas_em_uso_ids.add(v.placa_carreta2_id)
+    pagina_veiculos = paginar(com_perfil(veiculos_query, 'veiculo_placas'), [Veiculo.nome_conjunto, Veiculo.id])
+    pagina_placas = paginar(placas_query, [Placa.numero, Placa.id], parametro='cursor_placas')
 
-    # Cria listas de placas disponíveis para os formulários
-    placas_cavalo_disponiveis = [p for p in todas_as_placas if p.tipo == 'CAVALO' and p.id not in placas_em_uso_ids]
-    placas_carreta_disponiveis = [p for p in todas_as_placas if p.tipo == 'CARRETA' and p.id not in placas_em_uso_ids]
+    # Placas disponíveis para os formulários: as que não estão em nenhum veículo
+    # (considera todos os veículos, não apenas os da unidade)
+    placa_em_uso = db.session.query(Veiculo.id).filter(or_(
+        Veiculo.placa_cavalo_id == Placa.id,
+        Veiculo.placa_carreta1_id == Placa.id,
+        Veiculo.placa_carreta2_id == Placa.id
+    )).exists()
+    placas_livres = placas_query.filter(~placa_em_uso).order_by(Placa.numero)
+    placas_cavalo_disponiveis = placas_livres.filter(Placa.tipo == 'CAVALO').all()
+    placas_carreta_disponiveis = placas_livres.filter(Placa.tipo == 'CARRETA').all()
 
     unidades_disponiveis = []
     if user_role == 'admin':
@@ -156,8 +160,10 @@ def veiculos():
 
     return render_template(
         'veiculos.html',
-        veiculos=lista_veiculos,
-        placas=todas_as_placas, # Lista de todas as placas para a coluna da direita
+        veiculos=pagina_veiculos.itens,
+        pagina_veiculos=pagina_veiculos,
+        placas=pagina_placas.itens, # Placas da página atual para a coluna da direita
+        pagina_placas=pagina_placas,
         placas_cavalo_disponiveis=placas_cavalo_disponiveis,
         placas_carreta_disponiveis=placas_carreta_disponiveis,
         unidades_disponiveis=unidades_disponiveis
@@ -227,6 +233,8 @@ def edit_veiculo(veiculo_id):
     veiculo.placa_carreta2_id = int(request.form.get('placa_carreta2_id')) if request.form.get('placa_carreta2_id') else None
     
     db.session.commit()
+    # O nome do conjunto faz parte da identidade dos motoristas vinculados
+    invalidar_identidade(MOTORISTA)
     flash(f'Conjunto "{veiculo.nome_conjunto}" atualizado com sucesso.', 'success')
     return redirect(url_for('admin.veiculos'))
 
@@ -285,6 +293,7 @@ def delete_veiculo(veiculo_id):
     # A lógica de "desvincular" não é necessária aqui.
     db.session.delete(veiculo)
     db.session.commit()
+    invalidar_identidade(MOTORISTA)
     flash(f'Conjunto "{veiculo.nome_conjunto}" foi excluído.', 'info')
     return redirect(url_for('admin.veiculos'))
 
@@ -343,13 +352,19 @@ def lista_conteudos():
         return redirect(url_for('main.motorista_login'))
     
     motorista_id = session['motorista_id']
-    conteudos = Conteudo.query.order_by(Conteudo.data.desc()).all()
-    
-    assinaturas = Assinatura.query.filter_by(motorista_id=motorista_id).all()
-    assinaturas_motorista = {a.conteudo_id for a in assinaturas}
+    pagina = paginar(Conteudo.query, [Conteudo.data, Conteudo.id], descendente=True)
+    conteudos = pagina.itens
+
+    # Apenas as assinaturas dos conteúdos exibidos nesta página
+    assinaturas = db.session.query(Assinatura.conteudo_id).filter(
+        Assinatura.motorista_id == motorista_id,
+        Assinatura.conteudo_id.in_([c.id for c in conteudos])
+    ).all()
+    assinaturas_motorista = {conteudo_id for conteudo_id, in assinaturas}
 
     return render_template('lista_conteudos.html', 
                            conteudos=conteudos, 
+                           pagina=pagina,
                            assinaturas_motorista=assinaturas_motorista)
 
 @main_bp.route('/conteudo/<int:conteudo_id>/ver', methods=['GET', 'POST'])
@@ -376,13 +391,20 @@ def ver_conteudo(conteudo_id):
                 flash('É obrigatório selecionar uma resposta e assinar para confirmar.', 'danger')
                 return redirect(url_for('main.ver_conteudo', conteudo_id=conteudo_id))
 
+            # A imagem vai para o armazenamento de assinaturas; o registro guarda só a referência
+            try:
+                assinatura_ref = salvar_assinatura(assinatura_imagem_data)
+            except AssinaturaInvalida as e:
+                flash(f'Não foi possível registrar a assinatura: {e}', 'danger')
+                return redirect(url_for('main.ver_conteudo', conteudo_id=conteudo_id))
+
             # Cria o novo registro de assinatura com todos os dados
             nova_assinatura = Assinatura(
                 motorista_id=motorista_id,
                 conteudo_id=conteudo_id,
                 tempo_leitura=tempo_leitura_segundos,
                 resposta_motorista=resposta_usuario,
-                assinatura_imagem=assinatura_imagem_data  # Incluindo a assinatura
+                assinatura_imagem=assinatura_ref  # Referência da assinatura
             )
             db.session.add(nova_assinatura)
             db.session.commit()
@@ -403,6 +425,29 @@ def ver_conteudo(conteudo_id):
 
 
 
+@main_bp.route('/assinaturas/<string:chave>.png')
+def ver_assinatura(chave):
+    """
+    Serve a imagem de uma assinatura. O nome é o hash do conteúdo, então o arquivo
+    nunca muda: ETag forte e cache longo, respondendo 304 para requisições condicionais.
+    """
+    if 'motorista_id' not in session and 'user_id' not in session:
+        abort(401)
+    if not e_chave(chave):
+        abort(404)
+
+    caminho = caminho_assinatura(chave)
+    if not os.path.exists(caminho):
+        abort(404)
+
+    resposta = send_file(caminho, mimetype='image/png', etag=chave, conditional=True,
+                         max_age=31536000)
+    resposta.cache_control.private = True
+    resposta.cache_control.public = False
+    resposta.cache_control.immutable = True
+    return resposta
+
+
 # Adicione esta importação no topo do seu arquivo app/routes.py,
 # junto com as outras importações de models.
 from .models import ExtintorCheck 
@@ -415,7 +460,7 @@ def preencher_checklist(checklist_id):
         return redirect(url_for('main.motorista_login'))
 
     checklist = Checklist.query.get_or_404(checklist_id)
-    motorista = Motorista.query.get(session['motorista_id'])
+    motorista = g.motorista
     veiculo_do_motorista = motorista.veiculo
 
     if request.method == 'POST':
@@ -435,91 +480,41 @@ def preencher_checklist(checklist_id):
             flash('A assinatura do motorista é obrigatória.', 'danger')
             return redirect(url_for('main.preencher_checklist', checklist_id=checklist_id))
 
-        # Cria o objeto ChecklistPreenchido
-        novo_preenchimento = ChecklistPreenchido(
-            motorista_id=motorista.id,
-            veiculo_id=veiculo_do_motorista.id,
-            checklist_id=checklist.id,
-            assinatura_motorista=assinatura_motorista_data,
-            assinatura_responsavel=assinatura_responsavel_data, # Salva a assinatura opcional
-            outros_problemas=outros_problemas,
-            solucoes_adotadas=solucoes_adotadas,
-            pendencias_gerais=pendencias_gerais
+        # As imagens vão para o armazenamento de assinaturas; o registro guarda só a referência
+        try:
+            assinatura_motorista_ref = salvar_assinatura(assinatura_motorista_data)
+            assinatura_responsavel_ref = salvar_assinatura(assinatura_responsavel_data)
+        except AssinaturaInvalida as e:
+            flash(f'Não foi possível registrar a assinatura: {e}', 'danger')
+            return redirect(url_for('main.preencher_checklist', checklist_id=checklist_id))
+
+        # Só aceita respostas de itens deste checklist (conjunto tirado da árvore em cache)
+        respostas, ignoradas = respostas_do_formulario(request.form, ids_itens(arvore_checklist(checklist)))
+
+        # Preenchimento, respostas e extintores em lote, e pendências dos itens não conformes
+        registrar_preenchimento(
+            {
+                'motorista_id': motorista.id,
+                'veiculo_id': veiculo_do_motorista.id,
+                'checklist_id': checklist.id,
+                'assinatura_motorista': assinatura_motorista_ref,
+                'assinatura_responsavel': assinatura_responsavel_ref, # Assinatura opcional
+                'outros_problemas': outros_problemas,
+                'solucoes_adotadas': solucoes_adotadas,
+                'pendencias_gerais': pendencias_gerais,
+            },
+            respostas,
+            extintores_do_formulario(request.form)
         )
-        db.session.add(novo_preenchimento)
-
-        # Salva as respostas dos itens normais
-        respostas_adicionadas = []
-        for key in request.form:
-            if key.startswith('resposta-'):
-                item_id = int(key.split('-')[-1])
-                resposta_texto = request.form.get(key)
-                observacao = request.form.get(f'obs-{item_id}', '')
-
-                nova_resposta = ChecklistResposta(
-                    preenchimento=novo_preenchimento,
-                    item_id=item_id,
-                    resposta=resposta_texto,
-                    observacao=observacao
-                )
-                db.session.add(nova_resposta)
-                respostas_adicionadas.append(nova_resposta)
-
-        # --- NOVA LÓGICA PARA SALVAR DADOS DOS EXTINTORES ---
-        for i in range(5): # Loop para os 5 blocos de extintores
-            local = request.form.get(f'extintor-{i}-local')
-            tipo = request.form.get(f'extintor-{i}-tipo')
-            peso = request.form.get(f'extintor-{i}-peso')
-            vencimento_str = request.form.get(f'extintor-{i}-vencimento')
-            trocado = request.form.get(f'extintor-{i}-trocado')
-            motivo_troca = request.form.get(f'extintor-{i}-motivo')
-
-            # Só salva se houver algum dado preenchido (além do tipo padrão)
-            if peso or vencimento_str or motivo_troca:
-                vencimento_data = None
-                if vencimento_str:
-                    try:
-                        # Converte a data do formato DD/MM/AAAA para o formato do banco
-                        vencimento_data = datetime.strptime(vencimento_str, '%d/%m/%Y').date()
-                    except ValueError:
-                        # Ignora data inválida, mas continua salvando o resto
-                        pass
-
-                novo_extintor = ExtintorCheck(
-                    preenchimento=novo_preenchimento,
-                    local=local,
-                    tipo=tipo,
-                    peso=peso,
-                    vencimento=vencimento_data,
-                    trocado=trocado,
-                    motivo_troca=motivo_troca
-                )
-                db.session.add(novo_extintor)
-
-        db.session.flush()
-
-        # Lógica para criar pendências (permanece a mesma)
-        for resposta in respostas_adicionadas:
-            if resposta.resposta == 'NAO CONFORME':
-                pendencia_existente = Pendencia.query.filter_by(
-                    item_id=resposta.item_id,
-                    veiculo_id=veiculo_do_motorista.id,
-                    status='PENDENTE'
-                ).first()
-                if not pendencia_existente:
-                    nova_pendencia = Pendencia(
-                        item_id=resposta.item_id,
-                        veiculo_id=veiculo_do_motorista.id,
-                        resposta_abertura_id=resposta.id
-                    )
-                    db.session.add(nova_pendencia)
-        
+
         db.session.commit()
         flash('Checklist enviado com sucesso!', 'success')
+        if ignoradas:
+            flash(f'{ignoradas} resposta(s) ignorada(s): item fora deste checklist ou valor inválido.', 'warning')
         return redirect(url_for('main.lista_checklists_motorista'))
 
     # A parte 'GET' da função permanece a mesma
-    itens_principais = checklist.itens.filter_by(parent_id=None).order_by(ChecklistItem.ordem).all()
+    itens_principais = arvore_checklist(checklist)
     pendencias_abertas = set()
     if veiculo_do_motorista:
         lista_pendencias = Pendencia.query.filter_by(veiculo_id=veiculo_do_motorista.id, status='PENDENTE').all()
@@ -534,6 +529,148 @@ def preencher_checklist(checklist_id):
     )
 
 
+@main_bp.route('/checklist/<int:checklist_id>/definicao')
+def definicao_checklist_json(checklist_id):
+    """
+    Definição do checklist em JSON (cabeçalho e árvore de itens) para cache no cliente.
+    O ETag forte é a versão da definição: com If-None-Match igual, responde 304 sem
+    montar a árvore. As pendências do veículo ficam em pendencias_checklist_json.
+    """
+    if 'motorista_id' not in session:
+        return jsonify({'erro': 'Não autorizado'}), 401
+
+    checklist = Checklist.query.get(checklist_id)
+    if not checklist:
+        return jsonify({'erro': 'Checklist não encontrado.'}), 404
+
+    versao = versao_definicao(checklist)
+    if versao in request.if_none_match:
+        resposta = Response(status=304)
+    else:
+        resposta = jsonify(definicao_checklist(checklist))
+    resposta.set_etag(versao)
+    # Sempre revalida, mas só baixa de novo quando a definição muda
+    resposta.cache_control.private = True
+    resposta.cache_control.no_cache = True
+    return resposta
+
+
+@main_bp.route('/checklist/<int:checklist_id>/pendencias')
+def pendencias_checklist_json(checklist_id):
+    """
+    Itens deste checklist com pendência em aberto no veículo do motorista: a parte
+    da tela de preenchimento que muda a cada visita. Traz também a versão atual da
+    definição, para o cliente saber se a sua cópia em cache está desatualizada.
+    """
+    if 'motorista_id' not in session:
+        return jsonify({'erro': 'Não autorizado'}), 401
+
+    checklist = Checklist.query.get(checklist_id)
+    if not checklist:
+        return jsonify({'erro': 'Checklist não encontrado.'}), 404
+
+    veiculo_id = g.motorista.veiculo_id
+    itens_pendentes = []
+    if veiculo_id:
+        itens_pendentes = sorted(item_id for item_id, in db.session.query(Pendencia.item_id).filter(
+            Pendencia.veiculo_id == veiculo_id,
+            Pendencia.status == 'PENDENTE',
+            Pendencia.item_id.in_(ids_itens(arvore_checklist(checklist)))
+        ).distinct())
+
+    resposta = jsonify({
+        'checklist_id': checklist.id,
+        'versao': versao_definicao(checklist),
+        'veiculo_id': veiculo_id,
+        'itens_pendentes': itens_pendentes,
+    })
+    resposta.cache_control.no_store = True
+    return resposta
+
+
+@main_bp.route('/checklists/lote', methods=['POST'])
+def enviar_checklists_lote():
+    """
+    Recebe, em JSON, os checklists preenchidos sem conexão pelo aplicativo:
+    {"preenchimentos": [{"chave", "checklist_id", "data_preenchimento", "respostas": [...],
+    "extintores": [...], "assinatura_motorista", ...}]}. A chave de cada preenchimento
+    torna o reenvio seguro: chaves já gravadas voltam como 'duplicado'. Tudo é gravado
+    em uma transação, com um INSERT em lote por tabela.
+    """
+    if 'motorista_id' not in session:
+        return jsonify({'erro': 'Não autorizado'}), 401
+
+    motorista = g.motorista
+    if not motorista.veiculo_id:
+        return jsonify({'erro': 'Você não está vinculado a um veículo. Contate o administrador.'}), 400
+
+    corpo = request.get_json(silent=True)
+    itens = corpo.get('preenchimentos') if isinstance(corpo, dict) else None
+    if not isinstance(itens, list) or not itens:
+        return jsonify({'erro': 'Envie {"preenchimentos": [...]} com ao menos um checklist.'}), 400
+    limite = current_app.config['ENVIO_LOTE_MAX']
+    if len(itens) > limite:
+        return jsonify({'erro': f'Envie no máximo {limite} checklists por lote.'}), 400
+
+    # Uma consulta para os checklists e outra para as chaves já gravadas
+    ids_checklists = {item.get('checklist_id') for item in itens
+                      if isinstance(item, dict) and isinstance(item.get('checklist_id'), int)}
+    checklists = {c.id: c for c in Checklist.query.filter(Checklist.id.in_(ids_checklists))} if ids_checklists else {}
+    chaves = {item.get('chave') for item in itens if isinstance(item, dict) and isinstance(item.get('chave'), str)}
+    gravadas = dict(db.session.query(ChecklistPreenchido.chave_envio, ChecklistPreenchido.id)
+                    .filter(ChecklistPreenchido.chave_envio.in_({c.strip() for c in chaves})))
+
+    resultados = []
+    envios = []
+    for item in itens:
+        resultado = {'chave': item.get('chave') if isinstance(item, dict) else None, 'status': 'erro'}
+        resultados.append(resultado)
+        try:
+            chave = chave_envio(item)
+            resultado['chave'] = chave
+            if chave in gravadas:
+                resultado.update(status='duplicado', preenchimento_id=gravadas[chave])
+                continue
+            checklist = checklists.get(item.get('checklist_id'))
+            if not checklist:
+                raise EnvioInvalido('Checklist não encontrado.')
+            dados, respostas, extintores, ignoradas = envio_do_json(item, ids_itens(arvore_checklist(checklist)))
+            dados['assinatura_motorista'] = salvar_assinatura(dados['assinatura_motorista'])
+            dados['assinatura_responsavel'] = salvar_assinatura(dados['assinatura_responsavel'])
+        except (EnvioInvalido, AssinaturaInvalida) as e:
+            resultado['erro'] = str(e)
+            continue
+
+        # Chave repetida dentro do próprio lote: vale o primeiro preenchimento
+        gravadas[chave] = None
+        dados.update(chave_envio=chave, motorista_id=motorista.id,
+                     veiculo_id=motorista.veiculo_id, checklist_id=checklist.id)
+        envios.append((dados, respostas, extintores))
+        resultado.update(status='criado', respostas_ignoradas=ignoradas)
+
+    try:
+        ids = registrar_lote(envios)
+        db.session.commit()
+    except IntegrityError:
+        # Outro envio com as mesmas chaves foi gravado ao mesmo tempo; o reenvio devolve 'duplicado'
+        db.session.rollback()
+        return jsonify({'erro': 'Envio concorrente com as mesmas chaves. Tente novamente.'}), 409
+    except Exception:
+        db.session.rollback()
+        raise
+
+    for resultado in resultados:
+        if resultado['status'] != 'erro' and resultado.get('preenchimento_id') is None:
+            resultado['preenchimento_id'] = ids[resultado['chave']]
+
+    return jsonify({
+        'resultados': resultados,
+        'criados': len(envios),
+        'duplicados': sum(1 for r in resultados if r['status'] == 'duplicado'),
+        'erros': sum(1 for r in resultados if r['status'] == 'erro'),
+    })
+
+
 @admin_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """Página de login para usuários administrativos (admin, master, comum)."""
@@ -542,8 +679,17 @@ def login():
         password = request.form.get('password')
         user = Usuario.query.filter_by(nome=nome).first()
 
+        # Limite de tentativas por nome e por IP antes de conferir a senha (app/autenticacao.py)
+        try:
+            senha_valida = tentar_login(user, password, nome, request.remote_addr)
+        except LoginBloqueado as e:
+            flash(str(e), 'danger')
+            return render_template('admin_login.html'), 429
+
         # Verifica se o usuário existe e se a senha está correta
-        if user and user.check_password(password):
+        if senha_valida:
+            # Grava o hash refeito no método atual, se foi o caso
+            db.session.commit()
             # Se a senha estiver correta, armazena os dados na sessão.
             # A verificação de permissão é removida daqui, pois qualquer usuário
             # cadastrado pode logar. O acesso às páginas será controlado
@@ -687,6 +833,7 @@ def edit_usuario(usuario_id):
         usuario_a_editar.password = password
         
     db.session.commit()
+    invalidar_identidade(USUARIO, usuario_a_editar.id)
     flash(f'Usuário {usuario_a_editar.nome} atualizado com sucesso!', 'success')
     return redirect(url_for('admin.gerenciar_usuarios'))
 
@@ -716,6 +863,7 @@ def delete_usuario(usuario_id):
     
     db.session.delete(usuario_a_excluir)
     db.session.commit()
+    invalidar_identidade(USUARIO, usuario_id)
     flash(f'Usuário {usuario_a_excluir.nome} excluído com sucesso.', 'info')
     return redirect(url_for('admin.gerenciar_usuarios'))
 
@@ -725,14 +873,9 @@ def delete_usuario(usuario_id):
 # ROTA PARA GERENCIAR DOCUMENTOS FIXOS (ADMIN)
 #-----------------------------------------------------------------------
 
-# Defina esta constante no início do arquivo, junto com as outras configurações
-DOCUMENTOS_UPLOAD_FOLDER = 'app/static/uploads/documentos_fixos'
+# Documentos fixos ficam em static/uploads/documentos_fixos (gravação em app/uploads.py)
 DOCUMENTOS_ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'jpg', 'png'}
 
-def allowed_document_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in DOCUMENTOS_ALLOWED_EXTENSIONS
-
 @admin_bp.route('/documentos', methods=['GET', 'POST'])
 def gerenciar_documentos():
     if 'admin_user' not in session:
@@ -752,32 +895,30 @@ def gerenciar_documentos():
             flash('Nenhum arquivo selecionado.', 'danger')
             return redirect(request.url)
 
-        if file and allowed_document_file(file.filename):
-            # Cria um nome de arquivo seguro e único para evitar conflitos
-            original_filename = secure_filename(file.filename)
-            unique_filename = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{original_filename}"
-            
-            # Cria o diretório se ele não existir
-            if not os.path.exists(DOCUMENTOS_UPLOAD_FOLDER):
-                os.makedirs(DOCUMENTOS_UPLOAD_FOLDER)
-            
-            # Salva o arquivo
-            file.path = os.path.join(DOCUMENTOS_UPLOAD_FOLDER, unique_filename)
-            file.save(file.path)
-
-            # Salva no banco de dados
-            novo_documento = DocumentoFixo(
-                titulo=titulo,
-                descricao=descricao,
-                nome_arquivo=unique_filename
-            )
-            db.session.add(novo_documento)
-            db.session.commit()
+        # Gravado pelo hash do conteúdo: reenviar o mesmo arquivo reaproveita a cópia existente
+        try:
+            arquivo_salvo = salvar_upload(file, pasta_uploads(PASTA_DOCUMENTOS), DOCUMENTOS_ALLOWED_EXTENSIONS)
+        except UploadInvalido as e:
+            flash(str(e), 'danger')
+            return redirect(request.url)
 
-            flash('Documento enviado com sucesso!', 'success')
-            return redirect(url_for('admin.gerenciar_documentos'))
-        else:
-            flash('Tipo de arquivo não permitido.', 'danger')
+        # Salva no banco de dados
+        novo_documento = DocumentoFixo(
+            titulo=titulo,
+            descricao=descricao,
+            nome_arquivo=arquivo_salvo.nome,
+            hash_conteudo=arquivo_salvo.hash,
+            tamanho=arquivo_salvo.tamanho,
+            tipo_mime=arquivo_salvo.tipo_mime
+        )
+        db.session.add(novo_documento)
+        db.session.commit()
+        if arquivo_salvo.tipo_mime == 'application/pdf':
+            # Miniatura da primeira página para as listas, gerada em segundo plano
+            solicitar_miniatura(os.path.join(pasta_uploads(PASTA_DOCUMENTOS), arquivo_salvo.nome), arquivo_salvo.hash)
+
+        flash('Documento enviado com sucesso!', 'success')
+        return redirect(url_for('admin.gerenciar_documentos'))
 
     documentos = DocumentoFixo.query.order_by(DocumentoFixo.data_upload.desc()).all()
     return render_template('admin_documentos.html', documentos=documentos)
@@ -790,11 +931,15 @@ def excluir_documento(documento_id):
 
     documento = DocumentoFixo.query.get_or_404(documento_id)
     
-    # Tenta excluir o arquivo físico
-    try:
-        os.remove(os.path.join(DOCUMENTOS_UPLOAD_FOLDER, documento.nome_arquivo))
-    except OSError as e:
-        flash(f'Erro ao excluir o arquivo físico: {e}', 'danger')
+    # Tenta excluir o arquivo físico, se nenhum outro documento usa o mesmo conteúdo
+    compartilhado = DocumentoFixo.query.filter(
+        DocumentoFixo.nome_arquivo == documento.nome_arquivo, DocumentoFixo.id != documento.id
+    ).first()
+    if not compartilhado:
+        try:
+            os.remove(os.path.join(pasta_uploads(PASTA_DOCUMENTOS), documento.nome_arquivo))
+        except OSError as e:
+            flash(f'Erro ao excluir o arquivo físico: {e}', 'danger')
 
     # Exclui o registro do banco de dados
     db.session.delete(documento)
@@ -831,8 +976,10 @@ def gerenciar_pendencias():
     if veiculo_id:
         query = query.filter(Pendencia.veiculo_id == veiculo_id)
 
-    # Executa a query final
-    pendencias = query.order_by(Pendencia.data_criacao.desc()).all()
+    # Executa a query final, uma página por vez (mais recentes primeiro)
+    pagina = paginar(com_perfil(query, 'pendencia_completa'),
+                     [Pendencia.data_criacao, Pendencia.id], descendente=True)
+    pendencias = pagina.itens
 
     # Agrupa as pendências encontradas pelo objeto do veículo
     for pendencia in pendencias:
@@ -849,6 +996,7 @@ def gerenciar_pendencias():
     return render_template(
         'admin_pendencias.html',
         pendencias_agrupadas=pendencias_agrupadas,
+        pagina=pagina,
         todos_veiculos=todos_veiculos,
         veiculo_selecionado_id=veiculo_id
     )
@@ -900,8 +1048,10 @@ def acompanhamento_diario():
     if 'admin_user' not in session:
         return redirect(url_for('admin.login'))
 
-    hoje = date.today()
-    
+    # Permite consultar dias anteriores via ?data=AAAA-MM-DD (padrão: hoje no fuso local)
+    hoje = hoje_local()
+    data_referencia = parse_data(request.args.get('data'), hoje)
+
     checklist_diario = Checklist.query.filter_by(tipo='DIÁRIO').order_by(Checklist.data.desc()).first()
 
     motoristas_status = []
@@ -910,25 +1060,34 @@ def acompanhamento_diario():
     if not checklist_diario:
         flash('Nenhum checklist do tipo "DIÁRIO" foi configurado no sistema.', 'warning')
     else:
-        motoristas = Motorista.query.order_by(Motorista.nome).all()
-        for motorista in motoristas:
-            preenchido = ChecklistPreenchido.query.filter(
-                and_(
-                    ChecklistPreenchido.motorista_id == motorista.id,
-                    ChecklistPreenchido.checklist_id == checklist_diario.id,
-                    db.func.date(ChecklistPreenchido.data_preenchimento) == hoje
-                )
-            ).first()
-            
+        inicio, fim = intervalo_dia(data_referencia)
+
+        # Motoristas que preencheram no dia, em faixa semiaberta (usa o índice da data)
+        preenchidos = db.session.query(ChecklistPreenchido.motorista_id)\
+            .filter(
+                ChecklistPreenchido.checklist_id == checklist_diario.id,
+                ChecklistPreenchido.data_preenchimento >= inicio,
+                ChecklistPreenchido.data_preenchimento < fim
+            ).distinct().subquery()
+
+        # Uma única consulta: todos os motoristas com a marcação de preenchido
+        resultados = db.session.query(
+            Motorista.id,
+            Motorista.nome,
+            preenchidos.c.motorista_id.isnot(None)
+        ).outerjoin(preenchidos, preenchidos.c.motorista_id == Motorista.id)\
+         .order_by(Motorista.nome).all()
+
+        for motorista_id, nome, preenchido in resultados:
             status = 'Preenchido' if preenchido else 'Pendente'
-            
+
             info = {
-                'id': motorista.id,
-                'nome': motorista.nome,
+                'id': motorista_id,
+                'nome': nome,
                 'status': status
             }
             motoristas_status.append(info)
-            
+
             if status == 'Pendente':
                 motoristas_pendentes.append(info)
 
@@ -937,7 +1096,8 @@ def acompanhamento_diario():
         motoristas_status=motoristas_status,
         motoristas_pendentes=motoristas_pendentes,
         checklist_diario=checklist_diario,
-        data_hoje=hoje
+        data_hoje=data_referencia,
+        e_hoje=(data_referencia == hoje)
     )
 
 @admin_bp.route('/relatorios_consolidados', methods=['GET', 'POST'])
@@ -954,28 +1114,15 @@ def relatorios_consolidados():
         data_inicio_str = request.form.get('data_inicio')
         data_fim_str = request.form.get('data_fim')
 
-        data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date() if data_inicio_str else None
-        data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date() if data_fim_str else None
-
-        query = ChecklistPreenchido.query.join(Checklist).join(Veiculo)
-
-        if tipo_checklist:
-            query = query.filter(Checklist.tipo == tipo_checklist)
-        
-        if veiculo_id and veiculo_id != 'todos':
-            query = query.filter(ChecklistPreenchido.veiculo_id == veiculo_id)
-
-        if data_inicio:
-            query = query.filter(db.func.date(ChecklistPreenchido.data_preenchimento) >= data_inicio)
-        if data_fim:
-            query = query.filter(db.func.date(ChecklistPreenchido.data_preenchimento) <= data_fim)
+        query = consultar_preenchimentos(tipo_checklist, veiculo_id, data_inicio_str, data_fim_str)
+        query = com_perfil(query, 'preenchimento_respostas')
 
         preenchimentos = query.order_by(Veiculo.nome_conjunto, ChecklistPreenchido.data_preenchimento.desc()).all()
 
         resultados_agrupados = defaultdict(lambda: defaultdict(list))
         for p in preenchimentos:
             if p.veiculo:
-                data = p.data_preenchimento.date()
+                data = para_local(p.data_preenchimento).date()
                 resultados_agrupados[p.veiculo.nome_conjunto][data].append(p)
             
     return render_template('admin_relatorios_consolidados.html', 
@@ -995,106 +1142,80 @@ def gerar_relatorio_pdf():
     data_inicio_str = request.args.get('data_inicio')
     data_fim_str = request.args.get('data_fim')
 
-    query = ChecklistPreenchido.query.join(Checklist).join(Veiculo)
-
-    if data_inicio_str:
-        data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
-        query = query.filter(db.func.date(ChecklistPreenchido.data_preenchimento) >= data_inicio)
-    if data_fim_str:
-        data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
-        query = query.filter(db.func.date(ChecklistPreenchido.data_preenchimento) <= data_fim)
-    if tipo_checklist:
-        query = query.filter(Checklist.tipo == tipo_checklist)
-    
-    veiculo_obj = None
-    if veiculo_id and veiculo_id != 'todos':
-        query = query.filter(ChecklistPreenchido.veiculo_id == veiculo_id)
-        veiculo_obj = Veiculo.query.get(veiculo_id)
-
+    query = consultar_preenchimentos(tipo_checklist, veiculo_id, data_inicio_str, data_fim_str)
     preenchimentos = query.order_by(ChecklistPreenchido.data_preenchimento.desc()).all()
-    
-    # Estrutura de itens do primeiro checklist (base para o layout)
-    itens_principais = []
-    if preenchimentos:
-        checklist_base = Checklist.query.get(preenchimentos[0].checklist_id)
-        if checklist_base:
-            itens_principais = checklist_base.itens.filter_by(parent_id=None).order_by(ChecklistItem.ordem).all()
-
-    # Inicia a construção do PDF
-    titulo = f"Relatório - {veiculo_obj.nome_conjunto if veiculo_obj else 'Geral'}"
-    pdf = PDF(title=titulo, orientation='P', unit='mm', format='A4')
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-
-    # Agrupa preenchimentos por data
-    dados_agrupados = defaultdict(list)
-    for p in preenchimentos:
-        dados_agrupados[p.data_preenchimento.date()].append(p)
-
-    for data, preenchs in sorted(dados_agrupados.items()):
-        pdf.set_font('Arial', 'B', 12)
-        pdf.cell(0, 10, f"Data do Checklist: {data.strftime('%d/%m/%Y')}", 0, 1, 'L')
-
-        for p in preenchs:
-            pdf.set_font('Arial', 'I', 10)
-            pdf.cell(0, 8, f"Preenchido por: {p.motorista.nome} às {p.data_preenchimento.strftime('%H:%M')}", 0, 1, 'L')
-            pdf.ln(2) # Pequeno espaço
-
-            item_counter = 1 # Inicia o contador sequencial de itens
-
-            for item_principal in itens_principais:
-                # Renderiza o cabeçalho da categoria (Item Principal)
-                pdf.set_font('Arial', 'B', 10)
-                pdf.set_fill_color(224, 224, 224) # Cinza claro
-                pdf.cell(0, 7, item_principal.texto.encode('latin-1', 'replace').decode('latin-1'), 1, 1, 'C', 1)
-
-                # Renderiza o cabeçalho da tabela
-                pdf.set_font('Arial', 'B', 9)
-                pdf.cell(15, 7, 'Item', 1, 0, 'C', 1)
-                pdf.cell(135, 7, 'Descrição', 1, 0, 'C', 1)
-                pdf.cell(40, 7, 'Resposta', 1, 1, 'C', 1)
-
-                pdf.set_font('Arial', '', 9)
-                if not item_principal.sub_itens:
-                    continue # Se não houver sub-itens, apenas o cabeçalho é mostrado
-
-                for sub_item in item_principal.sub_itens:
-                    resposta_obj = next((r for r in p.respostas if r.item_id == sub_item.id), None)
-                    
-                    h = 6 # Altura base da célula
-                    x_start = pdf.get_x()
-                    y_start = pdf.get_y()
-
-                    # Célula do Item (com contador)
-                    pdf.cell(15, h, str(item_counter), 1, 0, 'C')
-
-                    # Célula da Descrição (com multi_cell para quebra de linha)
-                    pdf.multi_cell(135, h, sub_item.texto.encode('latin-1', 'replace').decode('latin-1'), 1, 'L')
-                    
-                    # Armazena a posição Y final após a descrição
-                    y_end = pdf.get_y()
-
-                    # Reposiciona para a mesma linha da descrição para desenhar a resposta
-                    pdf.set_xy(x_start + 150, y_start)
-                    pdf.cell(40, y_end - y_start, resposta_obj.resposta if resposta_obj else '-', 1, 1, 'C')
-
-                    # Se houver observação, renderiza abaixo
-                    if resposta_obj and resposta_obj.observacao:
-                        pdf.set_font('Arial', 'I', 8)
-                        pdf.set_fill_color(245, 245, 245)
-                        pdf.multi_cell(0, 5, f"Obs: {resposta_obj.observacao.encode('latin-1', 'replace').decode('latin-1')}", 1, 'L', 1)
-                        pdf.set_font('Arial', '', 9)
-
-                    item_counter += 1
-            pdf.ln(10) # Espaço entre os preenchimentos de um mesmo dia
+
+    # Árvore de itens e respostas são carregadas em lote pelo gerador do relatório
+    conteudo_pdf = gerar_pdf_relatorio(preenchimentos, titulo_relatorio(veiculo_id))
 
     # Gera e retorna o PDF para download
-    return Response(bytes(pdf.output(dest='S')),
+    return Response(conteudo_pdf,
                     mimetype='application/pdf',
                     headers={'Content-Disposition': 'attachment;filename=relatorio_consolidado.pdf'})
 
 
 
+# --- RELATÓRIO PDF EM SEGUNDO PLANO ---
+
+def _estado_tarefa_relatorio_json(estado):
+    resposta = {
+        'id': estado['id'],
+        'status': estado.get('status'),
+        'progresso': estado.get('progresso', 0),
+        'mensagem': estado.get('mensagem'),
+        'erro': estado.get('erro'),
+        'url_status': url_for('admin.status_relatorio_pdf', tarefa_id=estado['id']),
+    }
+    if estado.get('status') == tarefas.CONCLUIDA:
+        resposta['url_download'] = url_for('admin.baixar_relatorio_pdf', tarefa_id=estado['id'])
+    return resposta
+
+
+@admin_bp.route('/relatorios/pdf/tarefas', methods=['POST'])
+def iniciar_relatorio_pdf():
+    """Enfileira a geração do PDF e devolve o ID da tarefa para acompanhamento."""
+    if 'admin_user' not in session:
+        return jsonify({'erro': 'Sessão expirada. Faça login novamente.'}), 401
+
+    filtros = {
+        'tipo_checklist': request.form.get('tipo_checklist') or None,
+        'veiculo_id': request.form.get('veiculo_id') or None,
+        'data_inicio_str': request.form.get('data_inicio') or None,
+        'data_fim_str': request.form.get('data_fim') or None,
+    }
+    estado = tarefas.submeter(
+        'relatorio_pdf', filtros, executar_tarefa_relatorio,
+        ttl=current_app.config['RELATORIO_TTL_SEGUNDOS']
+    )
+    return jsonify(_estado_tarefa_relatorio_json(estado)), 202
+
+
+@admin_bp.route('/relatorios/pdf/tarefas/<string:tarefa_id>')
+def status_relatorio_pdf(tarefa_id):
+    if 'admin_user' not in session:
+        return jsonify({'erro': 'Sessão expirada. Faça login novamente.'}), 401
+
+    estado = tarefas.ler_estado(secure_filename(tarefa_id))
+    if not estado or estado.get('tipo') != 'relatorio_pdf':
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
+    return jsonify(_estado_tarefa_relatorio_json(estado))
+
+
+@admin_bp.route('/relatorios/pdf/tarefas/<string:tarefa_id>/download')
+def baixar_relatorio_pdf(tarefa_id):
+    if 'admin_user' not in session:
+        return redirect(url_for('admin.login'))
+
+    estado = tarefas.ler_estado(secure_filename(tarefa_id))
+    if not tarefas.resultado_valido(estado, current_app.config['RELATORIO_TTL_SEGUNDOS']) \
+            or estado.get('tipo') != 'relatorio_pdf':
+        flash('O relatório solicitado não está disponível. Gere-o novamente.', 'warning')
+        return redirect(url_for('admin.relatorios_consolidados'))
+
+    return send_file(estado['arquivo'], mimetype='application/pdf', as_attachment=True,
+                     download_name='relatorio_consolidado.pdf')
+
+
 @admin_bp.route('/motoristas')
 @login_required()
 def motoristas():
@@ -1109,11 +1230,11 @@ def motoristas():
         motoristas_query = motoristas_query.filter(Motorista.unidade == user_unidade)
         veiculos_query = veiculos_query.filter(Veiculo.unidade == user_unidade)
 
-    lista_motoristas = motoristas_query.order_by(Motorista.nome).all()
+    pagina = paginar(com_perfil(motoristas_query, 'motorista_veiculo'), [Motorista.nome, Motorista.id])
     # A lista de veículos também é filtrada para ser usada no formulário de associação
     veiculos = veiculos_query.order_by(Veiculo.nome_conjunto).all()
 
-    return render_template('motoristas.html', motoristas=lista_motoristas, veiculos=veiculos)
+    return render_template('motoristas.html', motoristas=pagina.itens, pagina=pagina, veiculos=veiculos)
 
 
 @admin_bp.route('/motoristas/add', methods=['POST'])
@@ -1191,6 +1312,7 @@ def edit_motorista(motorista_id):
         motorista.unidade = request.form.get('unidade')
 
     db.session.commit()
+    invalidar_identidade(MOTORISTA, motorista.id)
     flash(f'Dados do motorista {motorista.nome} atualizados com sucesso!', 'success')
     return redirect(url_for('admin.motoristas'))
 
@@ -1213,6 +1335,7 @@ def delete_motorista(motorista_id):
     
     db.session.delete(motorista)
     db.session.commit()
+    invalidar_identidade(MOTORISTA, motorista_id)
     flash(f'Motorista {motorista.nome} excluído com sucesso.', 'info')
     return redirect(url_for('admin.motoristas'))
 
@@ -1237,6 +1360,7 @@ def add_conteudo():
 
     tipo_recurso = request.form.get('tipo_recurso')
     recurso_link = None
+    arquivo_salvo = None
 
     if tipo_recurso == 'link':
         recurso_link = request.form.get('link')
@@ -1253,16 +1377,21 @@ def add_conteudo():
             flash('Nenhum arquivo selecionado. Por favor, escolha um arquivo para enviar.', 'error')
             return redirect(url_for('admin.conteudo')) # CORRIGIDO
 
-        if file and allowed_file(file.filename):
-            filename = secure_filename(file.filename)
-            if not os.path.exists(UPLOAD_FOLDER):
-                os.makedirs(UPLOAD_FOLDER)
-            file.save(os.path.join(UPLOAD_FOLDER, filename))
-            # Armazena o caminho relativo para ser usado no template
-            recurso_link = os.path.join('uploads', filename).replace('\\', '/')
+        # Gravado pelo hash do conteúdo: nomes iguais não se sobrescrevem e arquivos repetidos não duplicam
+        try:
+            arquivo_salvo = salvar_upload(file, pasta_uploads(), ALLOWED_EXTENSIONS)
+        except UploadInvalido as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.conteudo'))
+        # Armazena o caminho relativo para ser usado no template
+        recurso_link = f'uploads/{arquivo_salvo.nome}'
+        caminho_arquivo = os.path.join(pasta_uploads(), arquivo_salvo.nome)
+        if arquivo_salvo.tipo_mime == 'application/pdf':
+            # Miniatura da primeira página, gerada em segundo plano
+            solicitar_miniatura(caminho_arquivo, arquivo_salvo.hash)
         else:
-            flash('Tipo de arquivo não permitido.', 'danger')
-            return redirect(url_for('admin.conteudo')) # CORRIGIDO
+            # Versões reduzidas (e WebP) das imagens, servidas ao celular via srcset
+            gerar_derivadas(caminho_arquivo)
 
     # Cria o novo conteúdo se tudo estiver OK
     novo_conteudo = Conteudo(
@@ -1274,6 +1403,10 @@ def add_conteudo():
         tipo_recurso=tipo_recurso, 
         recurso_link=recurso_link
     )
+    if arquivo_salvo:
+        novo_conteudo.hash_conteudo = arquivo_salvo.hash
+        novo_conteudo.tamanho = arquivo_salvo.tamanho
+        novo_conteudo.tipo_mime = arquivo_salvo.tipo_mime
     db.session.add(novo_conteudo)
     db.session.commit()
     
@@ -1300,6 +1433,12 @@ def checklists():
     # O template decide como exibir (ex: checklists inativos com cor diferente).
     lista_checklists = query.order_by(Checklist.ativo.desc(), Checklist.codigo).all()
 
+    # Quantidade de itens de cada checklist em uma única consulta agrupada
+    total_itens = dict(
+        db.session.query(ChecklistItem.checklist_id, db.func.count(ChecklistItem.id))
+        .group_by(ChecklistItem.checklist_id).all()
+    )
+
     unidades_disponiveis = []
     if user_role == 'admin':
         unidades_disponiveis = db.session.query(Motorista.unidade).distinct().all()
@@ -1308,6 +1447,7 @@ def checklists():
     return render_template(
         'checklists.html', 
         checklists=lista_checklists, 
+        total_itens=total_itens,
         unidades_disponiveis=unidades_disponiveis
     )
 
@@ -1368,13 +1508,7 @@ def lista_checklists_motorista():
         return redirect(url_for('main.motorista_login'))
     
     motorista_id = session['motorista_id']
-    motorista = Motorista.query.get(motorista_id)
-
-    if not motorista:
-        flash('Seus dados de motorista não foram encontrados.', 'danger')
-        return redirect(url_for('main.motorista_login'))
-        
-    motorista_unidade = motorista.unidade
+    motorista_unidade = g.motorista.unidade
     
     # FILTRO ATUALIZADO: Adiciona a condição 'Checklist.ativo == True'.
     checklists = Checklist.query.filter(
@@ -1386,40 +1520,14 @@ def lista_checklists_motorista():
         )
     ).order_by(Checklist.tipo, Checklist.codigo).all()
     
-    checklists_com_status = []
-    hoje = date.today()
+    # Status de todos os checklists resolvido em uma única consulta
+    preenchidos = checklists_preenchidos_no_periodo(motorista_id, checklists)
 
+    checklists_com_status = []
     for checklist in checklists:
-        preenchido_no_periodo = False
-        status_texto = "Pendente"
-
-        # Lógica para verificar o status (Diário)
-        if checklist.tipo == 'DIÁRIO':
-            preenchimento = ChecklistPreenchido.query.filter(
-                and_(
-                    ChecklistPreenchido.motorista_id == motorista_id,
-                    ChecklistPreenchido.checklist_id == checklist.id,
-                    db.func.date(ChecklistPreenchido.data_preenchimento) == hoje
-                )
-            ).first()
-            if preenchimento:
-                preenchido_no_periodo = True
-                status_texto = "Preenchido Hoje"
-
-        # Lógica para verificar o status (Mensal)
-        elif checklist.tipo == 'MENSAL':
-            preenchimento = ChecklistPreenchido.query.filter(
-                and_(
-                    ChecklistPreenchido.motorista_id == motorista_id,
-                    ChecklistPreenchido.checklist_id == checklist.id,
-                    db.func.extract('year', ChecklistPreenchido.data_preenchimento) == hoje.year,
-                    db.func.extract('month', ChecklistPreenchido.data_preenchimento) == hoje.month
-                )
-            ).first()
-            if preenchimento:
-                preenchido_no_periodo = True
-                status_texto = "Preenchido este Mês"
-        
+        preenchido_no_periodo = checklist.id in preenchidos
+        status_texto = STATUS_PERIODO[checklist.tipo] if preenchido_no_periodo else "Pendente"
+
         checklists_com_status.append({
             'checklist': checklist, 
             'preenchido': preenchido_no_periodo,
@@ -1446,8 +1554,8 @@ def view_checklist(checklist_id):
         flash('Você não tem permissão para ver este checklist.', 'danger')
         return redirect(url_for('admin.checklists'))
 
-    # Busca os itens principais (que não são sub-itens)
-    itens_principais = checklist.itens.filter_by(parent_id=None).order_by(ChecklistItem.ordem).all()
+    # Itens principais (com os sub-itens), em ordem natural
+    itens_principais = arvore_checklist(checklist)
 
     return render_template(
         'checklist_detalhe.html', 
@@ -1492,6 +1600,7 @@ def add_checklist_item(checklist_id):
         parent_id=int(parent_id) if parent_id else None
     )
     db.session.add(novo_item)
+    invalidar_arvore(checklist.id)
     db.session.commit()
     
     flash('Item adicionado com sucesso!', 'success')
@@ -1521,6 +1630,7 @@ def edit_checklist_item(item_id):
         item.texto = novo_texto
         if nova_ordem is not None and not item.parent_id:
             item.ordem = nova_ordem
+        invalidar_arvore(item.checklist_id)
         db.session.commit()
         flash('Item atualizado com sucesso.', 'success')
 
@@ -1543,6 +1653,7 @@ def delete_checklist_item(item_id):
         return redirect(url_for('admin.checklists'))
     
     db.session.delete(item)
+    invalidar_arvore(checklist_id)
     db.session.commit()
     
     flash('Item removido com sucesso.', 'info')
@@ -1590,8 +1701,12 @@ def conteudo_detalhe(conteudo_id):
     if 'admin_user' not in session:
         return redirect(url_for('admin.login'))
     conteudo = Conteudo.query.get_or_404(conteudo_id)
-    relatorio = conteudo.assinaturas
-    return render_template('conteudo_detalhe.html', conteudo=conteudo, relatorio=relatorio)
+    total_assinaturas = db.session.query(db.func.count(Assinatura.id))\
+        .filter(Assinatura.conteudo_id == conteudo_id).scalar()
+    pagina = paginar(com_perfil(Assinatura.query.filter(Assinatura.conteudo_id == conteudo_id), 'assinatura_motorista'),
+                     [Assinatura.data_assinatura, Assinatura.id], descendente=True)
+    return render_template('conteudo_detalhe.html', conteudo=conteudo, relatorio=pagina.itens,
+                           pagina=pagina, total_assinaturas=total_assinaturas)
 
 
 
@@ -1661,30 +1776,14 @@ def checklist_detalhe(checklist_id):
                 parent_id=int(parent_id) if parent_id else None
             )
             db.session.add(novo_item)
+            invalidar_arvore(checklist.id)
             db.session.commit()
             flash('Item adicionado com sucesso.', 'success')
         
         return redirect(url_for('admin.checklist_detalhe', checklist_id=checklist_id))
 
-    # --- LÓGICA DE ORDENAÇÃO CORRIGIDA ---
-    def natural_sort_key(s):
-        # 1. Garante que o valor de entrada é uma string
-        s_str = str(s or '0')
-        try:
-            # 2. Tenta separar por ponto e converter em números
-            return [int(c) for c in s_str.split('.')]
-        except ValueError:
-            # 3. Se falhar, retorna um valor que ordena o texto de forma previsível
-            return [s_str]
-
-    itens_principais_unsorted = checklist.itens.filter_by(parent_id=None).all()
-    itens_principais_sorted = sorted(itens_principais_unsorted, key=lambda item: natural_sort_key(item.ordem))
-    
-    itens_com_subitens = []
-    for item in itens_principais_sorted:
-        sub_itens_unsorted = item.sub_itens.all()
-        sub_itens_sorted = sorted(sub_itens_unsorted, key=lambda sub: natural_sort_key(sub.ordem))
-        itens_com_subitens.append((item, sub_itens_sorted))
+    # Árvore em cache, já em ordem natural ('2.2' antes de '2.10')
+    itens_com_subitens = [(item, item.sub_itens) for item in arvore_checklist(checklist)]
 
     return render_template(
         'checklist_detail.html', 
@@ -1707,10 +1806,10 @@ def checklists_preenchidos():
         query = query.join(Motorista, ChecklistPreenchido.motorista_id == Motorista.id)\
                      .filter(Motorista.unidade == user_unidade)
     
-    # Ordena os checklists do mais recente para o mais antigo
-    preenchidos = query.order_by(ChecklistPreenchido.data_preenchimento.desc()).all()
+    # Do mais recente para o mais antigo, uma página por vez
+    pagina = paginar(query, [ChecklistPreenchido.data_preenchimento, ChecklistPreenchido.id], descendente=True)
     
-    return render_template('checklists_preenchidos.html', preenchidos=preenchidos)
+    return render_template('checklists_preenchidos.html', preenchidos=pagina.itens, pagina=pagina)
 @admin_bp.route('/checklist/preenchido/<int:preenchido_id>')
 @login_required()
 def view_checklist_preenchido(preenchido_id):
@@ -1762,6 +1861,7 @@ def editar_item(item_id):
 
     item.texto = texto
     item.ordem = ordem_str
+    invalidar_arvore(item.checklist_id)
     db.session.commit()
     
     flash(f'Item "{item.texto}" foi atualizado com sucesso!', 'success')
@@ -1780,6 +1880,7 @@ def excluir_item(item_id):
 
     # A relação cascade no modelo deve cuidar da exclusão dos sub-itens
     db.session.delete(item)
+    invalidar_arvore(checklist_id)
     db.session.commit()
     
     flash(f'O item "{item.texto}" foi excluído.', 'info')
@@ -1851,6 +1952,20 @@ def importacao_pagina():
 
 # Substitua a sua função 'importar_dados' por esta versão COMPLETA e CORRIGIDA
 
+def _arquivo_importacao():
+    """Valida o arquivo enviado para importação. Devolve (arquivo, mensagem de erro)."""
+    if 'arquivo' not in request.files:
+        return None, 'Nenhum arquivo enviado.'
+
+    arquivo = request.files['arquivo']
+    if arquivo.filename == '':
+        return None, 'Nenhum arquivo selecionado.'
+
+    if not (arquivo.filename.endswith('.csv') or arquivo.filename.endswith('.xlsx')):
+        return None, 'Formato de arquivo inválido. Use .csv ou .xlsx.'
+    return arquivo, None
+
+
 @admin_bp.route('/importacao/<string:tipo>', methods=['POST'])
 @login_required(required_role=["admin"])
 def importar_dados(tipo):
@@ -1859,185 +1974,175 @@ def importar_dados(tipo):
     - Se um registro não existe, ele é criado.
     - Se um registro já existe, ele é atualizado caso os dados do arquivo sejam diferentes.
     - CORRIGIDO: Mapeia a coluna 'frota' da planilha para o campo 'operacao' do banco de dados.
+    O arquivo é lido e gravado em blocos pelo módulo de importação (um commit por bloco).
     """
-    if 'arquivo' not in request.files:
-        flash('Nenhum arquivo enviado.', 'danger')
+    arquivo, mensagem = _arquivo_importacao()
+    if mensagem:
+        flash(mensagem, 'danger')
         return redirect(url_for('admin.importacao_pagina'))
 
-    arquivo = request.files['arquivo']
-    if arquivo.filename == '':
-        flash('Nenhum arquivo selecionado.', 'danger')
-        return redirect(url_for('admin.importacao_pagina'))
+    caminho = salvar_upload_temporario(arquivo)
+    try:
+        resultado = importar_arquivo(tipo, caminho, current_app.config['IMPORTACAO_TAMANHO_LOTE'])
+        # A importação pode alterar unidade e veículo de motoristas já cadastrados
+        invalidar_identidade(MOTORISTA)
+
+        flash(f'Importação de {tipo} concluída! Adicionados: {resultado["adicionados"]}, Atualizados: {resultado["atualizados"]}, Ignorados (sem alterações): {resultado["ignorados"]}.', 'success')
+        for erro in resultado['erros']:
+            flash(formatar_erro(erro), 'warning')
+        if resultado['total_erros'] > len(resultado['erros']):
+            flash(f'... e mais {resultado["total_erros"] - len(resultado["erros"])} erro(s).', 'warning')
+
+    except ErroImportacao as e:
+        flash(str(e), 'danger')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Ocorreu um erro inesperado ao processar o arquivo: {e}', 'danger')
+    finally:
+        os.remove(caminho)
 
-    if not (arquivo.filename.endswith('.csv') or arquivo.filename.endswith('.xlsx')):
-        flash('Formato de arquivo inválido. Use .csv ou .xlsx.', 'danger')
+    return redirect(url_for('admin.importacao_pagina'))
+
+
+# --- PRÉVIA DA IMPORTAÇÃO (DRY-RUN) ---
+
+# Linhas exibidas por tabela na página da prévia
+LIMITE_LINHAS_PREVIA = 200
+
+
+@admin_bp.route('/importacao/<string:tipo>/previa', methods=['POST'])
+@login_required(required_role=["admin"])
+def previa_importacao(tipo):
+    """Compara o arquivo com o banco sem gravar e mostra o que seria alterado."""
+    if tipo not in TIPOS_IMPORTACAO:
+        abort(404)
+
+    arquivo, mensagem = _arquivo_importacao()
+    if mensagem:
+        flash(mensagem, 'danger')
         return redirect(url_for('admin.importacao_pagina'))
 
+    caminho = salvar_upload_temporario(arquivo)
     try:
-        in_memory_file = io.BytesIO(arquivo.read())
-        
-        if arquivo.filename.endswith('.csv'):
-            df = pd.read_csv(in_memory_file, sep=';', dtype=str, keep_default_na=False)
-        else:
-            df = pd.read_excel(in_memory_file, dtype=str, keep_default_na=False)
-        
-        df.columns = df.columns.str.strip().str.lower()
-        df = df.apply(lambda x: x.str.strip() if x.dtype == "object" else x)
-        
-        adicionados = 0
-        atualizados = 0
-        ignorados = 0
-        erros = []
-
-        if tipo == 'motoristas':
-            required_cols = ['nome', 'cpf', 'unidade']
-            if not all(col in df.columns for col in required_cols):
-                flash(f'Arquivo de motoristas deve conter as colunas: {", ".join(required_cols)}.', 'danger')
-                return redirect(url_for('admin.importacao_pagina'))
-
-            for index, row in df.iterrows():
-                if not row.get('cpf') or not row.get('nome') or not row.get('unidade'):
-                    erros.append(f'Linha {index + 2}: Faltando dados obrigatórios (nome, cpf, unidade).')
-                    ignorados += 1
-                    continue
-                
-                motorista = Motorista.query.filter_by(cpf=row['cpf']).first()
-                
-                # Pega o valor da coluna 'frota' para usar nos campos 'operacao' e 'frota' do banco
-                valor_operacao_frota = row.get('frota', '')
-
-                if motorista:
-                    # UPDATE: Motorista existe, verifica por mudanças
-                    changes = []
-                    if motorista.nome != row.get('nome'): motorista.nome = row.get('nome'); changes.append('nome')
-                    if motorista.unidade != row.get('unidade'): motorista.unidade = row.get('unidade'); changes.append('unidade')
-                    if motorista.rg != row.get('rg', ''): motorista.rg = row.get('rg', ''); changes.append('rg')
-                    if motorista.cnh != row.get('cnh', ''): motorista.cnh = row.get('cnh', ''); changes.append('cnh')
-                    
-                    if (motorista.operacao or '') != valor_operacao_frota: motorista.operacao = valor_operacao_frota; changes.append('operacao')
-                    if (motorista.frota or '') != valor_operacao_frota: motorista.frota = valor_operacao_frota; changes.append('frota')
-                    
-                    if changes:
-                        atualizados += 1
-                    else:
-                        ignorados += 1
-                else:
-                    # INSERT: Motorista não existe, cria um novo
-                    novo_motorista = Motorista(
-                        nome=row['nome'],
-                        cpf=row['cpf'],
-                        unidade=row['unidade'],
-                        operacao=valor_operacao_frota,
-                        frota=valor_operacao_frota,
-                        rg=row.get('rg', ''),
-                        cnh=row.get('cnh', '')
-                    )
-                    novo_motorista.set_password(None)
-                    db.session.add(novo_motorista)
-                    adicionados += 1
-
-        elif tipo == 'placas':
-            required_cols = ['numero', 'tipo', 'unidade']
-            if not all(col in df.columns for col in required_cols):
-                flash(f'Arquivo de placas deve conter as colunas: {", ".join(required_cols)}.', 'danger')
-                return redirect(url_for('admin.importacao_pagina'))
-
-            for index, row in df.iterrows():
-                numero_placa = row.get('numero', '').upper()
-                tipo_placa = row.get('tipo', '').upper()
-
-                if not numero_placa or not tipo_placa or not row.get('unidade'):
-                    erros.append(f'Linha {index + 2}: Faltando dados obrigatórios (numero, tipo, unidade).')
-                    ignorados += 1
-                    continue
-
-                if tipo_placa not in ['CAVALO', 'CARRETA']:
-                    erros.append(f"Linha {index + 2}: Tipo de placa '{row.get('tipo')}' inválido. Use 'CAVALO' ou 'CARRETA'.")
-                    ignorados += 1
-                    continue
-                
-                placa = Placa.query.filter_by(numero=numero_placa).first()
-
-                if placa:
-                    changes = []
-                    if (placa.tipo or '') != tipo_placa: placa.tipo = tipo_placa; changes.append('tipo')
-                    if (placa.unidade or '') != row.get('unidade'): placa.unidade = row.get('unidade'); changes.append('unidade')
-                    if (placa.operacao or '') != row.get('operacao', ''): placa.operacao = row.get('operacao', ''); changes.append('operacao')
-                    if changes: atualizados += 1
-                    else: ignorados += 1
-                else:
-                    nova_placa = Placa(numero=numero_placa, tipo=tipo_placa, unidade=row['unidade'], operacao=row.get('operacao', ''))
-                    db.session.add(nova_placa)
-                    adicionados += 1
-        
-        elif tipo == 'conjuntos':
-            required_cols = ['nome_conjunto', 'unidade', 'placa_cavalo']
-            if not all(col in df.columns for col in required_cols):
-                flash(f'Arquivo de conjuntos deve conter as colunas: {", ".join(required_cols)}.', 'danger')
-                return redirect(url_for('admin.importacao_pagina'))
-
-            for index, row in df.iterrows():
-                nome_conjunto = row.get('nome_conjunto')
-                if not nome_conjunto or not row.get('unidade') or not row.get('placa_cavalo'):
-                    erros.append(f'Linha {index + 2}: Faltando dados obrigatórios (nome_conjunto, unidade, placa_cavalo).')
-                    ignorados += 1
-                    continue
-                
-                placa_cavalo_num = row.get('placa_cavalo').upper()
-                cavalo = Placa.query.filter_by(numero=placa_cavalo_num).first()
-                if not cavalo:
-                    erros.append(f"Linha {index + 2}: Placa cavalo '{placa_cavalo_num}' não encontrada no banco.")
-                    ignorados += 1
-                    continue
-                
-                carreta1_id = None
-                placa_carreta1_num = row.get('placa_carreta1', '').upper()
-                if placa_carreta1_num:
-                    carreta1 = Placa.query.filter_by(numero=placa_carreta1_num).first()
-                    if carreta1: carreta1_id = carreta1.id
-                    else: erros.append(f"Linha {index + 2}: Placa carreta 1 '{placa_carreta1_num}' não encontrada.")
-                
-                carreta2_id = None
-                placa_carreta2_num = row.get('placa_carreta2', '').upper()
-                if placa_carreta2_num:
-                    carreta2 = Placa.query.filter_by(numero=placa_carreta2_num).first()
-                    if carreta2: carreta2_id = carreta2.id
-                    else: erros.append(f"Linha {index + 2}: Placa carreta 2 '{placa_carreta2_num}' não encontrada.")
-
-                veiculo = Veiculo.query.filter_by(nome_conjunto=nome_conjunto).first()
-
-                if veiculo:
-                    changes = []
-                    if veiculo.unidade != row.get('unidade'): veiculo.unidade = row.get('unidade'); changes.append('unidade')
-                    if veiculo.operacao != row.get('operacao', ''): veiculo.operacao = row.get('operacao', ''); changes.append('operacao')
-                    if veiculo.obs != row.get('obs', ''): veiculo.obs = row.get('obs', ''); changes.append('obs')
-                    if veiculo.placa_cavalo_id != cavalo.id: veiculo.placa_cavalo_id = cavalo.id; changes.append('placa_cavalo')
-                    if veiculo.placa_carreta1_id != carreta1_id: veiculo.placa_carreta1_id = carreta1_id; changes.append('placa_carreta1')
-                    if veiculo.placa_carreta2_id != carreta2_id: veiculo.placa_carreta2_id = carreta2_id; changes.append('placa_carreta2')
-                    if changes: atualizados += 1
-                    else: ignorados += 1
-                else:
-                    novo_veiculo = Veiculo(
-                        nome_conjunto=nome_conjunto, unidade=row.get('unidade'), operacao=row.get('operacao', ''),
-                        obs=row.get('obs', ''), placa_cavalo_id=cavalo.id, placa_carreta1_id=carreta1_id,
-                        placa_carreta2_id=carreta2_id)
-                    db.session.add(novo_veiculo)
-                    adicionados += 1
+        previa_id = gerar_previa(tipo, caminho, arquivo.filename,
+                                 current_app.config['IMPORTACAO_TAMANHO_LOTE'],
+                                 current_app.config['IMPORTACAO_PREVIA_TTL_SEGUNDOS'])
+    except ErroImportacao as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.importacao_pagina'))
+    except Exception as e:
+        flash(f'Ocorreu um erro inesperado ao processar o arquivo: {e}', 'danger')
+        return redirect(url_for('admin.importacao_pagina'))
+    finally:
+        os.remove(caminho)
 
-        db.session.commit()
+    return redirect(url_for('admin.ver_previa_importacao', previa_id=previa_id))
+
+
+@admin_bp.route('/importacao/previas/<string:previa_id>')
+@login_required(required_role=["admin"])
+def ver_previa_importacao(previa_id):
+    estado, plano = carregar_previa(secure_filename(previa_id), current_app.config['IMPORTACAO_PREVIA_TTL_SEGUNDOS'])
+    if not plano:
+        flash('A prévia expirou ou não foi encontrada. Envie o arquivo novamente.', 'warning')
+        return redirect(url_for('admin.importacao_pagina'))
+
+    return render_template('admin_importacao_previa.html', estado=estado, plano=plano,
+                           limite=LIMITE_LINHAS_PREVIA)
 
-        flash(f'Importação de {tipo} concluída! Adicionados: {adicionados}, Atualizados: {atualizados}, Ignorados (sem alterações): {ignorados}.', 'success')
-        if erros:
-            for erro in erros[:5]:
-                flash(erro, 'warning')
 
+@admin_bp.route('/importacao/previas/<string:previa_id>/aplicar', methods=['POST'])
+@login_required(required_role=["admin"])
+def aplicar_previa_importacao(previa_id):
+    """Grava o plano calculado na prévia, sem ler e comparar o arquivo de novo."""
+    try:
+        estado, plano = aplicar_previa(secure_filename(previa_id),
+                                       current_app.config['IMPORTACAO_PREVIA_TTL_SEGUNDOS'],
+                                       current_app.config['IMPORTACAO_TAMANHO_LOTE'])
+    except ErroImportacao as e:
+        flash(str(e), 'warning')
+        return redirect(url_for('admin.importacao_pagina'))
     except Exception as e:
         db.session.rollback()
-        flash(f'Ocorreu um erro inesperado ao processar o arquivo: {e}', 'danger')
+        flash(f'Ocorreu um erro inesperado ao aplicar a importação: {e}', 'danger')
+        return redirect(url_for('admin.importacao_pagina'))
 
+    # A importação pode alterar unidade e veículo de motoristas já cadastrados
+    invalidar_identidade(MOTORISTA)
+    flash(f'Importação de {estado["tipo_importacao"]} concluída! Adicionados: {plano["adicionados"]}, Atualizados: {plano["atualizados"]}, Ignorados (sem alterações): {plano["ignorados"]}.', 'success')
     return redirect(url_for('admin.importacao_pagina'))
 
 
+# --- IMPORTAÇÃO EM SEGUNDO PLANO ---
+
+def _estado_tarefa_importacao_json(estado):
+    resposta = {
+        'id': estado['id'],
+        'status': estado.get('status'),
+        'progresso': estado.get('progresso', 0),
+        'mensagem': estado.get('mensagem'),
+        'erro': estado.get('erro'),
+        'linhas_processadas': estado.get('linhas_processadas', 0),
+        'total_linhas': estado.get('total_linhas'),
+        'linhas_por_segundo': estado.get('linhas_por_segundo'),
+        'url_status': url_for('admin.status_importacao', tarefa_id=estado['id']),
+    }
+    if estado.get('status') == tarefas.CONCLUIDA:
+        resposta['resultado'] = estado.get('resultado')
+        if (estado.get('resultado') or {}).get('total_erros'):
+            resposta['url_erros'] = url_for('admin.baixar_erros_importacao', tarefa_id=estado['id'])
+    return resposta
+
+
+@admin_bp.route('/importacao/<string:tipo>/tarefas', methods=['POST'])
+def iniciar_importacao(tipo):
+    """Recebe o arquivo, enfileira a importação e devolve o ID da tarefa para acompanhamento."""
+    if session.get('role') != 'admin':
+        return jsonify({'erro': 'Sessão expirada ou sem permissão. Faça login novamente.'}), 401
+    if tipo not in TIPOS_IMPORTACAO:
+        return jsonify({'erro': f'Tipo de importação desconhecido: {tipo}.'}), 404
+
+    arquivo, mensagem = _arquivo_importacao()
+    if mensagem:
+        return jsonify({'erro': mensagem}), 400
+
+    # O arquivo fica na pasta das tarefas até o processo de importação removê-lo
+    caminho = salvar_upload_temporario(arquivo, tarefas.pasta_tarefas())
+    estado = tarefas.submeter(
+        'importacao', {'tipo': tipo, 'arquivo': caminho, 'nome': arquivo.filename},
+        executar_tarefa_importacao, ttl=current_app.config['IMPORTACAO_TTL_SEGUNDOS']
+    )
+    return jsonify(_estado_tarefa_importacao_json(estado)), 202
+
+
+@admin_bp.route('/importacao/tarefas/<string:tarefa_id>')
+def status_importacao(tarefa_id):
+    if session.get('role') != 'admin':
+        return jsonify({'erro': 'Sessão expirada ou sem permissão. Faça login novamente.'}), 401
+
+    estado = tarefas.ler_estado(secure_filename(tarefa_id))
+    if not estado or estado.get('tipo') != 'importacao':
+        return jsonify({'erro': 'Tarefa não encontrada.'}), 404
+    if estado.get('status') == tarefas.CONCLUIDA:
+        # A tarefa gravou em outro processo: descarta as identidades guardadas neste
+        invalidar_identidade(MOTORISTA)
+    return jsonify(_estado_tarefa_importacao_json(estado))
+
+
+@admin_bp.route('/importacao/tarefas/<string:tarefa_id>/erros')
+@login_required(required_role=["admin"])
+def baixar_erros_importacao(tarefa_id):
+    """Download do CSV com todos os erros da importação."""
+    estado = tarefas.ler_estado(secure_filename(tarefa_id))
+    if not tarefas.resultado_valido(estado, current_app.config['IMPORTACAO_TTL_SEGUNDOS']) \
+            or estado.get('tipo') != 'importacao':
+        flash('O relatório de erros não está mais disponível.', 'warning')
+        return redirect(url_for('admin.importacao_pagina'))
+
+    return send_file(estado['arquivo'], mimetype='text/csv', as_attachment=True,
+                     download_name=f'erros_importacao_{tarefa_id[:8]}.csv')
+
+
 # --- ROTAS DE DOCUMENTOS PARA MOTORISTA ---
 
 @main_bp.route('/documentos')
@@ -2053,18 +2158,59 @@ def lista_documentos_motorista():
 
 @main_bp.route('/documentos/acessar/<int:documento_id>')
 def acessar_documento(documento_id):
+    """
+    Serve um documento fixo. A URL é pelo id, que o SQLite reaproveita quando o
+    último documento é excluído, então o navegador sempre revalida (no-cache):
+    o ETag forte é o hash do conteúdo, que devolve 304 enquanto o arquivo não
+    mudar, e pedidos de Range recebem 206.
+    """
     if 'motorista_id' not in session and 'user_id' not in session:
         flash('Acesso negado. Por favor, faça login.', 'danger')
         return redirect(url_for('main.index'))
         
     documento = DocumentoFixo.query.get_or_404(documento_id)
-    directory = os.path.abspath(DOCUMENTOS_UPLOAD_FOLDER)
+    caminho = safe_join(pasta_uploads(PASTA_DOCUMENTOS), documento.nome_arquivo)
     
     action = request.args.get('action', 'view') 
     as_attachment = (action == 'download')
+    # O nome gravado é o hash: o download recebe o título do documento
+    download_name = f"{secure_filename(documento.titulo) or 'documento'}.{extensao_upload(documento.nome_arquivo)}"
+
+    if not caminho or not os.path.isfile(caminho):
+        abort(404)
+    return enviar_arquivo(caminho, privado=True, as_attachment=as_attachment,
+                          etag=documento.hash_conteudo, download_name=download_name)
 
-    return send_from_directory(
-        directory=directory, 
-        path=documento.nome_arquivo, 
-        as_attachment=as_attachment
-    )
\ No newline at end of file
+
+@main_bp.route('/miniaturas/<string:chave>.webp')
+def ver_miniatura(chave):
+    """
+    Miniatura da primeira página de um PDF. O nome é o hash do PDF, então o arquivo
+    nunca muda: ETag forte e cache longo, como as assinaturas.
+    """
+    if 'motorista_id' not in session and 'user_id' not in session:
+        abort(401)
+    if not e_chave_miniatura(chave):
+        abort(404)
+    caminho = caminho_miniatura(chave)
+    if not os.path.exists(caminho):
+        abort(404)
+    return enviar_arquivo(caminho, imutavel=True, privado=True, etag=chave)
+
+
+@main_bp.route('/static/uploads/<path:nome>')
+def ver_upload(nome):
+    """
+    Arquivos enviados com os conteúdos e suas versões reduzidas (mesma URL de
+    url_for('static', ...)). Nomes gerados pelo hash do conteúdo nunca mudam e
+    recebem cache longo; nomes antigos podem ter sido sobrescritos, então o navegador
+    sempre revalida e recebe 304 pelo hash do conteúdo enquanto o arquivo não mudar.
+    """
+    caminho = safe_join(pasta_uploads(), nome)
+    if not caminho or not os.path.isfile(caminho):
+        abort(404)
+    # O próprio nome identifica o conteúdo (original ou versão reduzida) e serve de ETag
+    nome_arquivo = os.path.basename(nome)
+    if nome_por_conteudo(nome_arquivo):
+        return enviar_arquivo(caminho, imutavel=True, etag=nome_arquivo)
+    return enviar_arquivo(caminho)
\ No newline at end of file
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, current_app
+
+# Estados possíveis de uma tarefa em segundo plano
+PENDENTE = 'pendente'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+
+# Pool de processos local; criado sob demanda em cada processo WSGI
+_executor = None
+_trava_executor = threading.Lock()
+
+# Momento da última gravação de progresso, por tarefa em execução neste processo
+_ultimo_progresso = {}
+
+# Tarefas em andamento sem atualização há mais tempo que isto são consideradas abandonadas
+# (ex.: o processo foi reiniciado no meio da execução) e podem ser reenviadas
+LIMITE_SEM_ATUALIZACAO = 600
+
+
+def _obter_executor():
+    global _executor
+    with _trava_executor:
+        if _executor is None:
+            # 'spawn': o pool é criado dentro de uma requisição, em um processo WSGI com várias
+            # threads; um fork copiaria travas presas por outras threads e poderia travar o filho
+            _executor = ProcessPoolExecutor(max_workers=current_app.config.get('TAREFAS_PROCESSOS', 2),
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _descartar_executor(executor):
+    """Descarta o pool quebrado (um processo filho morreu); o próximo pedido cria outro."""
+    global _executor
+    with _trava_executor:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _ao_terminar(app, tarefa_id, futuro):
+    """
+    Callback do pool, no processo web: se a tarefa não chegou a gravar o resultado
+    (processo filho morto, falha ao criar a aplicação), marca-a com erro em vez de
+    deixá-la pendente até LIMITE_SEM_ATUALIZACAO.
+    """
+    if futuro.cancelled():
+        erro = 'Tarefa cancelada.'
+    elif futuro.exception() is not None:
+        erro = str(futuro.exception()) or type(futuro.exception()).__name__
+    else:
+        return
+    estado = ler_estado(tarefa_id, app)
+    if estado and estado.get('status') in (PENDENTE, EXECUTANDO):
+        app.logger.error('Tarefa %s interrompida: %s', tarefa_id, erro)
+        salvar_estado(tarefa_id, app, status=ERRO, erro=erro, mensagem='Falha no processamento')
+
+
+def pasta_tarefas(app=None):
+    """Diretório onde ficam o estado (JSON) e os arquivos gerados pelas tarefas."""
+    app = app or current_app
+    pasta = os.path.join(app.instance_path, 'tarefas')
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def gerar_id_tarefa(tipo, parametros):
+    """Gera um ID determinístico: pedidos idênticos resultam na mesma tarefa."""
+    chave = json.dumps({'tipo': tipo, 'parametros': parametros}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(chave.encode('utf-8')).hexdigest()[:32]
+
+
+def caminho_estado(tarefa_id, app=None):
+    return os.path.join(pasta_tarefas(app), f'{tarefa_id}.json')
+
+
+def ler_estado(tarefa_id, app=None):
+    """Lê o estado da tarefa, ou None se ela não existir."""
+    try:
+        with open(caminho_estado(tarefa_id, app), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def salvar_estado(tarefa_id, app=None, **campos):
+    """Atualiza o estado da tarefa de forma atômica (escreve em arquivo temporário e renomeia)."""
+    estado = ler_estado(tarefa_id, app) or {'id': tarefa_id}
+    estado.update(campos)
+    estado['atualizado_em'] = time.time()
+
+    destino = caminho_estado(tarefa_id, app)
+    temporario = f'{destino}.{os.getpid()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(estado, f, ensure_ascii=False)
+    os.replace(temporario, destino)
+    return estado
+
+
+def resultado_valido(estado, ttl):
+    """Indica se uma tarefa concluída ainda pode ser reaproveitada."""
+    if not estado or estado.get('status') != CONCLUIDA:
+        return False
+    arquivo = estado.get('arquivo')
+    if not arquivo or not os.path.exists(arquivo):
+        return False
+    return time.time() - estado.get('concluida_em', 0) < ttl
+
+
+def limpar_expiradas(ttl, app=None, tipo=None):
+    """Remove estados e arquivos de tarefas finalizadas há mais de 'ttl' segundos (só do 'tipo', se informado)."""
+    pasta = pasta_tarefas(app)
+    agora = time.time()
+    for nome in os.listdir(pasta):
+        if not nome.endswith('.json'):
+            continue
+        estado = ler_estado(nome[:-5], app)
+        if not estado or estado.get('status') not in (CONCLUIDA, ERRO):
+            continue
+        if tipo and estado.get('tipo') != tipo:
+            continue
+        if agora - estado.get('atualizado_em', 0) < ttl:
+            continue
+        for caminho in (estado.get('arquivo'), os.path.join(pasta, nome)):
+            if caminho:
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+
+
+def submeter(tipo, parametros, funcao, ttl):
+    """
+    Enfileira 'funcao(tarefa_id, parametros)' no pool de processos e devolve o estado.
+    Tarefas idênticas em andamento, ou concluídas dentro do TTL, são reaproveitadas.
+    """
+    limpar_expiradas(ttl, tipo=tipo)
+
+    tarefa_id = gerar_id_tarefa(tipo, parametros)
+    estado = ler_estado(tarefa_id)
+    if estado and resultado_valido(estado, ttl):
+        return estado
+    if estado and estado.get('status') in (PENDENTE, EXECUTANDO) \
+            and time.time() - estado.get('atualizado_em', 0) < LIMITE_SEM_ATUALIZACAO:
+        return estado
+
+    estado = salvar_estado(
+        tarefa_id, tipo=tipo, status=PENDENTE, progresso=0, mensagem='Aguardando processamento',
+        erro=None, arquivo=None, criada_em=time.time()
+    )
+    app = current_app._get_current_object()
+    # Um pool quebrado é recriado uma vez; se falhar de novo, a tarefa fica com erro
+    for _ in range(2):
+        executor = _obter_executor()
+        try:
+            futuro = executor.submit(_executar, funcao, tarefa_id, parametros, app.instance_path)
+        except BrokenProcessPool:
+            _descartar_executor(executor)
+            continue
+        futuro.add_done_callback(lambda f: _ao_terminar(app, tarefa_id, f))
+        return estado
+    return salvar_estado(tarefa_id, status=ERRO, erro='O pool de processos não está disponível.',
+                         mensagem='Falha no processamento')
+
+
+def _executar(funcao, tarefa_id, parametros, pasta_instancia):
+    """
+    Ponto de entrada no processo filho: cria a aplicação e executa a tarefa. Se a
+    aplicação não puder ser criada, o erro é gravado na pasta instance do processo web.
+    """
+    from . import create_app
+
+    try:
+        app = create_app()
+    except Exception as e:
+        salvar_estado(tarefa_id, Flask(__package__, instance_path=pasta_instancia), status=ERRO,
+                      erro=f'Falha ao iniciar a tarefa: {e}', mensagem='Falha no processamento')
+        raise
+    with app.app_context():
+        salvar_estado(tarefa_id, status=EXECUTANDO, mensagem='Processando',
+                      iniciada_em=time.time())
+        try:
+            funcao(tarefa_id, parametros)
+        except Exception as e:
+            current_app.logger.error('Tarefa %s falhou:\n%s', tarefa_id, traceback.format_exc())
+            salvar_estado(tarefa_id, status=ERRO, erro=str(e), mensagem='Falha no processamento')
+        else:
+            estado = ler_estado(tarefa_id)
+            if estado and estado.get('status') == EXECUTANDO:
+                salvar_estado(tarefa_id, status=CONCLUIDA, progresso=100, mensagem='Concluída',
+                              concluida_em=time.time())
+        finally:
+            _ultimo_progresso.pop(tarefa_id, None)
+
+
+def reportar_progresso(tarefa_id, feitos, total, mensagem=None, intervalo=0.5, **extras):
+    """
+    Grava o percentual concluído, limitando a frequência de escrita em disco.
+    'extras' são gravados junto no estado (ex.: contadores exibidos na tela).
+    """
+    agora = time.time()
+    if feitos < total and agora - _ultimo_progresso.get(tarefa_id, 0) < intervalo:
+        return
+    _ultimo_progresso[tarefa_id] = agora
+    campos = {'progresso': int(feitos * 100 / total) if total else 100}
+    if mensagem:
+        campos['mensagem'] = mensagem
+    salvar_estado(tarefa_id, **campos, **extras)
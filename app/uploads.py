@@ -0,0 +1,106 @@
+import hashlib
+import os
+import re
+import tempfile
+from collections import namedtuple
+from flask import current_app
+
+# Bloco copiado por vez do corpo da requisição para o disco
+BLOCO_UPLOAD = 1024 * 1024
+
+# Extensões aceitas: tipo MIME gravado no registro e início esperado do conteúdo.
+# Os formatos do Office só são distinguidos pela extensão (ZIP ou OLE por dentro).
+ZIP = (b'PK\x03\x04',)
+OLE = (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1',)
+TIPOS_UPLOAD = {
+    'pdf': ('application/pdf', (b'%PDF-',)),
+    'png': ('image/png', (b'\x89PNG\r\n\x1a\n',)),
+    'jpg': ('image/jpeg', (b'\xff\xd8\xff',)),
+    'gif': ('image/gif', (b'GIF87a', b'GIF89a')),
+    'doc': ('application/msword', OLE),
+    'xls': ('application/vnd.ms-excel', OLE),
+    'ppt': ('application/vnd.ms-powerpoint', OLE),
+    'docx': ('application/vnd.openxmlformats-officedocument.wordprocessingml.document', ZIP),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', ZIP),
+    'pptx': ('application/vnd.openxmlformats-officedocument.presentationml.presentation', ZIP),
+}
+SINONIMOS_EXTENSAO = {'jpeg': 'jpg'}
+
+# Subpasta dos documentos fixos dentro de static/uploads
+PASTA_DOCUMENTOS = 'documentos_fixos'
+
+# Nome dos arquivos gravados: hash SHA-256 do conteúdo + extensão
+# (as versões reduzidas das imagens acrescentam -<largura>; ver app/imagens.py)
+REGEX_NOME_UPLOAD = re.compile(r'^[0-9a-f]{64}(-\d+)?\.[a-z]+$')
+
+# nome: nome do arquivo na pasta; novo: False se o conteúdo já existia (deduplicado)
+ArquivoSalvo = namedtuple('ArquivoSalvo', ['nome', 'hash', 'tamanho', 'tipo_mime', 'novo'])
+
+
+class UploadInvalido(ValueError):
+    """O arquivo enviado não pode ser aceito (tipo, conteúdo ou tamanho)."""
+
+
+def pasta_uploads(subpasta=None):
+    """Pasta dos uploads (em static/uploads, servida por main.ver_upload)."""
+    pasta = os.path.join(current_app.static_folder, 'uploads', *([subpasta] if subpasta else []))
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def extensao_upload(nome_arquivo):
+    """Extensão normalizada do nome enviado (sem o ponto), ou '' se não houver."""
+    extensao = os.path.splitext(nome_arquivo or '')[1].lower().lstrip('.')
+    return SINONIMOS_EXTENSAO.get(extensao, extensao)
+
+
+def nome_por_conteudo(nome):
+    """Se o nome foi gerado a partir do hash do conteúdo (e portanto o arquivo nunca muda)."""
+    return bool(REGEX_NOME_UPLOAD.match(nome or ''))
+
+
+def gravar_fluxo(fluxo, nome_arquivo, pasta, extensoes):
+    """
+    Copia o fluxo para a pasta em blocos, calculando o SHA-256 e o tamanho na
+    mesma passada, sem manter o arquivo inteiro na memória. O nome final é o hash:
+    conteúdo repetido reaproveita o arquivo existente e a cópia temporária é descartada.
+    Levanta UploadInvalido para extensão não permitida, conteúdo que não corresponde
+    à extensão, arquivo vazio ou acima de UPLOAD_TAMANHO_MAX.
+    """
+    extensao = extensao_upload(nome_arquivo)
+    if extensao not in extensoes or extensao not in TIPOS_UPLOAD:
+        raise UploadInvalido('Tipo de arquivo não permitido.')
+    tipo_mime, inicios = TIPOS_UPLOAD[extensao]
+    limite = current_app.config['UPLOAD_TAMANHO_MAX']
+
+    sha = hashlib.sha256()
+    tamanho = 0
+    descritor, temporario = tempfile.mkstemp(prefix='upload-', suffix='.tmp', dir=pasta)
+    try:
+        with os.fdopen(descritor, 'wb') as destino:
+            for bloco in iter(lambda: fluxo.read(BLOCO_UPLOAD), b''):
+                if not tamanho and not bloco.startswith(inicios):
+                    raise UploadInvalido(f'O conteúdo do arquivo não corresponde a um .{extensao}.')
+                tamanho += len(bloco)
+                if tamanho > limite:
+                    raise UploadInvalido(f'Arquivo maior que o limite de {limite // (1024 * 1024)} MB.')
+                sha.update(bloco)
+                destino.write(bloco)
+        if not tamanho:
+            raise UploadInvalido('O arquivo enviado está vazio.')
+
+        hash_conteudo = sha.hexdigest()
+        nome = f'{hash_conteudo}.{extensao}'
+        destino_final = os.path.join(pasta, nome)
+        novo = not os.path.exists(destino_final)
+        if novo:
+            os.replace(temporario, destino_final)
+        return ArquivoSalvo(nome, hash_conteudo, tamanho, tipo_mime, novo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+
+def salvar_upload(arquivo, pasta, extensoes):
+    """Grava o arquivo do formulário (FileStorage) no armazenamento por conteúdo (gravar_fluxo)."""
+    return gravar_fluxo(arquivo.stream, arquivo.filename, pasta, extensoes)
@@ -0,0 +1,171 @@
+"""
+Benchmark do envio de checklists pelo motorista (submissões por segundo).
+
+Compara o caminho antigo (um objeto ChecklistResposta por item passando pelo
+unit of work e uma consulta de pendência por resposta NAO CONFORME) com o
+envio em lote de app/preenchimento.py.
+
+Uso:
+    python benchmarks/envio_checklist.py --envios 200 --grupos 6 --subitens 8 --nao-conformes 10
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+from app import create_app
+from app.extensions import db
+from app.models import (Motorista, Placa, Veiculo, Checklist, ChecklistItem,
+                        ChecklistPreenchido, ChecklistResposta, ExtintorCheck, Pendencia)
+from app.arvore_checklist import arvore_checklist, ids_itens
+from app.preenchimento import respostas_do_formulario, extintores_do_formulario, registrar_preenchimento
+
+
+def popular(grupos, subitens, veiculos):
+    """Cria o checklist e os veículos (com motorista) usados nos envios."""
+    checklist = Checklist(titulo='Checklist Diário', tipo='DIÁRIO', codigo='BENCH',
+                          revisao='1', data=date.today())
+    db.session.add(checklist)
+    db.session.flush()
+
+    sub_ids = []
+    for g in range(1, grupos + 1):
+        principal = ChecklistItem(checklist_id=checklist.id, texto=f'Grupo {g}', ordem=str(g))
+        db.session.add(principal)
+        db.session.flush()
+        for s in range(1, subitens + 1):
+            sub = ChecklistItem(checklist_id=checklist.id, texto=f'Verificar item {g}.{s}',
+                                ordem=f'{g}.{s}', parent_id=principal.id)
+            db.session.add(sub)
+            db.session.flush()
+            sub_ids.append(sub.id)
+
+    motoristas = []
+    for m in range(veiculos):
+        placa = Placa(numero=f'BEN{m:04d}', tipo='CAVALO')
+        db.session.add(placa)
+        db.session.flush()
+        veiculo = Veiculo(nome_conjunto=f'Conjunto {m}', placa_cavalo_id=placa.id)
+        db.session.add(veiculo)
+        db.session.flush()
+        motorista = Motorista(nome=f'Motorista {m}', cpf=f'{m:011d}', veiculo_id=veiculo.id)
+        db.session.add(motorista)
+        db.session.flush()
+        motoristas.append((motorista.id, veiculo.id))
+    db.session.commit()
+    return checklist.id, sub_ids, motoristas
+
+
+def formulario(sub_ids, envio, nao_conformes):
+    """Formulário como o enviado pelo navegador, com algumas não conformidades e um extintor."""
+    campos = MultiDict()
+    for i, item_id in enumerate(sub_ids):
+        nao_conforme = (i + envio) % len(sub_ids) < nao_conformes
+        campos[f'resposta-{item_id}'] = 'NAO CONFORME' if nao_conforme else 'CONFORME'
+        campos[f'obs-{item_id}'] = 'Verificar na oficina' if nao_conforme else ''
+    campos['extintor-0-local'] = 'Cabine'
+    campos['extintor-0-tipo'] = 'PQS'
+    campos['extintor-0-peso'] = '4kg'
+    campos['extintor-0-vencimento'] = '31/12/2026'
+    return campos
+
+
+def enviar_legado(checklist_id, motorista_id, veiculo_id, form):
+    """Reprodução do envio original de preencher_checklist."""
+    preenchimento = ChecklistPreenchido(motorista_id=motorista_id, veiculo_id=veiculo_id,
+                                        checklist_id=checklist_id)
+    db.session.add(preenchimento)
+
+    respostas_adicionadas = []
+    for key in form:
+        if key.startswith('resposta-'):
+            item_id = int(key.split('-')[-1])
+            resposta = ChecklistResposta(preenchimento=preenchimento, item_id=item_id,
+                                         resposta=form.get(key), observacao=form.get(f'obs-{item_id}', ''))
+            db.session.add(resposta)
+            respostas_adicionadas.append(resposta)
+
+    for extintor in extintores_do_formulario(form):
+        db.session.add(ExtintorCheck(preenchimento=preenchimento, **extintor))
+
+    db.session.flush()
+
+    for resposta in respostas_adicionadas:
+        if resposta.resposta == 'NAO CONFORME':
+            existente = Pendencia.query.filter_by(item_id=resposta.item_id, veiculo_id=veiculo_id,
+                                                  status='PENDENTE').first()
+            if not existente:
+                db.session.add(Pendencia(item_id=resposta.item_id, veiculo_id=veiculo_id,
+                                         resposta_abertura_id=resposta.id))
+    db.session.commit()
+
+
+def enviar_lote(checklist_id, motorista_id, veiculo_id, form):
+    """Envio atual: validação contra a árvore em cache e gravação em lote."""
+    checklist = db.session.get(Checklist, checklist_id)
+    respostas, _ = respostas_do_formulario(form, ids_itens(arvore_checklist(checklist)))
+    registrar_preenchimento(
+        {'motorista_id': motorista_id, 'veiculo_id': veiculo_id, 'checklist_id': checklist_id},
+        respostas,
+        extintores_do_formulario(form)
+    )
+    db.session.commit()
+
+
+def limpar():
+    for modelo in (Pendencia, ExtintorCheck, ChecklistResposta, ChecklistPreenchido):
+        db.session.query(modelo).delete()
+    db.session.commit()
+
+
+def medir(nome, funcao, checklist_id, sub_ids, motoristas, envios, nao_conformes):
+    """Executa os envios a partir de tabelas vazias, contando as consultas SQL."""
+    formularios = [formulario(sub_ids, e, nao_conformes) for e in range(envios)]
+    consultas = [0]
+
+    def contar(*args):
+        consultas[0] += 1
+
+    limpar()
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    for e, form in enumerate(formularios):
+        motorista_id, veiculo_id = motoristas[e % len(motoristas)]
+        funcao(checklist_id, motorista_id, veiculo_id, form)
+    duracao = time.perf_counter() - inicio
+    event.remove(db.engine, 'before_cursor_execute', contar)
+
+    print(f'{nome:<10} {envios:>6} envios {duracao:8.2f} s  {envios / duracao:8.0f} envios/s  '
+          f'{consultas[0] / envios:6.1f} consultas/envio  {Pendencia.query.count():>5} pendências')
+    return envios / duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--envios', type=int, default=200)
+    parser.add_argument('--grupos', type=int, default=6)
+    parser.add_argument('--subitens', type=int, default=8)
+    parser.add_argument('--nao-conformes', type=int, default=10, help='Respostas NAO CONFORME por envio')
+    parser.add_argument('--veiculos', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        checklist_id, sub_ids, motoristas = popular(args.grupos, args.subitens, args.veiculos)
+
+        print(f'{args.envios} envios, {len(sub_ids)} respostas e {args.nao_conformes} não conformidades cada\n')
+        legado = medir('legado', enviar_legado, checklist_id, sub_ids, motoristas, args.envios, args.nao_conformes)
+        lote = medir('lote', enviar_lote, checklist_id, sub_ids, motoristas, args.envios, args.nao_conformes)
+        print(f'\nGanho: {lote / legado:.1f}x')
+
+if __name__ == '__main__':
+    main()
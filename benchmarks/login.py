@@ -0,0 +1,72 @@
+"""
+Benchmark do login (logins por segundo por núcleo).
+
+Mede o custo de conferir uma senha em cada método de hash (o que limita a vazão
+de logins de um núcleo) e o efeito do limitador de app/autenticacao.py numa rajada
+de tentativas erradas contra o mesmo CPF: só as primeiras chegam a calcular o hash.
+
+Uso:
+    python benchmarks/login.py --logins 20 --rajada 2000 --metodos scrypt:32768:8:1 pbkdf2:sha256:600000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from app import create_app
+from app.models import Motorista
+from app.autenticacao import gerar_hash_senha, verificar_senha, tentar_login, LoginBloqueado
+
+METODOS_PADRAO = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:260000']
+
+
+def medir_metodo(app, metodo, logins):
+    """Logins corretos por segundo em um núcleo com o método informado."""
+    app.config['SENHA_METODO'] = metodo
+    motorista = Motorista(nome='Bench', cpf='12345678901')
+    motorista.password_hash = gerar_hash_senha('123456')
+
+    inicio = time.perf_counter()
+    for _ in range(logins):
+        assert verificar_senha(motorista, '123456')
+    duracao = time.perf_counter() - inicio
+    print(f'{metodo:<24} {duracao / logins * 1000:8.1f} ms/login  {logins / duracao:8.1f} logins/s por núcleo')
+
+
+def medir_rajada(app, tentativas):
+    """Tentativas erradas seguidas contra o mesmo CPF e IP, passando pelo limitador."""
+    motorista = Motorista(nome='Bench', cpf='98765432100')
+    motorista.password_hash = gerar_hash_senha('123456')
+
+    bloqueadas = 0
+    inicio = time.perf_counter()
+    for _ in range(tentativas):
+        try:
+            tentar_login(motorista, 'errada', motorista.cpf, '203.0.113.7')
+        except LoginBloqueado:
+            bloqueadas += 1
+    duracao = time.perf_counter() - inicio
+    print(f'\nRajada de {tentativas} tentativas erradas (mesmo CPF e IP): {tentativas - bloqueadas} hash(es) '
+          f'calculado(s), {bloqueadas} bloqueada(s) em {duracao:.2f} s ({tentativas / duracao:,.0f} tentativas/s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--logins', type=int, default=20, help='Logins medidos por método')
+    parser.add_argument('--rajada', type=int, default=2000, help='Tentativas erradas na simulação de ataque')
+    parser.add_argument('--metodos', nargs='+', default=METODOS_PADRAO)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        for metodo in args.metodos:
+            medir_metodo(app, metodo, args.logins)
+        app.config['SENHA_METODO'] = args.metodos[0]
+        medir_rajada(app, args.rajada)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark do relatório consolidado em PDF sobre um mês sintético de dados.
+
+Compara a montagem antiga (uma consulta por sub-item em cada preenchimento)
+com o gerador em lote de app/relatorios.py.
+
+Uso:
+    python benchmarks/relatorio_pdf.py --motoristas 20 --dias 30 --grupos 6 --subitens 8
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models import (Motorista, Placa, Veiculo, Checklist, ChecklistItem,
+                        ChecklistPreenchido, ChecklistResposta)
+from app.relatorios import PDF, latin1, consultar_preenchimentos, gerar_pdf_relatorio
+
+
+def popular_mes(motoristas, dias, grupos, subitens):
+    """Cria um checklist diário e um mês de preenchimentos com todas as respostas."""
+    checklist = Checklist(titulo='Checklist Diário', tipo='DIÁRIO', codigo='BENCH',
+                          revisao='1', data=date.today())
+    db.session.add(checklist)
+    db.session.flush()
+
+    sub_ids = []
+    for g in range(1, grupos + 1):
+        principal = ChecklistItem(checklist_id=checklist.id, texto=f'Grupo {g}', ordem=str(g))
+        db.session.add(principal)
+        db.session.flush()
+        for s in range(1, subitens + 1):
+            sub = ChecklistItem(checklist_id=checklist.id, texto=f'Verificar item {g}.{s}',
+                                ordem=f'{g}.{s}', parent_id=principal.id)
+            db.session.add(sub)
+            db.session.flush()
+            sub_ids.append(sub.id)
+
+    veiculos = []
+    for m in range(motoristas):
+        placa = Placa(numero=f'BEN{m:04d}', tipo='CAVALO')
+        db.session.add(placa)
+        db.session.flush()
+        veiculo = Veiculo(nome_conjunto=f'Conjunto {m}', placa_cavalo_id=placa.id)
+        db.session.add(veiculo)
+        db.session.flush()
+        motorista = Motorista(nome=f'Motorista {m}', cpf=f'{m:011d}', veiculo_id=veiculo.id)
+        db.session.add(motorista)
+        db.session.flush()
+        veiculos.append((motorista.id, veiculo.id))
+
+    inicio = datetime.utcnow().replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=dias)
+    respostas = []
+    for d in range(dias):
+        for motorista_id, veiculo_id in veiculos:
+            p = ChecklistPreenchido(motorista_id=motorista_id, veiculo_id=veiculo_id,
+                                    checklist_id=checklist.id,
+                                    data_preenchimento=inicio + timedelta(days=d))
+            db.session.add(p)
+            db.session.flush()
+            for i, item_id in enumerate(sub_ids):
+                nao_conforme = (i + d) % 17 == 0
+                respostas.append({
+                    'preenchimento_id': p.id,
+                    'item_id': item_id,
+                    'resposta': 'NAO CONFORME' if nao_conforme else 'CONFORME',
+                    'observacao': 'Verificar na oficina' if nao_conforme else '',
+                })
+    db.session.bulk_insert_mappings(ChecklistResposta, respostas)
+    db.session.commit()
+    return inicio.date(), (inicio + timedelta(days=dias)).date()
+
+
+def gerar_pdf_legado(preenchimentos, titulo):
+    """Reprodução da montagem original, com consultas dentro do laço de desenho."""
+    itens_principais = []
+    if preenchimentos:
+        checklist_base = Checklist.query.get(preenchimentos[0].checklist_id)
+        itens_principais = checklist_base.itens.filter_by(parent_id=None).order_by(ChecklistItem.ordem).all()
+
+    pdf = PDF(title=titulo, orientation='P', unit='mm', format='A4')
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+
+    dados_agrupados = defaultdict(list)
+    for p in preenchimentos:
+        dados_agrupados[p.data_preenchimento.date()].append(p)
+
+    for data, preenchs in sorted(dados_agrupados.items()):
+        pdf.set_font('Arial', 'B', 12)
+        pdf.cell(0, 10, f"Data do Checklist: {data.strftime('%d/%m/%Y')}", 0, 1, 'L')
+        for p in preenchs:
+            pdf.set_font('Arial', 'I', 10)
+            pdf.cell(0, 8, f"Preenchido por: {p.motorista.nome} às {p.data_preenchimento.strftime('%H:%M')}", 0, 1, 'L')
+            pdf.ln(2)
+            item_counter = 1
+            for item_principal in itens_principais:
+                pdf.set_font('Arial', 'B', 10)
+                pdf.cell(0, 7, latin1(item_principal.texto), 1, 1, 'C', 1)
+                pdf.set_font('Arial', 'B', 9)
+                pdf.cell(15, 7, 'Item', 1, 0, 'C', 1)
+                pdf.cell(135, 7, 'Descrição', 1, 0, 'C', 1)
+                pdf.cell(40, 7, 'Resposta', 1, 1, 'C', 1)
+                pdf.set_font('Arial', '', 9)
+                for sub_item in item_principal.sub_itens:
+                    resposta_obj = next((r for r in p.respostas if r.item_id == sub_item.id), None)
+                    x_start, y_start = pdf.get_x(), pdf.get_y()
+                    pdf.cell(15, 6, str(item_counter), 1, 0, 'C')
+                    pdf.multi_cell(135, 6, latin1(sub_item.texto), 1, 'L')
+                    y_end = pdf.get_y()
+                    pdf.set_xy(x_start + 150, y_start)
+                    pdf.cell(40, y_end - y_start, resposta_obj.resposta if resposta_obj else '-', 1, 1, 'C')
+                    if resposta_obj and resposta_obj.observacao:
+                        pdf.multi_cell(0, 5, f"Obs: {latin1(resposta_obj.observacao)}", 1, 'L', 1)
+                    item_counter += 1
+            pdf.ln(10)
+    return bytes(pdf.output(dest='S'))
+
+
+def medir(nome, funcao, data_inicio, data_fim):
+    """Executa consulta + renderização a partir de uma sessão vazia, contando as consultas SQL."""
+    consultas = [0]
+
+    def contar(*args):
+        consultas[0] += 1
+
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', contar)
+    inicio = time.perf_counter()
+    preenchimentos = consultar_preenchimentos(
+        data_inicio_str=data_inicio.isoformat(), data_fim_str=data_fim.isoformat()
+    ).order_by(ChecklistPreenchido.data_preenchimento.desc()).all()
+    conteudo = funcao(preenchimentos, 'Relatório - Benchmark')
+    duracao = time.perf_counter() - inicio
+    event.remove(db.engine, 'before_cursor_execute', contar)
+
+    print(f'{nome:<10} {len(preenchimentos):>6} preenchimentos {duracao:8.2f} s  '
+          f'{consultas[0]:>7} consultas  {len(conteudo) / 1024:8.0f} KiB')
+    return duracao
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--motoristas', type=int, default=20)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--grupos', type=int, default=6)
+    parser.add_argument('--subitens', type=int, default=8)
+    parser.add_argument('--sem-legado', action='store_true', help='Mede apenas o gerador em lote')
+    args = parser.parse_args()
+
+    # O FPDF emite avisos de depreciação a cada chamada; não interessam aqui
+    warnings.simplefilter('ignore')
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        data_inicio, data_fim = popular_mes(args.motoristas, args.dias, args.grupos, args.subitens)
+
+        print(f'{args.motoristas} motoristas x {args.dias} dias, {args.grupos * args.subitens} sub-itens por checklist\n')
+        novo = medir('lote', gerar_pdf_relatorio, data_inicio, data_fim)
+        if not args.sem_legado:
+            legado = medir('legado', gerar_pdf_legado, data_inicio, data_fim)
+            print(f'\nGanho: {legado / novo:.1f}x')
+
+if __name__ == '__main__':
+    main()
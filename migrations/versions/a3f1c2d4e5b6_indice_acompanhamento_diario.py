@@ -0,0 +1,26 @@
+"""Indice de cobertura para o acompanhamento diario
+
+Revision ID: a3f1c2d4e5b6
+Revises: 513d83aee085
+Create Date: 2025-10-06 09:12:40.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c2d4e5b6'
+down_revision = '513d83aee085'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.create_index('ix_checklist_preenchido_checklist_data', ['checklist_id', 'data_preenchimento', 'motorista_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_preenchido_checklist_data')
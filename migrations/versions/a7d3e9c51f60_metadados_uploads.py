@@ -0,0 +1,34 @@
+"""Hash, tamanho e tipo dos arquivos enviados (conteudo e documento_fixo)
+
+Revision ID: a7d3e9c51f60
+Revises: f2c6e8a41b93
+Create Date: 2025-10-17 15:40:08.214530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9c51f60'
+down_revision = 'f2c6e8a41b93'
+branch_labels = None
+depends_on = None
+
+TABELAS = ('conteudo', 'documento_fixo')
+
+
+def upgrade():
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('hash_conteudo', sa.String(length=64), nullable=True))
+            batch_op.add_column(sa.Column('tamanho', sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column('tipo_mime', sa.String(length=100), nullable=True))
+
+
+def downgrade():
+    for tabela in TABELAS:
+        with op.batch_alter_table(tabela, schema=None) as batch_op:
+            batch_op.drop_column('tipo_mime')
+            batch_op.drop_column('tamanho')
+            batch_op.drop_column('hash_conteudo')
@@ -0,0 +1,52 @@
+"""Indices compostos para as consultas frequentes
+
+Revision ID: b7e2d9f03c41
+Revises: a3f1c2d4e5b6
+Create Date: 2025-10-07 10:03:12.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9f03c41'
+down_revision = 'a3f1c2d4e5b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.create_index('ix_checklist_preenchido_motorista_checklist_data', ['motorista_id', 'checklist_id', 'data_preenchimento'], unique=False)
+
+    with op.batch_alter_table('checklist_resposta', schema=None) as batch_op:
+        batch_op.create_index('ix_checklist_resposta_preenchimento_item', ['preenchimento_id', 'item_id'], unique=False)
+
+    with op.batch_alter_table('pendencia', schema=None) as batch_op:
+        batch_op.create_index('ix_pendencia_veiculo_status_item', ['veiculo_id', 'status', 'item_id'], unique=False)
+
+    with op.batch_alter_table('assinatura', schema=None) as batch_op:
+        batch_op.create_index('ix_assinatura_motorista_conteudo', ['motorista_id', 'conteudo_id'], unique=False)
+        batch_op.create_index('ix_assinatura_conteudo', ['conteudo_id'], unique=False)
+
+    with op.batch_alter_table('checklist_item', schema=None) as batch_op:
+        batch_op.create_index('ix_checklist_item_arvore', ['checklist_id', 'parent_id', 'ordem'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('checklist_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_item_arvore')
+
+    with op.batch_alter_table('assinatura', schema=None) as batch_op:
+        batch_op.drop_index('ix_assinatura_conteudo')
+        batch_op.drop_index('ix_assinatura_motorista_conteudo')
+
+    with op.batch_alter_table('pendencia', schema=None) as batch_op:
+        batch_op.drop_index('ix_pendencia_veiculo_status_item')
+
+    with op.batch_alter_table('checklist_resposta', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_resposta_preenchimento_item')
+
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_preenchido_motorista_checklist_data')
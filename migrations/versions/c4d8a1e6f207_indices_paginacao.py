@@ -0,0 +1,53 @@
+"""Indices para a paginacao por chave das listagens
+
+Revision ID: c4d8a1e6f207
+Revises: b7e2d9f03c41
+Create Date: 2025-10-14 09:21:47.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a1e6f207'
+down_revision = 'b7e2d9f03c41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.create_index('ix_checklist_preenchido_data', ['data_preenchimento'], unique=False)
+
+    with op.batch_alter_table('pendencia', schema=None) as batch_op:
+        batch_op.create_index('ix_pendencia_status_data', ['status', 'data_criacao'], unique=False)
+
+    with op.batch_alter_table('conteudo', schema=None) as batch_op:
+        batch_op.create_index('ix_conteudo_data', ['data'], unique=False)
+
+    with op.batch_alter_table('motorista', schema=None) as batch_op:
+        batch_op.create_index('ix_motorista_nome', ['nome'], unique=False)
+
+    # (conteudo_id, data_assinatura) também atende às buscas só por conteudo_id
+    with op.batch_alter_table('assinatura', schema=None) as batch_op:
+        batch_op.drop_index('ix_assinatura_conteudo')
+        batch_op.create_index('ix_assinatura_conteudo_data', ['conteudo_id', 'data_assinatura'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('assinatura', schema=None) as batch_op:
+        batch_op.drop_index('ix_assinatura_conteudo_data')
+        batch_op.create_index('ix_assinatura_conteudo', ['conteudo_id'], unique=False)
+
+    with op.batch_alter_table('motorista', schema=None) as batch_op:
+        batch_op.drop_index('ix_motorista_nome')
+
+    with op.batch_alter_table('conteudo', schema=None) as batch_op:
+        batch_op.drop_index('ix_conteudo_data')
+
+    with op.batch_alter_table('pendencia', schema=None) as batch_op:
+        batch_op.drop_index('ix_pendencia_status_data')
+
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_preenchido_data')
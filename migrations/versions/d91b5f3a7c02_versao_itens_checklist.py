@@ -0,0 +1,26 @@
+"""Versao dos itens do checklist (chave do cache da arvore)
+
+Revision ID: d91b5f3a7c02
+Revises: c4d8a1e6f207
+Create Date: 2025-10-15 14:37:05.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91b5f3a7c02'
+down_revision = 'c4d8a1e6f207'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checklist', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('versao_itens', sa.Integer(), nullable=False, server_default=sa.text('0')))
+
+
+def downgrade():
+    with op.batch_alter_table('checklist', schema=None) as batch_op:
+        batch_op.drop_column('versao_itens')
@@ -0,0 +1,55 @@
+"""Chave de ordenacao natural materializada em checklist_item
+
+Revision ID: e5a0c7b2d418
+Revises: d91b5f3a7c02
+Create Date: 2025-10-16 08:45:19.264037
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a0c7b2d418'
+down_revision = 'd91b5f3a7c02'
+branch_labels = None
+depends_on = None
+
+# Cópia de app.models.calcular_chave_ordem no momento desta migração
+LARGURA_PARTE_ORDEM = 9
+
+
+def calcular_chave_ordem(ordem):
+    partes = str(ordem if ordem is not None else '0').replace(',', '.').split('.')
+    return '.'.join(
+        p.strip().zfill(LARGURA_PARTE_ORDEM) if p.strip().isdigit() else '~' + p.strip()
+        for p in partes
+    )
+
+
+def upgrade():
+    with op.batch_alter_table('checklist_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('chave_ordem', sa.String(length=100), nullable=True))
+
+    # Preenche a chave dos itens existentes
+    conn = op.get_bind()
+    item = sa.table('checklist_item', sa.column('id', sa.Integer), sa.column('ordem', sa.String),
+                    sa.column('chave_ordem', sa.String))
+    linhas = conn.execute(sa.select(item.c.id, item.c.ordem)).fetchall()
+    if linhas:
+        conn.execute(
+            item.update().where(item.c.id == sa.bindparam('item_id')).values(chave_ordem=sa.bindparam('chave')),
+            [{'item_id': item_id, 'chave': calcular_chave_ordem(ordem)} for item_id, ordem in linhas]
+        )
+
+    with op.batch_alter_table('checklist_item', schema=None) as batch_op:
+        batch_op.alter_column('chave_ordem', existing_type=sa.String(length=100), nullable=False)
+        batch_op.drop_index('ix_checklist_item_arvore')
+        batch_op.create_index('ix_checklist_item_arvore', ['checklist_id', 'parent_id', 'chave_ordem'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('checklist_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_checklist_item_arvore')
+        batch_op.create_index('ix_checklist_item_arvore', ['checklist_id', 'parent_id', 'ordem'], unique=False)
+        batch_op.drop_column('chave_ordem')
@@ -0,0 +1,28 @@
+"""Chave de idempotencia do envio em lote de checklists
+
+Revision ID: f2c6e8a41b93
+Revises: e5a0c7b2d418
+Create Date: 2025-10-17 10:12:33.508716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c6e8a41b93'
+down_revision = 'e5a0c7b2d418'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('chave_envio', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_checklist_preenchido_chave_envio', ['chave_envio'])
+
+
+def downgrade():
+    with op.batch_alter_table('checklist_preenchido', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_checklist_preenchido_chave_envio', type_='unique')
+        batch_op.drop_column('chave_envio')
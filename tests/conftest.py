@@ -0,0 +1,80 @@
+import base64
+import io
+import os
+from datetime import date
+
+import pytest
+from PIL import Image
+
+from app import autenticacao, create_app
+from app.extensions import db
+from app.identidade import MOTORISTA, USUARIO, invalidar_identidade
+from app.models import Checklist, ChecklistItem, Motorista, Placa, Usuario, Veiculo
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicação com banco SQLite em memória e pastas de arquivos temporárias."""
+    monkeypatch.setenv('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    monkeypatch.setenv('ASSINATURAS_FOLDER', str(tmp_path / 'assinaturas'))
+    monkeypatch.setenv('MINIATURAS_FOLDER', str(tmp_path / 'miniaturas'))
+    app = create_app()
+    app.config['TESTING'] = True
+    # Hash barato nos testes e limitador de login zerado a cada teste
+    app.config['SENHA_METODO'] = 'pbkdf2:sha256:1000'
+    monkeypatch.setattr(autenticacao, '_limitador', autenticacao.LimitadorTentativas())
+    # Estado das tarefas e prévias de importação fica fora da pasta instance do projeto
+    app.instance_path = str(tmp_path / 'instance')
+    # Os ids se repetem entre os testes: nada do cache de identidades de um teste vale no outro
+    invalidar_identidade(MOTORISTA)
+    invalidar_identidade(USUARIO)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def dados(app):
+    """Administrador, veículo com motorista vinculado e um checklist diário com dois itens."""
+    usuario = Usuario(nome='admin', cpf='00000000000', unidade='MATRIZ', role='admin')
+    usuario.password = 'senha-admin'
+    placa = Placa(numero='ABC1D23', tipo='CAVALO')
+    db.session.add_all([usuario, placa])
+    db.session.flush()
+    veiculo = Veiculo(nome_conjunto='Conjunto 1', placa_cavalo_id=placa.id, unidade='MATRIZ')
+    db.session.add(veiculo)
+    db.session.flush()
+    motorista = Motorista(nome='Motorista', cpf='12345678901', unidade='MATRIZ', veiculo_id=veiculo.id)
+    checklist = Checklist(titulo='Diário', tipo='DIÁRIO', codigo='CL-01', revisao='1', data=date.today())
+    db.session.add_all([motorista, checklist])
+    db.session.flush()
+    itens = [ChecklistItem(checklist_id=checklist.id, texto=f'Item {i}', ordem=str(i)) for i in (1, 2)]
+    db.session.add_all(itens)
+    db.session.commit()
+    return {'usuario': usuario, 'veiculo': veiculo, 'motorista': motorista,
+            'checklist': checklist, 'itens': [i.id for i in itens]}
+
+
+def entrar_como_motorista(client, motorista):
+    with client.session_transaction() as sessao:
+        sessao['motorista_id'] = motorista.id
+
+
+def entrar_como_admin(client, usuario):
+    with client.session_transaction() as sessao:
+        sessao.update(user_id=usuario.id, admin_user=usuario.nome, role=usuario.role, unidade=usuario.unidade)
+
+
+@pytest.fixture
+def assinatura():
+    """Data URL de um PNG pequeno, como a enviada pelo canvas de assinatura."""
+    buffer = io.BytesIO()
+    Image.new('RGBA', (40, 20), (0, 0, 0, 255)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
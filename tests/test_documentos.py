@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+from app.extensions import db
+from app.models import DocumentoFixo
+from app.uploads import PASTA_DOCUMENTOS, pasta_uploads
+from conftest import entrar_como_motorista
+
+CONTEUDO = b'%PDF-1.4\n% documento de teste\n'
+
+
+def criar_documento(app, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    chave = hashlib.sha256(CONTEUDO).hexdigest()
+    with open(os.path.join(pasta_uploads(PASTA_DOCUMENTOS), f'{chave}.pdf'), 'wb') as arquivo:
+        arquivo.write(CONTEUDO)
+    documento = DocumentoFixo(titulo='Manual', nome_arquivo=f'{chave}.pdf', hash_conteudo=chave,
+                              tamanho=len(CONTEUDO), tipo_mime='application/pdf')
+    db.session.add(documento)
+    db.session.commit()
+    return documento
+
+
+def test_documento_pelo_id_sempre_revalida(app, client, dados, tmp_path):
+    documento = criar_documento(app, tmp_path)
+    entrar_como_motorista(client, dados['motorista'])
+
+    resposta = client.get(f'/documentos/acessar/{documento.id}')
+
+    assert resposta.status_code == 200
+    assert resposta.data == CONTEUDO
+    assert resposta.cache_control.no_cache
+    assert resposta.cache_control.private
+    assert not resposta.cache_control.immutable
+    assert not resposta.cache_control.max_age
+    assert resposta.get_etag() == (documento.hash_conteudo, False)
+
+    revalidacao = client.get(f'/documentos/acessar/{documento.id}', headers={'If-None-Match': f'"{documento.hash_conteudo}"'})
+    assert revalidacao.status_code == 304
+
+
+def test_arquivo_pelo_hash_e_imutavel(app, client, dados, tmp_path):
+    documento = criar_documento(app, tmp_path)
+
+    resposta = client.get(f'/static/uploads/{PASTA_DOCUMENTOS}/{documento.nome_arquivo}')
+
+    assert resposta.status_code == 200
+    assert resposta.cache_control.immutable
+    assert resposta.cache_control.max_age == 31536000
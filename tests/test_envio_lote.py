@@ -0,0 +1,77 @@
+import pytest
+
+from app.models import ChecklistPreenchido, ExtintorCheck
+from conftest import entrar_como_motorista
+
+
+def preenchimento(dados, assinatura, chave, **campos):
+    item = {
+        'chave': chave,
+        'checklist_id': dados['checklist'].id,
+        'assinatura_motorista': assinatura,
+        'respostas': [{'item_id': i, 'resposta': 'CONFORME'} for i in dados['itens']],
+        'extintores': [{'local': 'Cabine', 'tipo': 'PQS', 'peso': '4kg', 'vencimento': '2030-01-31'}],
+    }
+    item.update(campos)
+    return item
+
+
+@pytest.mark.parametrize('campos', [
+    {'outros_problemas': ['x']},
+    {'solucoes_adotadas': 5},
+    {'assinatura_motorista': {'png': 'x'}},
+    {'assinatura_responsavel': ['data:image/png;base64,']},
+    {'extintores': [{'local': 'Cabine', 'peso': [1]}]},
+    {'extintores': [{'local': 'Cabine', 'peso': '4kg', 'vencimento': 20300131}]},
+    {'extintores': [{'local': {'nome': 'Cabine'}, 'peso': '4kg'}]},
+    {'respostas': [{'item_id': 0, 'resposta': 'CONFORME', 'observacao': 5}]},
+])
+def test_tipo_errado_vira_erro_so_do_item(client, dados, assinatura, campos):
+    if 'respostas' in campos:
+        campos['respostas'][0]['item_id'] = dados['itens'][0]
+    entrar_como_motorista(client, dados['motorista'])
+
+    resposta = client.post('/checklists/lote', json={'preenchimentos': [
+        preenchimento(dados, assinatura, 'invalido', **campos),
+        preenchimento(dados, assinatura, 'valido'),
+    ]})
+
+    assert resposta.status_code == 200
+    corpo = resposta.get_json()
+    assert [r['status'] for r in corpo['resultados']] == ['erro', 'criado']
+    assert corpo['resultados'][0]['erro']
+    assert [p.chave_envio for p in ChecklistPreenchido.query] == ['valido']
+
+
+def test_textos_validos_sao_gravados(client, dados, assinatura):
+    entrar_como_motorista(client, dados['motorista'])
+
+    resposta = client.post('/checklists/lote', json={'preenchimentos': [
+        preenchimento(dados, assinatura, 'a1', outros_problemas='Farol queimado', assinatura_responsavel=None),
+    ]})
+
+    assert resposta.get_json()['criados'] == 1
+    registro = ChecklistPreenchido.query.one()
+    assert registro.outros_problemas == 'Farol queimado'
+    assert ExtintorCheck.query.one().peso == '4kg'
+
+
+def test_falha_ao_gravar_desfaz_a_sessao(app, client, dados, assinatura, monkeypatch):
+    import app.routes as rotas
+
+    def falhar(envios):
+        # Grava parte do lote antes de falhar
+        dados_envio = envios[0][0]
+        rotas.db.session.add(ChecklistPreenchido(**{campo: dados_envio[campo] for campo in
+                                                    ('motorista_id', 'veiculo_id', 'checklist_id', 'chave_envio')}))
+        rotas.db.session.flush()
+        raise RuntimeError('falha ao gravar')
+
+    monkeypatch.setattr(rotas, 'registrar_lote', falhar)
+    app.config['PROPAGATE_EXCEPTIONS'] = False
+    entrar_como_motorista(client, dados['motorista'])
+
+    resposta = client.post('/checklists/lote', json={'preenchimentos': [preenchimento(dados, assinatura, 'a1')]})
+
+    assert resposta.status_code == 500
+    assert ChecklistPreenchido.query.count() == 0
@@ -0,0 +1,57 @@
+import io
+from datetime import date
+
+from app import tarefas
+from app.extensions import db
+from app.models import Checklist, ChecklistItem, Motorista
+from conftest import entrar_como_admin, entrar_como_motorista
+
+
+def checklist_da_filial():
+    checklist = Checklist(titulo='Checklist da Filial', tipo='DIÁRIO', codigo='CL-FILIAL', revisao='1',
+                          data=date.today(), unidade='FILIAL')
+    db.session.add(checklist)
+    db.session.flush()
+    db.session.add(ChecklistItem(checklist_id=checklist.id, texto='Item', ordem='1'))
+    db.session.commit()
+
+
+def test_portal_reflete_unidade_logo_apos_importacao(app, dados):
+    checklist_da_filial()
+    motorista = dados['motorista']
+    motorista_id, nome, cpf = motorista.id, motorista.nome, motorista.cpf
+    portal = app.test_client()
+    entrar_como_motorista(portal, motorista)
+    # Primeira visita guarda a identidade (unidade MATRIZ) no cache do processo
+    assert 'CL-FILIAL' not in portal.get('/checklists_motorista').get_data(as_text=True)
+
+    admin = app.test_client()
+    entrar_como_admin(admin, dados['usuario'])
+    planilha = f'nome;cpf;unidade\n{nome};{cpf};FILIAL\n'.encode('utf-8')
+    resposta = admin.post('/admin/importacao/motoristas',
+                          data={'arquivo': (io.BytesIO(planilha), 'motoristas.csv')},
+                          content_type='multipart/form-data')
+    assert resposta.status_code == 302
+    assert db.session.get(Motorista, motorista_id).unidade == 'FILIAL'
+
+    assert 'CL-FILIAL' in portal.get('/checklists_motorista').get_data(as_text=True)
+
+
+def test_portal_reflete_importacao_em_segundo_plano(app, dados):
+    checklist_da_filial()
+    motorista = dados['motorista']
+    motorista_id, nome, cpf = motorista.id, motorista.nome, motorista.cpf
+    portal = app.test_client()
+    entrar_como_motorista(portal, motorista)
+    assert 'CL-FILIAL' not in portal.get('/checklists_motorista').get_data(as_text=True)
+
+    # A tarefa grava em outro processo: aqui, só o banco e o estado concluído mudam
+    Motorista.query.filter_by(id=motorista_id).update({'unidade': 'FILIAL'})
+    db.session.commit()
+    tarefas.salvar_estado('tarefa-teste', tipo='importacao', status=tarefas.CONCLUIDA, progresso=100)
+
+    admin = app.test_client()
+    entrar_como_admin(admin, dados['usuario'])
+    assert admin.get('/admin/importacao/tarefas/tarefa-teste').get_json()['status'] == tarefas.CONCLUIDA
+
+    assert 'CL-FILIAL' in portal.get('/checklists_motorista').get_data(as_text=True)
@@ -0,0 +1,39 @@
+from app.extensions import db
+from app.models import Motorista
+
+IP_DO_PATIO = '198.51.100.20'
+
+
+def cadastrar_motoristas(quantidade):
+    motoristas = [Motorista(nome=f'Motorista {i}', cpf=f'{i:011d}', unidade='MATRIZ') for i in range(1, quantidade + 1)]
+    db.session.add_all(motoristas)
+    db.session.commit()
+    return [m.cpf for m in motoristas]
+
+
+def entrar(app, cpf, senha):
+    cliente = app.test_client()
+    return cliente.post('/login/motorista', data={'login': cpf, 'senha': senha}, environ_base={'REMOTE_ADDR': IP_DO_PATIO})
+
+
+def test_troca_de_turno_no_mesmo_ip(app):
+    # Mais motoristas que o limite por IP entram do mesmo endereço com a senha correta
+    cpfs = cadastrar_motoristas(app.config['LOGIN_TENTATIVAS_IP'] + 10)
+
+    status = [entrar(app, cpf, cpf[:6]).status_code for cpf in cpfs]
+
+    assert status == [302] * len(cpfs)
+    assert entrar(app, cpfs[-1], cpfs[-1][:6]).location.endswith('/portal/motorista')
+
+
+def test_senhas_erradas_bloqueiam_a_conta_e_o_ip(app):
+    app.config['LOGIN_TENTATIVAS_IP'] = 8
+    cpfs = cadastrar_motoristas(3)
+
+    conta = [entrar(app, cpfs[0], 'errada').status_code for _ in range(app.config['LOGIN_TENTATIVAS_CONTA'] + 2)]
+    assert conta == [302] * app.config['LOGIN_TENTATIVAS_CONTA'] + [429, 429]
+
+    # Restam poucas tentativas no IP: esgotadas por senhas erradas, até a senha correta é recusada
+    while entrar(app, cpfs[1], 'errada').status_code != 429:
+        pass
+    assert entrar(app, cpfs[2], cpfs[2][:6]).status_code == 429
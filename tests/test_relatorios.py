@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app import relatorios
+from app.extensions import db
+from app.models import ChecklistPreenchido
+from conftest import entrar_como_admin
+
+# 22:30 de 17/10 no horário de Brasília (UTC-3) é 01:30 de 18/10 em UTC
+PREENCHIDO_EM_UTC = datetime(2026, 10, 18, 1, 30)
+
+
+def preenchimento_noturno(dados):
+    db.session.add(ChecklistPreenchido(motorista_id=dados['motorista'].id, veiculo_id=dados['veiculo'].id,
+                                       checklist_id=dados['checklist'].id, data_preenchimento=PREENCHIDO_EM_UTC))
+    db.session.commit()
+
+
+def test_consolidado_agrupa_pelo_dia_local(client, dados):
+    preenchimento_noturno(dados)
+    entrar_como_admin(client, dados['usuario'])
+
+    pagina = client.post('/admin/relatorios_consolidados',
+                         data={'data_inicio': '2026-10-17', 'data_fim': '2026-10-17'}).get_data(as_text=True)
+
+    assert '17/10/2026' in pagina
+    assert '18/10/2026' not in pagina
+    assert 'às 22:30' in pagina
+
+
+def test_pdf_agrupa_pelo_dia_local(client, dados, monkeypatch):
+    preenchimento_noturno(dados)
+    entrar_como_admin(client, dados['usuario'])
+    textos = []
+    cell = relatorios.PDF.cell
+
+    def registrar(pdf, *args, **kwargs):
+        textos.append(args[2] if len(args) > 2 else kwargs.get('txt', ''))
+        return cell(pdf, *args, **kwargs)
+
+    monkeypatch.setattr(relatorios.PDF, 'cell', registrar)
+
+    resposta = client.get('/admin/gerar_relatorio_pdf?data_inicio=2026-10-17&data_fim=2026-10-17')
+
+    assert resposta.status_code == 200
+    assert 'Data do Checklist: 17/10/2026' in textos
+    assert any(texto.endswith('às 22:30') for texto in textos)
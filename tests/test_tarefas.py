@@ -0,0 +1,115 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from flask import Flask
+
+import app as pacote
+from app import tarefas
+
+
+def test_pool_de_processos_usa_spawn(app, monkeypatch):
+    monkeypatch.setattr(tarefas, '_executor', None)
+    executor = tarefas._obter_executor()
+    try:
+        assert executor._mp_context.get_start_method() == 'spawn'
+        assert executor.submit(os.getpid).result(timeout=60) != os.getpid()
+    finally:
+        executor.shutdown()
+
+
+def _tarefa_com_progresso(tarefa_id, parametros):
+    for feitos in range(1, 4):
+        tarefas.reportar_progresso(tarefa_id, feitos, 3)
+
+
+def _tarefa_com_falha(tarefa_id, parametros):
+    tarefas.reportar_progresso(tarefa_id, 1, 3)
+    raise RuntimeError('falhou')
+
+
+def test_progresso_da_tarefa_e_descartado_ao_terminar(app, monkeypatch):
+    monkeypatch.setattr(pacote, 'create_app', lambda: app)
+
+    tarefas._executar(_tarefa_com_progresso, 'tarefa-ok', {}, app.instance_path)
+    tarefas._executar(_tarefa_com_falha, 'tarefa-erro', {}, app.instance_path)
+
+    assert tarefas.ler_estado('tarefa-ok')['status'] == tarefas.CONCLUIDA
+    assert tarefas.ler_estado('tarefa-erro')['status'] == tarefas.ERRO
+    assert 'tarefa-ok' not in tarefas._ultimo_progresso
+    assert 'tarefa-erro' not in tarefas._ultimo_progresso
+
+
+def _executar_simulado(funcao, tarefa_id, parametros, pasta_instancia):
+    """Substitui tarefas._executar no processo filho, sem criar a aplicação."""
+    if parametros.get('morrer'):
+        os._exit(1)
+    tarefas.salvar_estado(tarefa_id, Flask('app', instance_path=pasta_instancia),
+                          status=tarefas.CONCLUIDA, concluida_em=time.time())
+
+
+def pool_quebrado():
+    executor = ProcessPoolExecutor(max_workers=1, mp_context=tarefas.multiprocessing.get_context('spawn'))
+    with pytest.raises(Exception):
+        executor.submit(os._exit, 1).result(timeout=60)
+    return executor
+
+
+def aguardar_status(tarefa_id, status):
+    for _ in range(600):
+        estado = tarefas.ler_estado(tarefa_id)
+        if estado and estado.get('status') == status:
+            return estado
+        time.sleep(0.1)
+    return tarefas.ler_estado(tarefa_id)
+
+
+@pytest.fixture
+def pool_de_teste(monkeypatch):
+    monkeypatch.setattr(tarefas, '_executar', _executar_simulado)
+    monkeypatch.setattr(tarefas, '_executor', pool_quebrado())
+    yield
+    if tarefas._executor:
+        tarefas._executor.shutdown()
+
+
+def test_pool_quebrado_e_recriado(app, pool_de_teste):
+    quebrado = tarefas._executor
+
+    estado = tarefas.submeter('teste', {'n': 1}, _tarefa_com_progresso, ttl=60)
+
+    assert estado['status'] == tarefas.PENDENTE
+    assert tarefas._executor is not quebrado
+    assert aguardar_status(estado['id'], tarefas.CONCLUIDA)['status'] == tarefas.CONCLUIDA
+
+
+def test_pool_que_continua_quebrado_marca_erro(app, pool_de_teste, monkeypatch):
+    quebrado = tarefas._executor
+    monkeypatch.setattr(tarefas, '_obter_executor', lambda: quebrado)
+
+    estado = tarefas.submeter('teste', {'n': 2}, _tarefa_com_progresso, ttl=60)
+
+    assert estado['status'] == tarefas.ERRO
+    assert tarefas.ler_estado(estado['id'])['status'] == tarefas.ERRO
+
+
+def test_processo_filho_morto_marca_erro(app, pool_de_teste):
+    estado = tarefas.submeter('teste', {'morrer': True}, _tarefa_com_progresso, ttl=60)
+
+    assert aguardar_status(estado['id'], tarefas.ERRO)['status'] == tarefas.ERRO
+
+
+def test_falha_ao_criar_a_aplicacao_marca_erro(app, monkeypatch):
+    def falhar():
+        raise RuntimeError('configuração inválida')
+
+    monkeypatch.setattr(pacote, 'create_app', falhar)
+    tarefas.salvar_estado('tarefa-sem-app', status=tarefas.PENDENTE)
+
+    with pytest.raises(RuntimeError):
+        tarefas._executar(_tarefa_com_progresso, 'tarefa-sem-app', {}, app.instance_path)
+
+    estado = tarefas.ler_estado('tarefa-sem-app')
+    assert estado['status'] == tarefas.ERRO
+    assert 'configuração inválida' in estado['erro']